@@ -0,0 +1,6 @@
+"""Shared, Grasshopper-independent modules used by the PhotoRad components.
+
+The modules in this package are written so that they can be imported both from
+CPython and from the IronPython interpreter used by Grasshopper. numpy is used
+when it is available and a pure-Python implementation is used otherwise.
+"""
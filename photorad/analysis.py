@@ -0,0 +1,239 @@
+"""Evaluation of plant suitability over the points of a DLI grid."""
+
+from __future__ import division
+
+import calendar
+
+from photorad import profiling
+from photorad.plants import PlantTable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _classifyPoints(seasonAvg, dliLowList, dliUpList):
+    """
+    (plants x points) matrix with 0 (below range), 1 (within range) or 2 (above range)
+    for every point, for plants sharing the same seasonal DLI. This function is for
+    internal use only.
+    """
+    if np is not None:
+        seasonAvg = np.asarray(seasonAvg)[None, :]
+        dliLow = np.asarray(dliLowList, dtype=np.float64)[:, None]
+        dliUp = np.asarray(dliUpList, dtype=np.float64)[:, None]
+        rangeMatrix = np.ones((len(dliLowList), seasonAvg.shape[1]), dtype=np.int8)
+        rangeMatrix[seasonAvg < dliLow] = 0
+        rangeMatrix[seasonAvg > dliUp] = 2
+        return rangeMatrix
+
+    rangeMatrix = []
+    for dliLow, dliUp in zip(dliLowList, dliUpList):
+        rangeMatrix.append([2 if val > dliUp else (1 if val >= dliLow else 0) for val in
+                            seasonAvg])
+    return rangeMatrix
+
+
+@profiling.profiled("analyzePlants")
+def analyzePlants(plantData, dliData, locationData=None, filterBySoilTemp=False):
+    """
+    Classify every point of a DLI grid for every plant in a single pass. Plants that
+    share a growing season share the calculation of the seasonal DLI, which is kept with
+    dliData (see dliData.seasonStats) and reused by analyzePlant.
+
+    Returns a dictionary with:
+        dliRangeMatrix: (plants x points) matrix with 0 (below range), 1 (within range)
+            or 2 (above range) for every point. If filterBySoilTemp is True, the rows of
+            plants whose temperature range is not compatible with the location are -1.
+        rangeFractions: Fraction of the points below, within and above range for every
+            plant.
+        inRangeFractions: Fraction of the points within range for every plant.
+        seasonDLI: Average seasonal DLI of every point for every growing season.
+        seasonDLICmu: Cumulative seasonal DLI of every point for every growing season.
+    """
+    assert not filterBySoilTemp or locationData is not None, \
+        "locationData is required to filter plants by soil temperature."
+
+    ptsCount = dliData.dataSize[0]
+    plantTable = PlantTable.fromPlants(plantData)
+
+    # Group the plants by growing season.
+    seasonGroups = plantTable.seasonGroups()
+
+    if np is not None:
+        dliRangeMatrix = np.zeros((len(plantTable), ptsCount), dtype=np.int8)
+    else:
+        dliRangeMatrix = [None] * len(plantTable)
+
+    seasonDLI = {}
+    seasonDLICmu = {}
+    for season, plantIdxList in seasonGroups.items():
+        # Shared with analyzePlant through the SeasonStats kept with dliData.
+        seasonStats = dliData.seasonStats(season)
+        seasonAvg = seasonStats.values
+        seasonDLI[season] = seasonAvg
+        seasonDLICmu[season] = seasonStats.cmuValues
+
+        rangeMatrix = _classifyPoints(seasonAvg, [plantTable.dliMin[idx] for idx in plantIdxList],
+                                      [plantTable.dliMax[idx] for idx in plantIdxList])
+
+        if np is not None:
+            dliRangeMatrix[plantIdxList] = rangeMatrix
+        else:
+            for plantIdx, rangeList in zip(plantIdxList, rangeMatrix):
+                dliRangeMatrix[plantIdx] = rangeList
+
+    if filterBySoilTemp:
+        tempMatch = plantTable.temperatureMatch(locationData.tmin, locationData.tmax)
+        for plantIdx, isMatch in enumerate(tempMatch):
+            if not isMatch:
+                dliRangeMatrix[plantIdx] = [-1] * ptsCount if np is None else -1
+
+    if np is not None:
+        rangeFractions = np.stack([(dliRangeMatrix == val).sum(axis=1) for val in (0, 1, 2)],
+                                  axis=1) / ptsCount
+        rangeFractions = [tuple(val) for val in rangeFractions.tolist()]
+    else:
+        rangeFractions = [tuple(rangeList.count(val) / ptsCount for val in (0, 1, 2)) for
+                          rangeList in dliRangeMatrix]
+
+    return {"dliRangeMatrix": dliRangeMatrix, "rangeFractions": rangeFractions,
+            "inRangeFractions": [val[1] for val in rangeFractions],
+            "seasonDLI": seasonDLI, "seasonDLICmu": seasonDLICmu}
+
+
+class DLIfilterResult(object):
+    def __init__(self,plantInstance,resultPct,qualFactor,dliData,dliRangeList):
+        self.plantInstance=plantInstance
+        self.resultPct=resultPct
+        self.qualFactor=qualFactor
+        self.dliData=dliData
+        self.dliRangeList=dliRangeList
+
+    @property
+    def selection(self):
+        return True if self.resultPct[1]>self.qualFactor else False
+    def ToString(self):
+        return "Selection:%s for %s with in-range DLI of %.3f and qualifying factor of %.3f"%(self.selection,self.plantInstance.name,self.resultPct[1],self.qualFactor)
+
+
+@profiling.profiled("analyzePlant")
+def analyzePlant(plantData,locationData,dliData,plantIndex,filterBySoilTemp,qualifyFraction):
+    """Analyze the plant at plantIndex and return the outputs of AnalyzePlantSelection as a dictionary."""
+
+
+    outputDict={"dliRangeList":None,"growSeasonSiteDLI":None,"legendTitleAna":None,
+                "chartTitleAna":None, "chartTitleDLI":None,"legendTitleDLI":None,}
+
+    plantInst=plantData[plantIndex]
+    growSeason=plantInst.growingSeason
+
+    locTmin=locationData.tmin
+    locTmax=locationData.tmax
+
+    plantTmin=plantInst.minTemp
+    plantTmax=plantInst.maxTemp
+
+    plantName=plantInst.name
+    growSeasonMonths=",".join([calendar.month_name[val] for val in growSeason])
+
+
+
+    #The season DLI and its bucket means are calculated once and kept with dliData for every growing season.
+    seasonStats=dliData.seasonStats(growSeason)
+    if np is not None:
+        growSeasonDLIList=seasonStats.values.tolist()
+        growSeasonDLIListCmu=seasonStats.cmuValues.tolist()
+    else:
+        growSeasonDLIList=list(seasonStats.values)
+        growSeasonDLIListCmu=list(seasonStats.cmuValues)
+
+    frstQ,secThrQ,frthQ=seasonStats.reportQuartiles
+
+
+    dliRangeUp=plantInst.dliValue[1]
+    dliRangeLow=plantInst.dliValue[0]
+
+
+    plotTitle="Report for: %s\n\n\n"%(plantName.upper())
+    plotTitle+="Growing season (months): %s\n\n"%growSeasonMonths
+    plotTitle+="Growing season Plant DLI Range: (%s,%s)\n\n"%(dliRangeLow,dliRangeUp)
+    plotTitle+="Growing season Location DLI Averages (Q1,Q2-Q3,Q4):(%0.1f, %0.1f, %0.1f)\n\n"%(frstQ,secThrQ,frthQ)
+    plotTitle+="Plant Temperature Range(min,max): (%s,%s)\n\n"%(plantTmin,plantTmax)
+
+
+    chartTitleDLI="Daily Light Integral Averaged for Growing Season months\n\n"
+    chartTitleDLI+="Growing season months for %s: %s\n\n"%(plantName.upper(),growSeasonMonths)
+
+
+    #If filtering by soil temperature has been set to then check if the limits for the plant and location match.
+    #If they don't exit by returning -1 as value for the DLI grid.
+    if filterBySoilTemp:
+        if not (plantTmin<=locTmin and plantTmax>=locTmax):
+            plotTitle+="The plant temperature range (%s,%s) is not compatible with the location temperature range (%s,%s)"%(plantTmin,plantTmax,locTmin,locTmax)
+
+            dliRangeList=[-1]*len(growSeasonDLIList)
+
+            outputDict["dliRangeList"]=dliRangeList
+            outputDict["growSeasonSiteDLI"]=growSeasonDLIList
+            outputDict["legendTitleAna"]="Not Applicable"
+            outputDict["chartTitleAna"]=plotTitle
+            outputDict["chartTitleDLI"]=chartTitleDLI
+            outputDict["legendTitleDLI"]="DLI"
+
+            return outputDict
+
+
+
+    dliRangeList=[]
+
+
+    for idx,val in enumerate(growSeasonDLIList):
+        if val>dliRangeUp:
+            dliRangeList.append(2)
+
+        if dliRangeUp>=val>=dliRangeLow:
+            dliRangeList.append(1)
+        if val<dliRangeLow:
+            dliRangeList.append(0)
+
+
+
+    lowMatchMax=(dliRangeList.count(0),dliRangeList.count(1),dliRangeList.count(2))
+
+    lowMatchMaxPct=tuple(["%.1f%%"%(100*val/len(growSeasonDLIList)) for val in lowMatchMax])
+
+    lowMatchMaxPctNum=tuple([(val/len(growSeasonDLIList)) for val in lowMatchMax])
+
+
+
+    plotTitle+="Site Temperature Range(min,max): (%s,%s)\n\n"%(locTmin,locTmax)
+
+    outputDict["dliRangeList"]=dliRangeList
+    outputDict["growSeasonSiteDLI"]=growSeasonDLIList
+    outputDict["growSeasonSiteDLICmu"]=growSeasonDLIListCmu
+    outputDict["legendTitleAna"]="0: BelowRange(%s), 1: WithinRange(%s), 2: AboveRange(%s)"%(lowMatchMaxPct[0],lowMatchMaxPct[1],lowMatchMaxPct[2])
+    outputDict["chartTitleAna"]=plotTitle
+    outputDict["chartTitleDLI"]=chartTitleDLI
+    outputDict["legendTitleDLI"]="DLI"
+    outputDict["dliFilterResult"]=DLIfilterResult(plantInst,lowMatchMaxPctNum,qualifyFraction,dliData,list(dliRangeList))
+
+    #{"dliRangeList":None,"growSeasonSiteDLI":None,"legendTitleAna":None,
+            #    "chartTitleAna":None, "chartTitleDLI":None,"legendTitleDLI":None,}
+
+
+    return outputDict
+
+@profiling.profiled("analyzeAll")
+def analyzeAll(plantData,locationData,dliData,filterBySoilTemp,qualifyFraction):
+    """Analyze all the plants in plantData and return a DLIfilterResult for every plant."""
+
+    results=analyzePlants(plantData,dliData,locationData,filterBySoilTemp)
+
+    dliFilterResults=[]
+    for plantInst,dliRangeList,rangePct in zip(plantData,results["dliRangeMatrix"],results["rangeFractions"]):
+        dliRangeList=dliRangeList.tolist() if hasattr(dliRangeList,"tolist") else dliRangeList
+        dliFilterResults.append(DLIfilterResult(plantInst,rangePct,qualifyFraction,dliData,dliRangeList))
+
+    return dliFilterResults
@@ -0,0 +1,214 @@
+"""Headless runner for the calculate -> analyze -> filter pipeline over many projects.
+
+A batch is described by a json manifest. Paths are relative to the manifest and every
+job can override the defaults:
+
+    {
+        "outputDir": "photorad_results",
+        "soilData": "data/soilData.json",
+        "defaults": {"conversionFactor": 3.72, "qualifyFraction": 0.5,
+                     "filterBySoilTemp": false, "precision": "float32"},
+        "jobs": [
+            {"name": "office",
+             "results": ["office/annual_irradiance/results/total/grid1.ill"],
+             "sunHours": "office/annual_irradiance/results/sun-up-hours.txt",
+             "epw": "weather/boston.epw",
+             "plants": "plants.csv"}
+        ]
+    }
+
+Every job writes <outputDir>/<name>.json with the location, the DLI and the plant
+selection of every result grid, and the batch writes <outputDir>/summary.json with
+the status of every job. Jobs run in parallel worker processes. If profiling is
+requested, every job also writes <outputDir>/<name>.profile.json with the stages of
+its pipeline (see photorad/profiling.py).
+"""
+
+from __future__ import division
+
+import json
+import os
+import time
+import traceback
+
+from photorad import analysis, cache, plants, profiling
+from photorad.dli import calc_grid_dli
+from photorad.location import LocationData
+from photorad.selection import selectPlants
+
+# The soil data distributed with the repository.
+DEFAULT_SOIL_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "data", "soilData.json")
+
+DEFAULT_OPTIONS = {"conversionFactor": 3.72, "qualifyFraction": 0.5,
+                   "filterBySoilTemp": False, "memoryBudgetMB": None, "precision": "float64"}
+
+
+def _toList(values):
+    """Plain list of floats for json, from a numpy array or a list."""
+    values = values.tolist() if hasattr(values, "tolist") else values
+    return [float(val) for val in values]
+
+
+def loadManifest(manifestPath):
+    """
+    Read a manifest and return the list of jobs, with the paths made absolute and the
+    defaults applied to every job.
+    """
+    assert os.path.exists(manifestPath), "The manifest (%s) was not found" % manifestPath
+
+    with open(manifestPath) as manifestFile:
+        manifest = json.load(manifestFile)
+
+    baseDir = os.path.dirname(os.path.abspath(manifestPath))
+    resolvePath = lambda filePath: os.path.normpath(os.path.join(baseDir, filePath))
+
+    defaults = dict(DEFAULT_OPTIONS)
+    defaults.update(manifest.get("defaults", {}))
+    soilData = resolvePath(manifest["soilData"]) if "soilData" in manifest else \
+        DEFAULT_SOIL_DATA
+
+    jobs = []
+    jobNames = set()
+    for jobIdx, jobDict in enumerate(manifest.get("jobs", [])):
+        for key in ("results", "sunHours", "epw", "plants"):
+            assert key in jobDict, "The job %s in %s does not specify '%s'" % (
+                jobIdx, manifestPath, key)
+
+        job = dict(defaults)
+        job.update(jobDict)
+        job["name"] = jobDict.get("name", "job%03d" % jobIdx)
+        assert job["name"] not in jobNames, "The job name %s is not unique" % job["name"]
+        jobNames.add(job["name"])
+
+        resultFiles = job["results"]
+        resultFiles = resultFiles if isinstance(resultFiles, list) else [resultFiles]
+        job["results"] = [resolvePath(filePath) for filePath in resultFiles]
+        for key in ("sunHours", "epw", "plants"):
+            job[key] = resolvePath(job[key])
+        job["soilData"] = resolvePath(jobDict["soilData"]) if "soilData" in jobDict else \
+            soilData
+        jobs.append(job)
+
+    outputDir = resolvePath(manifest["outputDir"]) if "outputDir" in manifest else None
+    return jobs, outputDir
+
+
+def runJob(job, useCache=True):
+    """
+    Run the full pipeline for a job from the manifest and return the results as a
+    json-compatible dictionary.
+    """
+    resultCache = cache.ResultCache() if useCache else None
+    memoryBudget = job["memoryBudgetMB"] * 1024 ** 2 if job.get("memoryBudgetMB") else None
+
+    locationData = LocationData(job["epw"], job["soilData"])
+    plantData = plants.loadPlantCsv(job["plants"])
+    assert plantData, "No plants were found in %s" % job["plants"]
+
+    gridResults = []
+    for resPath in job["results"]:
+        dliData = calc_grid_dli(resPath, job["sunHours"], job["conversionFactor"], resultCache,
+                                memoryBudget=memoryBudget, precision=job["precision"])
+        dliFilterResults = analysis.analyzeAll(plantData, locationData, dliData,
+                                               job["filterBySoilTemp"], job["qualifyFraction"])
+        selectionDict = selectPlants(dliFilterResults, dliData)
+        combinations = selectionDict["allOptions"]
+
+        gridResults.append({
+            "resultFile": resPath,
+            "pointCount": dliData.dataSize[0],
+            "avgDLIAnnual": _toList(dliData.avgDLIAnnual),
+            "plants": [{"name": result.plantInstance.name,
+                        "rangeFractions": [float(val) for val in result.resultPct],
+                        "selected": result.selection} for result in dliFilterResults],
+            "selection": list(selectionDict["selection"]),
+            "selectionIndex": selectionDict["selectionGrid"][0] if
+            selectionDict["selectionGrid"] else None,
+            "selectionNodal": selectionDict["nameListFinal"],
+            "combinations": dict(("%s" % comboIndex, list(combinations[comboIndex][1])) for
+                                 comboIndex in sorted(set(selectionDict["nameListFinal"])))})
+
+    return {"name": job["name"],
+            "location": {"location": locationData.location,
+                         "latitude": locationData.latitude,
+                         "longitude": locationData.longitude,
+                         "hardinessZone": locationData.hardinessZone,
+                         "tmin": locationData.tmin, "tmax": locationData.tmax,
+                         "zipMatch": locationData.zipMatch,
+                         "monthlyPhotoPeriodAvg": locationData.monthlyPhotoPeriodAvg},
+            "options": dict((key, job[key]) for key in DEFAULT_OPTIONS),
+            "grids": gridResults}
+
+
+def _runJobWorker(args):
+    """
+    Run a job and write its output file (and profile). Returns the path of the output,
+    the time taken and the error message (None if the job succeeded). This function is
+    for internal use only.
+    """
+    job, outputDir, useCache, profile = args
+    startTime = time.time()
+    try:
+        if profile:
+            profileReport = profiling.enable(traceMemory=True)
+            try:
+                with profiling.stage("runJob"):
+                    jobResult = runJob(job, useCache)
+            finally:
+                profiling.disable()
+            profileReport.toJson(os.path.join(outputDir, "%s.profile.json" % job["name"]))
+        else:
+            jobResult = runJob(job, useCache)
+        outputPath = os.path.join(outputDir, "%s.json" % job["name"])
+        with open(outputPath, "w") as outputFile:
+            json.dump(jobResult, outputFile, indent=1)
+        return outputPath, time.time() - startTime, None
+    except Exception:
+        return None, time.time() - startTime, traceback.format_exc()
+
+
+def runBatch(jobs, outputDir, workers=None, useCache=True, profile=False):
+    """
+    Run a list of jobs (see loadManifest) in parallel worker processes and write the
+    summary of the batch to <outputDir>/summary.json. workers defaults to the number of
+    cpus. If profile is True, the stages of every job are recorded in its own process
+    and written to <outputDir>/<name>.profile.json. Returns the summary of every job in
+    the order of the jobs.
+    """
+    if not os.path.exists(outputDir):
+        os.makedirs(outputDir)
+
+    taskArgs = [(job, outputDir, useCache, profile) for job in jobs]
+
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+    except ImportError:
+        ProcessPoolExecutor = None
+
+    if not workers:
+        workers = os.cpu_count() if hasattr(os, "cpu_count") else 1
+    workers = max(1, min(workers, len(taskArgs)))
+
+    if ProcessPoolExecutor is None or workers == 1:
+        results = [_runJobWorker(args) for args in taskArgs]
+    else:
+        results = [None] * len(taskArgs)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_runJobWorker, args) for args in taskArgs]
+            for idx, future in enumerate(futures):
+                try:
+                    results[idx] = future.result()
+                except Exception:
+                    # The worker process itself failed, e.g. it ran out of memory.
+                    results[idx] = None, None, traceback.format_exc()
+
+    summary = []
+    for job, (outputPath, seconds, error) in zip(jobs, results):
+        summary.append({"name": job["name"], "status": "failed" if error else "ok",
+                        "output": outputPath, "seconds": seconds, "error": error})
+
+    with open(os.path.join(outputDir, "summary.json"), "w") as summaryFile:
+        json.dump({"jobs": summary}, summaryFile, indent=1)
+
+    return summary
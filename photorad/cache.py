@@ -0,0 +1,232 @@
+"""Persistent binary cache for parsed annual results and computed DLI matrices.
+
+Every entry is stored as a small header followed by the raw values of a (rows x
+columns) matrix in row-major order:
+
+    8 bytes  magic (b"PRCACHE2")
+    4 bytes  number of rows (uint32, little endian)
+    4 bytes  number of columns (uint32, little endian)
+    4 bytes  size of a value: 4 for float32 or 8 for float64 (uint32, little endian)
+    rows * columns * size bytes  values (little endian)
+
+float64 matrices are stored as float64, so a cached result is the same as a newly
+calculated one.
+
+Entries are keyed by the absolute path, size and modification time of their source
+files, the kind of data stored (which includes the storage precision of the DLI, see
+dli.py) and, where relevant, the conversion factor. The key also includes the version
+of the format, so entries written in an earlier format are never read and are evicted
+like any unused entry. With numpy the entries are memory-mapped on load, so reopening a
+cached result does not read the values until they are used. The cache directory is kept
+below a disk budget by evicting the least recently used entries, including the weather
+years cached by epw.py.
+"""
+
+import array
+import hashlib
+import os
+import struct
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_MAGIC = b"PRCACHE2"
+_HEADER = struct.Struct("<8sIII")
+# Part of every key. Entries of the b"PRCACHE1" format held float32 values for every
+# precision and must not be served to float64 runs.
+_FORMAT_VERSION = 2
+
+# Value size in bytes: (numpy dtype, array typecode).
+_VALUE_TYPES = {4: ("<f4", "f"), 8: ("<f8", "d")}
+_EXTENSION = ".prc"
+
+# Extensions of the entries that count towards the disk budget of a cache directory: the
+# cached matrices and the weather years written by epw.readEPW.
+ENTRY_EXTENSIONS = (_EXTENSION, ".pwy")
+
+# Name of the sidecar directory created next to the result files.
+CACHE_DIR_NAME = ".photorad_cache"
+
+# Default disk budget for a cache directory.
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+
+
+def cacheKey(sourceFiles, kind, conversionFactor=None):
+    """Hash identifying a set of source files in their current state."""
+    sourceFiles = [sourceFiles] if isinstance(sourceFiles, str) else sourceFiles
+
+    keyParts = [kind, repr(conversionFactor), "format%s" % _FORMAT_VERSION]
+    for filePath in sourceFiles:
+        assert os.path.exists(filePath), "The file path (%s) was not found" % filePath
+        fileStat = os.stat(filePath)
+        keyParts.append("%s|%s|%r" % (os.path.abspath(filePath), fileStat.st_size,
+                                      fileStat.st_mtime))
+
+    return hashlib.sha1("\n".join(keyParts).encode("utf-8")).hexdigest()
+
+
+def fileHash(filePath, blockSize=1024 * 1024):
+    """Hash of the contents of a file, for entries that should survive a copy or touch."""
+    assert os.path.exists(filePath), "The file path (%s) was not found" % filePath
+
+    fileDigest = hashlib.sha1()
+    with open(filePath, "rb") as inputStream:
+        while True:
+            block = inputStream.read(blockSize)
+            if not block:
+                break
+            fileDigest.update(block)
+    return fileDigest.hexdigest()
+
+
+def writeMatrix(filePath, data):
+    """
+    Write a (rows x columns) numpy array or list of lists in the cache format. float32
+    and float16 arrays are stored as float32, everything else as float64.
+    """
+    if np is not None:
+        data = np.asarray(data)
+        valueSize = 4 if data.dtype in (np.float32, np.float16) else 8
+        data = data.astype(_VALUE_TYPES[valueSize][0], copy=False)
+        rows, columns = data.shape
+    else:
+        valueSize = 8
+        rows, columns = len(data), len(data[0]) if data else 0
+
+    with open(filePath, "wb") as outputStream:
+        outputStream.write(_HEADER.pack(_MAGIC, rows, columns, valueSize))
+        if np is not None:
+            data.tofile(outputStream)
+        else:
+            for rowData in data:
+                rowArray = array.array(_VALUE_TYPES[valueSize][1], rowData)
+                if sys.byteorder == "big":
+                    rowArray.byteswap()
+                rowArray.tofile(outputStream)
+
+
+def readMatrix(filePath, mmap=True):
+    """
+    Read a matrix written by writeMatrix. With numpy a read-only array of the stored
+    type is returned (memory-mapped if mmap is True), otherwise a list of lists.
+    """
+    with open(filePath, "rb") as inputStream:
+        magic, rows, columns, valueSize = _HEADER.unpack(inputStream.read(_HEADER.size))
+        assert magic == _MAGIC, "The file %s is not a PhotoRad cache file" % filePath
+        assert valueSize in _VALUE_TYPES, \
+            "The value size (%s) of the cache file %s is not supported" % (valueSize, filePath)
+        dtype, typecode = _VALUE_TYPES[valueSize]
+
+        if np is not None:
+            if mmap and rows * columns:
+                return np.memmap(filePath, dtype=dtype, mode="r", offset=_HEADER.size,
+                                 shape=(rows, columns))
+            return np.fromfile(inputStream, dtype=dtype,
+                               count=rows * columns).reshape(rows, columns)
+
+        values = array.array(typecode)
+        values.fromfile(inputStream, rows * columns)
+        if sys.byteorder == "big":
+            values.byteswap()
+        return [values[idx:idx + columns].tolist() for idx in
+                range(0, rows * columns, columns)]
+
+
+def _replace(sourcePath, targetPath):
+    """Atomically replace targetPath with sourcePath (os.replace is not in Python 2)."""
+    if hasattr(os, "replace"):
+        os.replace(sourcePath, targetPath)
+    elif sys.platform == "win32" and os.path.exists(targetPath):
+        os.remove(targetPath)
+        os.rename(sourcePath, targetPath)
+    else:
+        os.rename(sourcePath, targetPath)
+
+
+class ResultCache(object):
+    """
+    A directory of cached matrices with a least-recently-used disk budget. If cacheDir
+    is not provided, a sidecar directory is created next to the first source file of
+    every entry.
+    """
+
+    def __init__(self, cacheDir=None, maxBytes=DEFAULT_MAX_BYTES):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+
+    def _entryPath(self, sourceFiles, kind, conversionFactor=None):
+        sourceFiles = [sourceFiles] if isinstance(sourceFiles, str) else sourceFiles
+        cacheDir = self.cacheDir or os.path.join(
+            os.path.dirname(os.path.abspath(sourceFiles[0])), CACHE_DIR_NAME)
+        fileName = cacheKey(sourceFiles, kind, conversionFactor) + _EXTENSION
+        return cacheDir, os.path.join(cacheDir, fileName)
+
+    def contains(self, sourceFiles, kind, conversionFactor=None):
+        return os.path.exists(self._entryPath(sourceFiles, kind, conversionFactor)[1])
+
+    def get(self, sourceFiles, kind, conversionFactor=None):
+        """Return the cached matrix or None if it has not been cached."""
+        entryPath = self._entryPath(sourceFiles, kind, conversionFactor)[1]
+        if not os.path.exists(entryPath):
+            return None
+
+        # The modification time of an entry records when it was last used.
+        os.utime(entryPath, None)
+        return readMatrix(entryPath)
+
+    def put(self, sourceFiles, kind, data, conversionFactor=None):
+        """Store a matrix and evict old entries if the disk budget is exceeded."""
+        cacheDir, entryPath = self._entryPath(sourceFiles, kind, conversionFactor)
+        if not os.path.exists(cacheDir):
+            os.makedirs(cacheDir)
+
+        tempPath = "%s.%s.tmp" % (entryPath, os.getpid())
+        writeMatrix(tempPath, data)
+        try:
+            _replace(tempPath, entryPath)
+        except OSError:
+            # The entry is memory-mapped by a reader (Windows) and keeps its values, which
+            # are for the same source files.
+            os.remove(tempPath)
+            return entryPath
+
+        self.evict(cacheDir)
+        return entryPath
+
+    def evict(self, cacheDir=None):
+        """Remove the least recently used entries until the directory fits the budget."""
+        cacheDir = cacheDir or self.cacheDir
+        if not cacheDir or not os.path.exists(cacheDir):
+            return []
+
+        entries = []
+        for fileName in os.listdir(cacheDir):
+            if fileName.endswith(ENTRY_EXTENSIONS):
+                fileStat = os.stat(os.path.join(cacheDir, fileName))
+                entries.append((fileStat.st_mtime, fileStat.st_size, fileName))
+
+        totalSize = sum(entry[1] for entry in entries)
+        removedEntries = []
+        for lastUsed, fileSize, fileName in sorted(entries):
+            if totalSize <= self.maxBytes:
+                break
+            try:
+                os.remove(os.path.join(cacheDir, fileName))
+            except OSError:
+                # The entry may still be memory-mapped by another process (Windows).
+                continue
+            totalSize -= fileSize
+            removedEntries.append(fileName)
+
+        return removedEntries
+
+    def clear(self, cacheDir=None):
+        """Remove every entry from a cache directory."""
+        cacheDir = cacheDir or self.cacheDir
+        if cacheDir and os.path.exists(cacheDir):
+            for fileName in os.listdir(cacheDir):
+                if fileName.endswith(ENTRY_EXTENSIONS):
+                    os.remove(os.path.join(cacheDir, fileName))
@@ -0,0 +1,898 @@
+"""Calculation of Daily Light Integral (DLI) from annual irradiance results."""
+
+from __future__ import division
+
+import array
+import calendar
+import os
+import tempfile
+import traceback
+
+try:
+    import numpy as np
+except ImportError:
+    # IronPython (Grasshopper) does not ship numpy, the pure-Python engine is used instead.
+    np = None
+
+from photorad import profiling, radparse, stats
+
+# Note: Rad file and rad refers to radiation data files that contain data in W/m2
+
+# Day-of-year boundaries for every month of a non-leap year, i.e. [0, 31, 59,... 365]
+_monthDates = [0] + [calendar.monthrange(2011, val)[-1] for val in range(1, 13)]
+_monthDateSum = [sum(_monthDates[:idx + 1]) for idx in range(len(_monthDates))]
+
+# Default working memory for the chunked calculation.
+DEFAULT_MEMORY_BUDGET = 512 * 1024 ** 2
+
+# Precisions in which the DLI matrices can be stored. With any precision other than
+# float64 the hourly matrices are stored as float32, which adds up to 6.0e-8 (2**-24) of
+# every daily value. The largest error of a stored daily DLI value is then:
+#   float64  none
+#   float32  1.2e-7 (2**-23) of the value
+#   float16  4.9e-4 (2**-11) of the value, or 3.0e-8 for values below 6.1e-5
+#   int16    1.5e-5 (1/65534) of the largest value of the grid, e.g. 0.001 mol/m2/day for
+#            a grid with a maximum DLI of 70
+# Sums and averages are always accumulated in float64 from the stored values, so their
+# error is within the same bounds. float16 and int16 require numpy.
+PRECISIONS = ("float64", "float32", "float16", "int16")
+
+
+def _chunkBlockSize(memoryBudget):
+    """
+    Size of the text blocks read in chunked mode. A parsed block takes roughly three
+    times (numpy) or twelve times (pure-Python) the memory of its text.
+    """
+    return max(1024 ** 2, int(memoryBudget // (3 if np is not None else 12)))
+
+
+def _newDailySums(ptsCount):
+    """A (365 x numPoints) matrix of zeros."""
+    if np is not None:
+        return np.zeros((365, ptsCount))
+    return [[0] * ptsCount for _ in range(365)]
+
+
+def _floatArray(radDataSet):
+    """
+    The matrix as a float array. float32 matrices are not converted, the values are
+    added to float64 sums.
+    """
+    radArray = np.asarray(radDataSet)
+    return radArray if radArray.dtype in (np.float32, np.float64) else \
+        radArray.astype(np.float64)
+
+
+def _accumulateDailySums(dailySums, radDataSet, hourIndex):
+    """
+    Add the (hours x numPoints) rows to the (365 x numPoints) daily sums in the day of
+    the year given by hourIndex. The values of a day are always added in the order of
+    their hours, so the sums do not depend on how the rows were split into blocks.
+    """
+    if np is not None:
+        radArray = _floatArray(radDataSet)
+        hourIndex = np.asarray(hourIndex, dtype=np.int64)
+        dayIndex = hourIndex // 24
+        hourOfDay = hourIndex % 24
+        # Add the rows one hour of the day at a time to scatter them into their day bins.
+        for hourNum in range(24):
+            hourRows = np.flatnonzero(hourOfDay == hourNum)
+            if hourRows.size:
+                dailySums[dayIndex[hourRows]] += radArray[hourRows]
+    else:
+        for hourIdx, rowData in zip(hourIndex, radDataSet):
+            dayIdx = hourIdx // 24
+            dailySums[dayIdx] = [daySum + val for daySum, val in zip(dailySums[dayIdx], rowData)]
+
+    return dailySums
+
+
+def _dliFactor(convFactor):
+    """Factor that converts the daily mean irradiance (W/m2) to DLI (mol/m2/day)."""
+    return convFactor * 0.0864
+
+
+def _dailySumsToMean(dailySums):
+    """
+    Convert the (365 x numPoints) daily sums of irradiance to the daily mean irradiance,
+    which does not depend on the conversion factor. Returns a (365 x numPoints) array,
+    or a numPoints x 365 nested list without numpy.
+    """
+    if np is not None:
+        dailySums /= 24
+        return dailySums
+
+    # Convert from 365 x numPoints to numPoints x 365 matrix
+    return [[daySum / 24 for daySum in ptsData] for ptsData in zip(*dailySums)]
+
+
+def _scaleDailyData(dailyData, factor):
+    """Multiply a daily matrix by a factor, in place for numpy arrays."""
+    if np is not None:
+        dailyData *= factor
+        return dailyData
+    return [[val * factor for val in ptsData] for ptsData in dailyData]
+
+
+def _checkPrecision(precision):
+    assert precision in PRECISIONS, \
+        "The value for precision (%s) must be one of %s" % (precision, ", ".join(PRECISIONS))
+    assert np is not None or precision in ("float64", "float32"), \
+        "The %s precision requires numpy." % precision
+
+
+def _hourlyDtype(precision):
+    """numpy dtype of the hourly matrices for a precision."""
+    return np.float64 if precision == "float64" else np.float32
+
+
+def _storeDailyData(dliDailyData, precision):
+    """
+    Convert a daily DLI matrix to the precision in which it is stored. Returns the matrix
+    and the factor by which int16 values are multiplied to get the DLI (None for the
+    other precisions).
+    """
+    if precision == "float64":
+        return dliDailyData, None
+
+    if np is None:
+        return [array.array("f", ptsData) for ptsData in dliDailyData], None
+
+    if precision == "int16":
+        dliArray = np.asarray(dliDailyData, dtype=np.float64)
+        maxValue = float(np.abs(dliArray).max()) if dliArray.size else 0.0
+        scale = maxValue / 32767 or 1.0
+        return np.rint(dliArray / scale).astype(np.int16), scale
+
+    return np.asarray(dliDailyData, dtype=precision), None
+
+
+def _hourlyRows(radDataSet, hourIndex):
+    """The hourly matrix with the hour of the year prepended to every row."""
+    if np is not None:
+        return np.column_stack((hourIndex, radDataSet))
+    return [[hourIdx] + list(rowData) for hourIdx, rowData in zip(hourIndex, radDataSet)]
+
+
+def _cacheKind(kind, precision):
+    """
+    Kind of a cache entry for a precision. The hourly and daily matrices of the other
+    precisions are calculated from rounded values, so they are cached apart from the
+    float64 ones.
+    """
+    return kind if precision == "float64" else "%s_%s" % (kind, precision)
+
+
+def _dailyRows(dliDailyData):
+    """The daily DLI matrix as (365 x numPoints) rows."""
+    return dliDailyData if np is not None else list(zip(*dliDailyData))
+
+
+class DailyView(object):
+    """
+    Read-only view of the daily DLI values of DLIdata for a range of days, that does
+    not copy them. If byPoint is True, the view has a row of values for every point
+    (numPoints x numDays), otherwise a row of values for every day (numDays x
+    numPoints). A row is only converted to a list of DLI values when it is accessed.
+    """
+
+    def __init__(self, dliData, startDay=0, endDay=365, byPoint=True):
+        assert 0 <= startDay <= endDay <= 365, \
+            "The day range (%s, %s) must be within 0 and 365" % (startDay, endDay)
+        self._dliData = dliData
+        self.startDay = startDay
+        self.endDay = endDay
+        self.byPoint = byPoint
+
+    @property
+    def shape(self):
+        dayCount = self.endDay - self.startDay
+        ptsCount = self._dliData.dataSize[0]
+        return (ptsCount, dayCount) if self.byPoint else (dayCount, ptsCount)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rowIdx):
+        if isinstance(rowIdx, slice):
+            return [self[idx] for idx in range(*rowIdx.indices(len(self)))]
+
+        rowCount = len(self)
+        if rowIdx < 0:
+            rowIdx += rowCount
+        if not 0 <= rowIdx < rowCount:
+            raise IndexError("The row index (%s) is out of range" % rowIdx)
+
+        if self.byPoint:
+            return self._dliData._pointValues(rowIdx, self.startDay, self.endDay)
+        return self._dliData._dayValues(self.startDay + rowIdx)
+
+    def __iter__(self):
+        for rowIdx in range(len(self)):
+            yield self[rowIdx]
+
+    @property
+    def T(self):
+        """The same days with the other orientation."""
+        return DailyView(self._dliData, self.startDay, self.endDay, not self.byPoint)
+
+    def tolist(self):
+        return list(self)
+
+    def ToString(self):
+        return "DLI for days %s to %s as a (%s x %s) matrix" % (
+            (self.startDay + 1, self.endDay) + self.shape)
+
+    def __str__(self):
+        return self.ToString()
+
+
+class DLIdata(object):
+    """
+    Daily Light Integral for every point of a grid. radFile is either the path of a rad
+    file with 8760 rows (month, day, hour and one column per point) or the equivalent
+    (hours x numPoints) matrix without the date columns. If hourIndex is provided, the
+    matrix only contains the rows for the sun hours and hourIndex contains the hour of
+    the year (0-8759) for every row, e.g. as returned by prep_rad_file.
+
+    If memoryBudget (in bytes) is provided along with the path of a rad file, the file
+    is streamed in blocks of hours and only the daily sums are kept in memory.
+
+    precision is the type in which the DLI matrices are stored (see PRECISIONS for the
+    error bounds), e.g. float32 halves the memory of the daily values.
+
+    The daily mean irradiance, which does not depend on the conversion factor, is what
+    is calculated and cached. The DLI for another conversion factor is available from
+    withConversionFactor without reading any files.
+    """
+    @profiling.profiled("DLIdata")
+    def __init__(self, radFile, ptsFile, conversionFactor=3.72, resultCache=None,
+                 cacheSources=None, hourIndex=None, memoryBudget=None, precision="float64"):
+        self._initData(precision, conversionFactor)
+
+        # The files that the results were derived from are used to identify them in the
+        # cache. Defaults to the rad file itself.
+        if resultCache is not None and not cacheSources:
+            assert isinstance(radFile, str), "cacheSources are required to cache in-memory results."
+            cacheSources = [radFile]
+
+        dailyMean = None
+        if resultCache is not None:
+            with profiling.stage("loadCache"):
+                dailyMean = self._loadCachedMean(resultCache, cacheSources)
+
+        if dailyMean is None and memoryBudget and isinstance(radFile, str):
+            dailyMean = self._calcDailyMeanChunked(radFile, ptsFile, memoryBudget)
+            if resultCache is not None:
+                with profiling.stage("writeCache"):
+                    resultCache.put(cacheSources, _cacheKind("dailyMean", precision),
+                                    _dailyRows(dailyMean))
+
+        elif dailyMean is None:
+            radDataSet = self._readRadData(radFile, ptsFile)
+            if np is not None and precision != "float64":
+                radDataSet = np.asarray(radDataSet, dtype=_hourlyDtype(precision))
+            if hourIndex is None:
+                hourIndex = list(range(len(radDataSet)))
+            dailyMean = self._calcDailyMean(radDataSet, hourIndex)
+
+            if resultCache is not None:
+                with profiling.stage("writeCache"):
+                    resultCache.put(cacheSources, _cacheKind("sunHourly", precision),
+                                    _hourlyRows(radDataSet, hourIndex))
+                    resultCache.put(cacheSources, _cacheKind("dailyMean", precision),
+                                    _dailyRows(dailyMean))
+
+        self._setDailyData(dailyMean, _dliFactor(conversionFactor))
+
+    @classmethod
+    def fromDailyData(cls, dliDailyData, precision="float64", conversionFactor=None):
+        """
+        Create DLIdata from an already calculated DLI matrix, i.e. a (365 x numPoints)
+        array or a numPoints x 365 nested list. conversionFactor is the factor the DLI
+        was calculated with, it is only needed for withConversionFactor.
+        """
+        dliData = cls.__new__(cls)
+        dliData._initData(precision, conversionFactor)
+        dliData._setDailyData(dliDailyData)
+        return dliData
+
+    @classmethod
+    def fromDailyMean(cls, dailyMean, conversionFactor=3.72, precision="float64"):
+        """
+        Create DLIdata from a matrix of daily mean irradiance (W/m2), i.e. a (365 x
+        numPoints) array or a numPoints x 365 nested list.
+        """
+        dliData = cls.__new__(cls)
+        dliData._initData(precision, conversionFactor)
+        dliData._setDailyData(dailyMean, _dliFactor(conversionFactor))
+        return dliData
+
+    def _initData(self, precision, conversionFactor):
+        _checkPrecision(precision)
+        self.precision = precision
+        self.conversionFactor = conversionFactor
+        self._dliDailyList = None
+        self._dliDailyArray = None
+        self._dliScale = None
+        self._dliCumSum = None
+        self._seasonStats = {}
+
+    def _setDailyData(self, dailyData, scale=None):
+        """
+        Store a daily matrix whose values are multiplied by scale (if provided) to get
+        the DLI. With numpy, the values are only multiplied when they are used.
+        """
+        if np is not None:
+            # (365 x numPoints) array.
+            if not isinstance(dailyData, np.ndarray):
+                dailyData = np.asarray(dailyData, dtype=np.float64).T
+            self._dliDailyArray, storeScale = _storeDailyData(dailyData, self.precision)
+            if storeScale is not None or scale is not None:
+                self._dliScale = (storeScale or 1.0) * (scale if scale is not None else 1.0)
+        else:
+            # numPoints x 365 nested lists.
+            if scale is not None:
+                dailyData = _scaleDailyData(dailyData, scale)
+            self._dliDailyList = _storeDailyData(dailyData, self.precision)[0]
+
+    def withConversionFactor(self, conversionFactor):
+        """
+        DLIdata for another conversion factor. The DLI is proportional to the conversion
+        factor, so no files are read: with numpy the daily values are shared with this
+        instance and rescaled when they are used, otherwise they are rescaled at once.
+        """
+        assert self.conversionFactor is not None, \
+            "The conversion factor of the DLI data is not known. Provide it to fromDailyData."
+
+        dliData = self.__class__.__new__(self.__class__)
+        dliData._initData(self.precision, conversionFactor)
+        ratio = conversionFactor / self.conversionFactor
+        if self._dliDailyArray is not None:
+            dliData._dliDailyArray = self._dliDailyArray
+            dliData._dliScale = (self._dliScale or 1.0) * ratio
+        else:
+            dliData._setDailyData(self._dliDailyList, ratio)
+        return dliData
+
+    @property
+    def nbytes(self):
+        """Memory used by the daily DLI values."""
+        if self._dliDailyArray is not None:
+            return self._dliDailyArray.nbytes
+        # 8 bytes for the reference to every float object and 24 bytes for the object.
+        itemSize = self._dliDailyList[0].itemsize if isinstance(
+            self._dliDailyList[0], array.array) else 32
+        return sum(len(ptsData) * itemSize for ptsData in self._dliDailyList)
+
+    @staticmethod
+    def isCached(resultCache, cacheSources, precision="float64"):
+        """
+        Check if DLIdata (for any conversion factor) with a precision can be created from
+        the cache without parsing any files.
+        """
+        return resultCache.contains(cacheSources, _cacheKind("dailyMean", precision)) or \
+               resultCache.contains(cacheSources, _cacheKind("sunHourly", precision))
+
+    def _loadCachedMean(self, resultCache, cacheSources):
+        """
+        Load the daily mean irradiance from the cache, or calculate it from the cached
+        hourly matrix. Returns None if neither has been cached.
+        """
+        dailyRows = resultCache.get(cacheSources, _cacheKind("dailyMean", self.precision))
+        if dailyRows is not None:
+            return dailyRows if np is not None else [list(val) for val in zip(*dailyRows)]
+
+        hourlyRows = resultCache.get(cacheSources, _cacheKind("sunHourly", self.precision))
+        if hourlyRows is None:
+            return None
+
+        # The first column of the cached matrix is the hour of the year.
+        if np is not None:
+            hourIndex = hourlyRows[:, 0].astype(int)
+            radDataSet = hourlyRows[:, 1:]
+        else:
+            hourIndex = [int(rowData[0]) for rowData in hourlyRows]
+            radDataSet = [rowData[1:] for rowData in hourlyRows]
+
+        dailyMean = self._calcDailyMean(radDataSet, hourIndex)
+        resultCache.put(cacheSources, _cacheKind("dailyMean", self.precision),
+                        _dailyRows(dailyMean))
+        return dailyMean
+
+    def _scaled(self, values):
+        """DLI values as a list from an array of stored values."""
+        if self._dliScale is not None:
+            # Scaled in float64, so the values are only rounded once (when they are stored).
+            values = values.astype(np.float64) * self._dliScale
+        return values.tolist()
+
+    def _dayValues(self, dayIdx):
+        """DLI of every point for a day (0-364)."""
+        if self._dliDailyArray is not None:
+            return self._scaled(self._dliDailyArray[dayIdx])
+        return [ptsData[dayIdx] for ptsData in self._dliDailyList]
+
+    def _pointValues(self, ptsIdx, startDay=0, endDay=365):
+        """DLI of a point for the days startDay to endDay (0-365, end excluded)."""
+        if self._dliDailyArray is not None:
+            return self._scaled(self._dliDailyArray[startDay:endDay, ptsIdx])
+        return list(self._dliDailyList[ptsIdx][startDay:endDay])
+
+    def seasonStats(self, growingSeason, relativeAccuracy=None):
+        """
+        SeasonStats of the average DLI of every point over a growing season (a list of
+        months), calculated once for every season and kept with the data.
+        """
+        key = (stats.seasonKey(growingSeason), relativeAccuracy)
+        if key not in self._seasonStats:
+            self._seasonStats[key] = stats.calcSeasonStats(self, key[0], relativeAccuracy)
+        return self._seasonStats[key]
+
+    def dayDLI(self, doy):
+        """DLI of every point for a day of the year (1-365), without reading the other days."""
+        assert doy in range(1, 366), "The value for doy (%s) must be between 1 and 365" % doy
+        return self._dayValues(doy - 1)
+
+    def dailyView(self, byPoint=True):
+        """
+        DailyView of the DLI for the year, i.e. a (numPoints x 365) matrix or, if byPoint
+        is False, a (365 x numPoints) matrix that is not copied.
+        """
+        return DailyView(self, 0, 365, byPoint)
+
+    def monthView(self, monthNum, byPoint=True):
+        """DailyView of the DLI for the days of a month (1-12)."""
+        monthSliceStart, monthSliceEnd = self._monthSlice(monthNum)
+        return DailyView(self, monthSliceStart, monthSliceEnd, byPoint)
+
+    @property
+    def dliDailyData(self):
+        """DLI values as a (numPoints x 365) nested list."""
+        if self._dliDailyList is None:
+            if self._dliScale is not None:
+                self._dliDailyList = (self._dliDailyArray.T.astype(np.float64) *
+                                      self._dliScale).tolist()
+            else:
+                self._dliDailyList = self._dliDailyArray.T.tolist()
+        return self._dliDailyList
+
+    @profiling.profiled("readRadData")
+    def _readRadData(self, radFilePath, ptsFilePath):
+
+        assert os.path.exists(
+            ptsFilePath), "The pts file (%s) was not found." % ptsFilePath
+
+        if isinstance(radFilePath, str):
+            assert os.path.exists(
+                radFilePath), "The rad file (%s) was not found." % radFilePath
+
+            radDataSet = radparse.parseRadFile(radFilePath, 3)
+        else:
+            radDataSet = radFilePath
+
+        ptsLength = radparse.countRows(ptsFilePath)
+        radLength = len(radDataSet[0])
+
+        assert ptsLength == radLength, "The number of data points in points file (%s) " \
+                                       "and rad file (%s) must be the same." % (
+        ptsLength, radLength)
+
+        return radDataSet
+
+    @profiling.profiled("calcDailyMean")
+    def _calcDailyMean(self, radDataSet, hourIndex):
+        """
+        Reduce the (hours x numPoints) matrix to the daily mean irradiance. The rows are
+        summed into the day of the year given by hourIndex, hours that are not present
+        are treated as zero.
+        """
+        assert len(hourIndex) == len(radDataSet), \
+            "The number of hours in hourIndex (%s) and rows in the results (%s) must be " \
+            "the same." % (len(hourIndex), len(radDataSet))
+        assert all(0 <= hourIdx < 8760 for hourIdx in hourIndex), \
+            "The values in hourIndex must be between 0 and 8759."
+        assert len(set(hourIndex)) == len(hourIndex), \
+            "The values in hourIndex must be unique."
+
+        if np is not None:
+            radDataSet = _floatArray(radDataSet)
+            hourCount, ptsCount = radDataSet.shape
+
+            if hourCount == 8760 and (np.asarray(hourIndex) == np.arange(8760)).all():
+                # (8760 x numPoints) -> (365 x 24 x numPoints) -> (365 x numPoints)
+                dailySums = radDataSet.reshape(365, 24, ptsCount).sum(axis=1, dtype=np.float64)
+                return _dailySumsToMean(dailySums)
+        else:
+            ptsCount = len(radDataSet[0]) if radDataSet else 0
+
+        dailySums = _accumulateDailySums(_newDailySums(ptsCount), radDataSet, hourIndex)
+        return _dailySumsToMean(dailySums)
+
+    @profiling.profiled("calcDailyMeanChunked")
+    def _calcDailyMeanChunked(self, radFilePath, ptsFilePath, memoryBudget):
+        """
+        Calculate the daily mean irradiance while streaming the rad file in blocks of
+        hours, so that only one block and the daily sums are held in memory.
+        """
+        assert os.path.exists(
+            radFilePath), "The rad file (%s) was not found." % radFilePath
+
+        assert os.path.exists(
+            ptsFilePath), "The pts file (%s) was not found." % ptsFilePath
+
+        ptsLength = radparse.countRows(ptsFilePath)
+        dailySums = _newDailySums(ptsLength)
+
+        hourCount = 0
+        for radRows in radparse.iterRadBlocks(radFilePath, 3, _chunkBlockSize(memoryBudget)):
+            assert ptsLength == len(radRows[0]), \
+                "The number of data points in points file (%s) and rad file (%s) must be " \
+                "the same." % (ptsLength, len(radRows[0]))
+            assert hourCount + len(radRows) <= 8760, \
+                "The rad file (%s) has more than 8760 rows." % radFilePath
+
+            hourIndex = list(range(hourCount, hourCount + len(radRows)))
+            _accumulateDailySums(dailySums, radRows, hourIndex)
+            hourCount += len(radRows)
+
+        return _dailySumsToMean(dailySums)
+
+    @property
+    def _cumDLI(self):
+        """
+        Cumulative sum of the daily DLI values over the year, with a leading row of zeros,
+        i.e. a (366 x numPoints) array or a numPoints x 366 nested list. The sum for any
+        range of days is the difference between two rows of this table.
+        """
+        if self._dliCumSum is None:
+            assert self.dataSize[-1] == 365, \
+                "The dataset provided as input has incorrect number of data (%s) per " \
+                "point" % (self.dataSize[-1])
+
+            if self._dliDailyArray is not None:
+                # Summed and scaled in float64 whatever the storage precision.
+                self._dliCumSum = np.zeros((366, self._dliDailyArray.shape[1]), dtype=np.float64)
+                np.cumsum(self._dliDailyArray, axis=0, dtype=np.float64, out=self._dliCumSum[1:])
+                if self._dliScale is not None:
+                    self._dliCumSum *= self._dliScale
+            else:
+                self._dliCumSum = []
+                for ptsData in self.dliDailyData:
+                    cumSum = 0
+                    cumList = [0]
+                    for dliVal in ptsData:
+                        cumSum += dliVal
+                        cumList.append(cumSum)
+                    self._dliCumSum.append(cumList)
+
+        return self._dliCumSum
+
+    def dliRange(self, startDoy, endDoy, reduce="mean"):
+        """
+        Average (reduce='mean') or cumulative (reduce='sum') DLI for every point over the
+        days startDoy to endDoy (1 to 365, both included). If startDoy is greater than
+        endDoy, the range wraps around the end of the year, e.g. (335, 59) for Dec-Feb.
+        """
+        assert startDoy in range(1, 366) and endDoy in range(1, 366), \
+            "The values for startDoy (%s) and endDoy (%s) must be between 1 and 365" % (
+                startDoy, endDoy)
+        assert reduce in ("mean", "sum"), \
+            "The value for reduce (%s) must be either 'mean' or 'sum'" % reduce
+
+        cumDLI = self._cumDLI
+
+        if startDoy <= endDoy:
+            dayCount = endDoy - startDoy + 1
+            if self._dliDailyArray is not None:
+                rangeData = cumDLI[endDoy] - cumDLI[startDoy - 1]
+            else:
+                rangeData = [cumList[endDoy] - cumList[startDoy - 1] for cumList in cumDLI]
+        else:
+            dayCount = 365 - startDoy + 1 + endDoy
+            if self._dliDailyArray is not None:
+                rangeData = cumDLI[365] - cumDLI[startDoy - 1] + cumDLI[endDoy]
+            else:
+                rangeData = [cumList[365] - cumList[startDoy - 1] + cumList[endDoy] for
+                             cumList in cumDLI]
+
+        if reduce == "mean":
+            if self._dliDailyArray is not None:
+                rangeData = rangeData / dayCount
+            else:
+                rangeData = [val / dayCount for val in rangeData]
+
+        return rangeData.tolist() if self._dliDailyArray is not None else rangeData
+
+    def _monthSlice(self, monthNum):
+        assert monthNum in range(1, 13), \
+            "The input for monthNum (%s) must be a number between 1 (Jan) and 12 (Dec)" % monthNum
+
+        return _monthDateSum[monthNum - 1:monthNum + 1]
+
+    def avgDLIMonthly(self, monthNum):
+        monthSliceStart, monthSliceEnd = self._monthSlice(monthNum)
+
+        return self.dliRange(monthSliceStart + 1, monthSliceEnd, "mean")
+
+       #Cumulative DLI for an entire month.
+    def cmuDLIMonthly(self, monthNum):
+        monthSliceStart, monthSliceEnd = self._monthSlice(monthNum)
+
+        return self.dliRange(monthSliceStart + 1, monthSliceEnd, "sum")
+
+    @property
+    def dataSize(self):
+        if self._dliDailyArray is not None:
+            return (self._dliDailyArray.shape[1], self._dliDailyArray.shape[0])
+        return (len(self.dliDailyData), len(self.dliDailyData[0]))
+
+    @property
+    def avgDLIAnnual(self):
+        return self.dliRange(1, 365, "mean")
+
+    @property
+    def cmuDLIAnnual(self):
+        return self.dliRange(1, 365, "sum")
+
+    def ToString(self):
+        return "DLI data generated for %s points for %s days" % self.dataSize
+
+
+@profiling.profiled("consolidate_results")
+def consolidate_results(results, sun_hours):
+    """Locate all the files required for the calculation."""
+    assert os.path.exists(results), 'The results file %s was not found. Are the paths ' \
+                                    'correct?' % results
+
+    dirPath, resFile = os.path.split(results)
+
+    rootFolder = (os.path.dirname(os.path.dirname(dirPath)))
+
+    # need this for locating the pts file.
+    resId, ext = os.path.splitext(resFile)
+
+    weaFilePath = [os.path.join(rootFolder, val) for val in os.listdir(rootFolder) if
+                   val.lower().endswith('.wea')][0]
+
+    ptsFilePath = os.path.join(rootFolder, 'model', 'grid', '%s.pts' % resId)
+
+    return {'rad_rad': results, 'wea': weaFilePath, 'sun_hours': sun_hours,
+            'pts': ptsFilePath,
+            'root_dir': rootFolder}
+
+
+@profiling.profiled("align_sun_hours")
+def align_sun_hours(res_dict):
+    """
+    Match the sun-hour results with the hours of the wea file. Returns the position of
+    every sun hour in the results, the hour of the year (0-8759) for each of them and
+    the month, day and hour values from the wea file.
+    """
+    sun_hours_path = res_dict['sun_hours']
+    wea_path = res_dict['wea']
+
+    profiling.addBytes(os.path.getsize(sun_hours_path) + os.path.getsize(wea_path))
+    with open(sun_hours_path) as sunData:
+        sunList = list(map(float, sunData.read().split()))
+
+    weaHourList = []
+    with open(wea_path) as weaData:
+        for lines in weaData:
+            try:
+                lineSplit = list(map(float, lines.strip().split()))
+                weaHourList.append(lineSplit[:3])
+            except ValueError:
+                pass  #
+
+    # Map every hour of the year (0-8759) to the position of its value in the sun-hour
+    # results. Sun hours are stored as the mid-point of the hour, e.g. 5.5.
+    sunHourIndex = {}
+    for sunIdx, sunHour in enumerate(sunList):
+        hourIdx = sunHour - 0.5
+        if hourIdx == int(hourIdx):
+            sunHourIndex.setdefault(int(hourIdx), sunIdx)
+
+    hourIdxList = [hourIdx for hourIdx in sorted(sunHourIndex) if hourIdx < len(weaHourList)]
+    sunIdxList = [sunHourIndex[hourIdx] for hourIdx in hourIdxList]
+
+    return sunIdxList, hourIdxList, weaHourList
+
+
+@profiling.profiled("prep_rad_file")
+def prep_rad_file(res_dict, output_path=None, debug=False, precision="float64"):
+    """
+    Align the sun-hour results with the hours of the wea file. Returns a (numSunHours x
+    numPoints) matrix, the hour of the year (0-8759) for every row of the matrix and the
+    path of the pts file. The results are only written to a rad file, with zeros for the
+    hours without sun, if debug is True or an output_path is provided. With numpy, the
+    matrix is stored as float32 for any precision other than float64.
+    """
+    rad_rad_path = res_dict['rad_rad']
+    pts_path = res_dict['pts']
+
+    sunIdxList, hourIdxList, weaHourList = align_sun_hours(res_dict)
+
+    # (numPoints x numSunHours)
+    with profiling.stage("parseRadFile"):
+        radList = radparse.parseRadFile(rad_rad_path)
+    ptsListLen = len(radList)
+
+    # (numSunHours x numPoints). Only the hours with sun are kept.
+    with profiling.stage("transpose"):
+        if np is not None:
+            radData = radList[:, sunIdxList].T.astype(_hourlyDtype(precision), copy=False)
+        else:
+            radList = list(zip(*radList))
+            radData = [list(radList[sunIdx]) for sunIdx in sunIdxList]
+
+    if debug or output_path:
+        output_path = output_path or tempfile.mktemp(dir=res_dict['root_dir'], suffix='.rad')
+        radRows = dict(zip(hourIdxList, radData.tolist() if np is not None else radData))
+        zeroList = [0] * ptsListLen
+        with open(output_path, 'w') as output_stream:
+            for idx, hourVal in enumerate(weaHourList):
+                write_val = " ".join(map(str, hourVal + radRows.get(idx, zeroList)))
+                output_stream.write(write_val + '\n')
+
+        print('The temporary results file was saved as %s' % output_path)
+
+    return radData, hourIdxList, pts_path
+
+
+def calc_sun_hour_dli(res_dict, conversionFactor=3.72, memoryBudget=DEFAULT_MEMORY_BUDGET,
+                      precision="float64"):
+    """
+    Calculate the daily DLI straight from the sun-hour results while streaming them in
+    blocks of points, so that only one block and the (365 x numPoints) DLI matrix are
+    held in memory. Returns the DLI matrix in the format used by DLIdata.fromDailyData.
+    """
+    return _scaleDailyData(calc_sun_hour_mean(res_dict, memoryBudget, precision),
+                           _dliFactor(conversionFactor))
+
+
+@profiling.profiled("calc_sun_hour_mean")
+def calc_sun_hour_mean(res_dict, memoryBudget=DEFAULT_MEMORY_BUDGET, precision="float64",
+                       ptsStart=0, ptsEnd=None):
+    """
+    Same as calc_sun_hour_dli, but returns the daily mean irradiance (W/m2), which does
+    not depend on the conversion factor, in the format used by DLIdata.fromDailyMean.
+    With numpy, the values of every block are calculated in float64 and stored in
+    float32 for any precision other than float64.
+
+    If ptsStart or ptsEnd are provided, only the points ptsStart to ptsEnd (end
+    excluded) are calculated and the file is not read beyond them.
+    """
+    rad_rad_path = res_dict['rad_rad']
+    pts_path = res_dict['pts']
+
+    assert os.path.exists(pts_path), "The pts file (%s) was not found." % pts_path
+
+    sunIdxList, hourIdxList, weaHourList = align_sun_hours(res_dict)
+    ptsLength = radparse.countRows(pts_path)
+    ptsEnd = ptsLength if ptsEnd is None else ptsEnd
+    assert 0 <= ptsStart <= ptsEnd <= ptsLength, \
+        "The point range (%s, %s) must be within the %s points of %s" % (
+            ptsStart, ptsEnd, ptsLength, pts_path)
+
+    dailyMean = np.zeros((365, ptsEnd - ptsStart), dtype=_hourlyDtype(precision)) if \
+        np is not None else []
+
+    rowIdx = 0
+    for radRows in radparse.iterRadBlocks(rad_rad_path, 0, _chunkBlockSize(memoryBudget)):
+        blockStart = rowIdx
+        rowIdx += len(radRows)
+        if rowIdx <= ptsStart:
+            continue
+        radRows = radRows[max(ptsStart - blockStart, 0):ptsEnd - blockStart]
+        blockStart = max(blockStart, ptsStart) - ptsStart
+
+        # (numSunHours x numBlockPoints)
+        if np is not None:
+            hourRows = radRows[:, sunIdxList].T
+        else:
+            hourRows = list(zip(*[[rowData[idx] for idx in sunIdxList] for rowData in radRows]))
+
+        dailySums = _accumulateDailySums(_newDailySums(len(radRows)), hourRows, hourIdxList)
+        blockMean = _dailySumsToMean(dailySums)
+
+        if np is not None:
+            dailyMean[:, blockStart:blockStart + len(radRows)] = blockMean
+        else:
+            dailyMean.extend(blockMean)
+        if ptsEnd < ptsLength and rowIdx >= ptsEnd:
+            break
+
+    assert ptsLength == rowIdx or ptsEnd < ptsLength and rowIdx >= ptsEnd, \
+        "The number of data points in points file (%s) and rad file (%s) must be the " \
+        "same." % (ptsLength, rowIdx)
+
+    return dailyMean
+
+
+@profiling.profiled("calc_grid_dli")
+def calc_grid_dli(resPath, sunHoursPath, conversionFactor=3.72, resultCache=None,
+                  debug=False, memoryBudget=None, precision="float64"):
+    """
+    Calculate the DLIdata for a single result grid, using the cache if available. If
+    memoryBudget (in bytes) is provided, the results are streamed in blocks of points
+    with calc_sun_hour_dli instead of being loaded at once. See DLIdata for precision.
+    """
+    _checkPrecision(precision)
+    res_dict = consolidate_results(resPath, sunHoursPath)
+    # The pts file is part of the key, so editing it discards the cached results and the
+    # number of points is checked again.
+    cacheSources = [res_dict['rad_rad'], res_dict['sun_hours'], res_dict['wea'],
+                    res_dict['pts']]
+
+    dailyKind = _cacheKind("dailyMean", precision)
+    if memoryBudget and not (resultCache is not None and
+                             resultCache.contains(cacheSources, dailyKind)):
+        dailyMean = calc_sun_hour_mean(res_dict, memoryBudget, precision)
+        if resultCache is not None:
+            resultCache.put(cacheSources, dailyKind, _dailyRows(dailyMean))
+        return DLIdata.fromDailyMean(dailyMean, conversionFactor, precision)
+
+    if resultCache is not None and DLIdata.isCached(resultCache, cacheSources, precision):
+        radData, hourIndex, ptsFilePath = None, None, res_dict['pts']
+    else:
+        radData, hourIndex, ptsFilePath = prep_rad_file(res_dict, debug=debug,
+                                                        precision=precision)
+
+    return DLIdata(radData, ptsFilePath, conversionFactor, resultCache, cacheSources,
+                   hourIndex, precision=precision)
+
+
+def _calcGridDLIWorker(args):
+    """
+    Wrapper around calc_grid_dli that returns the error instead of raising it, so that
+    a failed grid does not abort the batch. This function is for internal use only.
+    """
+    try:
+        return calc_grid_dli(*args), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+def calc_dli_batch(resPaths, sunHoursPath, conversionFactor=3.72, resultCache=None,
+                   workers=None, debug=False, memoryBudget=None, precision="float64"):
+    """
+    Calculate the DLIdata for multiple result grids, with every grid parsed and reduced
+    in its own worker process. workers defaults to the number of cpus, if it is 1 or
+    multiprocessing is not available (e.g. IronPython) the grids are processed one
+    after the other.
+
+    Returns a list of DLIdata and a list of error messages, both in the order of
+    resPaths. For a grid that failed, the DLIdata is None and the error message
+    describes the failure. For all other grids the error message is None.
+
+    memoryBudget and precision are applied to every worker, see calc_grid_dli.
+    """
+    taskArgs = [(resPath, sunHoursPath, conversionFactor, resultCache, debug, memoryBudget,
+                 precision) for resPath in resPaths]
+
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+    except ImportError:
+        ProcessPoolExecutor = None
+
+    if not workers:
+        workers = os.cpu_count() if hasattr(os, "cpu_count") else 1
+    workers = max(1, min(workers, len(taskArgs)))
+
+    if ProcessPoolExecutor is None or workers == 1:
+        results = [_calcGridDLIWorker(args) for args in taskArgs]
+    else:
+        results = [None] * len(taskArgs)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_calcGridDLIWorker, args) for args in taskArgs]
+            for idx, future in enumerate(futures):
+                try:
+                    results[idx] = future.result()
+                except Exception:
+                    # The worker process itself failed, e.g. it ran out of memory.
+                    results[idx] = None, traceback.format_exc()
+
+    dliDataList = [dliData for dliData, error in results]
+    errorList = [error for dliData, error in results]
+    return dliDataList, errorList
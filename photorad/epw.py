@@ -0,0 +1,239 @@
+"""Columnar reader for EnergyPlus weather (epw) files.
+
+All the hourly rows of a weather file are parsed in one pass into a float64 array per
+field. The parsed year is stored in a binary cache file keyed by the hash of the
+contents of the epw file, so that later reads (in this or any other session) only hash
+the file and load the arrays:
+
+    8 bytes  magic (b"PREPW001")
+    4 bytes  number of rows (uint32, little endian)
+    4 bytes  number of fields (uint32, little endian), the first fields of EPW_FIELDS
+    rows * fields * 8 bytes  float64 values (little endian), one field after another
+
+The cache files are written to the same sidecar directory as the result cache, or the
+temp folder if that location is not writable, and count towards the disk budget of the
+result cache (cache.DEFAULT_MAX_BYTES), which evicts the least recently used files.
+"""
+
+from __future__ import division
+
+import array
+import os
+import struct
+import sys
+import tempfile
+
+from photorad import cache, profiling
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_MAGIC = b"PREPW001"
+_HEADER = struct.Struct("<8sII")
+_EXTENSION = ".pwy"
+
+# Number of header lines before the hourly data.
+HEADER_LINES = 8
+
+# Numeric fields of the hourly data and their column in the epw file. The data source
+# flags (column 5) and the present weather observation and codes (columns 26 and 27)
+# are not parsed.
+EPW_FIELDS = [("year", 0), ("month", 1), ("day", 2), ("hour", 3), ("minute", 4),
+              ("dryBulbTemperature", 6), ("dewPointTemperature", 7),
+              ("relativeHumidity", 8), ("atmosphericStationPressure", 9),
+              ("extraterrestrialHorizontalRadiation", 10),
+              ("extraterrestrialDirectNormalRadiation", 11),
+              ("horizontalInfraredRadiationIntensity", 12),
+              ("globalHorizontalRadiation", 13), ("directNormalRadiation", 14),
+              ("diffuseHorizontalRadiation", 15), ("globalHorizontalIlluminance", 16),
+              ("directNormalIlluminance", 17), ("diffuseHorizontalIlluminance", 18),
+              ("zenithLuminance", 19), ("windDirection", 20), ("windSpeed", 21),
+              ("totalSkyCover", 22), ("opaqueSkyCover", 23), ("visibility", 24),
+              ("ceilingHeight", 25), ("precipitableWater", 28),
+              ("aerosolOpticalDepth", 29), ("snowDepth", 30), ("daysSinceLastSnowfall", 31),
+              ("albedo", 32), ("liquidPrecipitationDepth", 33),
+              ("liquidPrecipitationQuantity", 34)]
+
+# Weather years read in this process, keyed by the path, size and modification time.
+_weatherYearCache = {}
+
+
+def parseLocation(locationLine):
+    """Fields of the LOCATION header line as a dictionary."""
+    lineSplit = [val.strip() for val in locationLine.strip().split(",")]
+    assert lineSplit[0].lower() == "location" and len(lineSplit) >= 10, \
+        "The line (%s) is not a valid LOCATION header" % locationLine.strip()
+
+    # The coordinates are read from the end of the line, in case the city name contains
+    # commas.
+    return {"city": lineSplit[1], "state": lineSplit[2], "country": lineSplit[3],
+            "source": lineSplit[4], "wmo": lineSplit[5],
+            "latitude": float(lineSplit[-4]), "longitude": float(lineSplit[-3]),
+            "timeZone": float(lineSplit[-2]), "elevation": float(lineSplit[-1])}
+
+
+class WeatherYear(object):
+    """
+    The hourly data of a weather file as one array per field, e.g.
+    weatherYear["diffuseHorizontalRadiation"]. The arrays are numpy arrays, or
+    array.array("d") if numpy is not available.
+    """
+
+    def __init__(self, location, columns, sourceFile=None):
+        self.location = location
+        self.sourceFile = sourceFile
+        self._columns = columns
+        self.fields = [fieldName for fieldName, _ in EPW_FIELDS if fieldName in columns]
+
+    @property
+    def rowCount(self):
+        return len(self._columns[self.fields[0]])
+
+    def __getitem__(self, fieldName):
+        return self._columns[fieldName]
+
+    def __contains__(self, fieldName):
+        return fieldName in self._columns
+
+    def dailyValues(self, fieldName):
+        """Values of a field as (days x 24) rows. A view of the column with numpy."""
+        values = self._columns[fieldName]
+        dayCount = self.rowCount // 24
+        if np is not None:
+            return values[:dayCount * 24].reshape(dayCount, 24)
+        return [values[idx * 24:(idx + 1) * 24] for idx in range(dayCount)]
+
+    def dailyPhotoPeriod(self, hourCount=24):
+        """
+        Number of hours with diffuse radiation (i.e. visible light) for every day. Only
+        the first hourCount hours of every day are counted.
+        """
+        dailyDiffRad = self.dailyValues("diffuseHorizontalRadiation")
+        if np is not None:
+            return (dailyDiffRad[:, :hourCount] != 0).sum(axis=1).tolist()
+        return [len([val for val in dayList[:hourCount] if val]) for dayList in dailyDiffRad]
+
+    def ToString(self):
+        return "Weather data for %s-%s-%s (%s hours, %s fields)" % (
+            self.location["city"], self.location["state"], self.location["country"],
+            self.rowCount, len(self.fields))
+
+    def __str__(self):
+        return self.ToString()
+
+
+def _parseDataLines(dataLines):
+    """Convert the hourly lines of an epw file to a dictionary of field arrays."""
+    rows = [line.split(",") for line in dataLines if line.strip()]
+    assert rows, "The epw file does not contain any hourly data"
+
+    fieldCount = min(len(row) for row in rows)
+    fields = [(fieldName, column) for fieldName, column in EPW_FIELDS if column < fieldCount]
+
+    if np is not None:
+        textMatrix = np.array([row[:fieldCount] for row in rows])
+        return dict((fieldName, textMatrix[:, column].astype(np.float64)) for
+                    fieldName, column in fields)
+
+    textColumns = list(zip(*rows))
+    return dict((fieldName, array.array("d", map(float, textColumns[column]))) for
+                fieldName, column in fields)
+
+
+def _cachePaths(epwFilePath, contentHash):
+    fileName = contentHash + _EXTENSION
+    sidecarDir = os.path.join(os.path.dirname(os.path.abspath(epwFilePath)),
+                              cache.CACHE_DIR_NAME)
+    return [os.path.join(sidecarDir, fileName), os.path.join(tempfile.gettempdir(), fileName)]
+
+
+def _writeColumns(filePath, columns):
+    fieldNames = [fieldName for fieldName, _ in EPW_FIELDS if fieldName in columns]
+    rowCount = len(columns[fieldNames[0]])
+
+    cacheDir = os.path.dirname(filePath)
+    if not os.path.exists(cacheDir):
+        os.makedirs(cacheDir)
+
+    tempPath = "%s.%s.tmp" % (filePath, os.getpid())
+    with open(tempPath, "wb") as outputStream:
+        outputStream.write(_HEADER.pack(_MAGIC, rowCount, len(fieldNames)))
+        for fieldName in fieldNames:
+            if np is not None:
+                np.asarray(columns[fieldName], dtype="<f8").tofile(outputStream)
+            else:
+                values = array.array("d", columns[fieldName])
+                if sys.byteorder == "big":
+                    values.byteswap()
+                values.tofile(outputStream)
+    if os.path.exists(filePath):
+        os.remove(filePath)
+    os.rename(tempPath, filePath)
+
+
+def _readColumns(filePath):
+    with open(filePath, "rb") as inputStream:
+        magic, rowCount, fieldCount = _HEADER.unpack(inputStream.read(_HEADER.size))
+        assert magic == _MAGIC, "The file %s is not a PhotoRad weather cache file" % filePath
+
+        columns = {}
+        for fieldName, _ in EPW_FIELDS[:fieldCount]:
+            if np is not None:
+                columns[fieldName] = np.fromfile(inputStream, dtype="<f8", count=rowCount)
+            else:
+                values = array.array("d")
+                values.fromfile(inputStream, rowCount)
+                if sys.byteorder == "big":
+                    values.byteswap()
+                columns[fieldName] = values
+    return columns
+
+
+@profiling.profiled("readEPW")
+def readEPW(epwFilePath, useCache=True):
+    """
+    Read a weather file into a WeatherYear. If useCache is True, the parsed data is
+    loaded from (or stored in) the binary cache, and the WeatherYear is shared with
+    other calls for the same file in this process.
+    """
+    assert os.path.exists(epwFilePath), \
+        "The path provided for the epw file (%s) is not valid" % epwFilePath
+
+    fileStat = os.stat(epwFilePath)
+    memoKey = (os.path.abspath(epwFilePath), fileStat.st_size, fileStat.st_mtime)
+    if useCache and memoKey in _weatherYearCache:
+        return _weatherYearCache[memoKey]
+
+    with open(epwFilePath) as epwData:
+        headerLines = [epwData.readline() for _ in range(HEADER_LINES)]
+        location = parseLocation(headerLines[0])
+
+        columns = None
+        if useCache:
+            cachePaths = _cachePaths(epwFilePath, cache.fileHash(epwFilePath))
+            for cachePath in cachePaths:
+                if os.path.exists(cachePath):
+                    columns = _readColumns(cachePath)
+                    # The modification time of a cache file records when it was last used.
+                    os.utime(cachePath, None)
+                    profiling.addBytes(os.path.getsize(cachePath))
+                    break
+
+        if columns is None:
+            profiling.addBytes(fileStat.st_size)
+            columns = _parseDataLines(epwData.readlines())
+            if useCache:
+                for cachePath in cachePaths:
+                    try:
+                        _writeColumns(cachePath, columns)
+                    except (IOError, OSError):
+                        continue
+                    cache.ResultCache().evict(os.path.dirname(cachePath))
+                    break
+
+    weatherYear = WeatherYear(location, columns, epwFilePath)
+    if useCache:
+        _weatherYearCache[memoKey] = weatherYear
+    return weatherYear
@@ -0,0 +1,104 @@
+"""Location, soil (hardiness zone) and photoperiod data for a weather file."""
+
+import calendar
+import os
+import statistics
+
+from photorad import epw, profiling, soil
+
+
+class LocationData(object):
+    """Instantiate a class  """
+
+    @profiling.profiled("LocationData")
+    def __init__(self,epwFilePath,soilDataAbsPath):
+
+        epwSourceDict=self._retrieveEPWdata(epwFilePath)
+        soilDatabase=self._acquireSoilData(soilDataAbsPath=soilDataAbsPath)
+        locationSoilDataDict=self._calcLocationSoilData(soilDatabase,epwSourceDict)
+
+        self.sourceFile=epwFilePath
+        self.soilData=soilDatabase
+        self.longitude=epwSourceDict["longitude"]
+        self.latitude=epwSourceDict["latitude"]
+        self.location=epwSourceDict["location"]
+        self.difRadData=epwSourceDict["difRadData"]
+        self.weatherYear=epwSourceDict["weatherYear"]
+        self.hardinessZone=locationSoilDataDict["zone"]
+        self.tmin=locationSoilDataDict["tmin"]
+        self.tmax=locationSoilDataDict["tmax"]
+        self.zipMatch=locationSoilDataDict["zipMatch"]
+        self.longitudeMatch=locationSoilDataDict["lonMatch"]
+        self.latitudeMatch=locationSoilDataDict["latMatch"]
+        self.matchDistance=locationSoilDataDict["distance"]
+
+    @property
+    def sourceFile(self):
+        return self._sourceFile
+
+    @sourceFile.setter
+    def sourceFile(self,epwPath):
+        assert os.path.exists(epwPath),"The path provided for the epw file (%s) is not valid"%epwPath
+        self._sourceFile=epwPath
+
+
+    @profiling.profiled("nearestSoilRecord")
+    def _calcLocationSoilData(self,soilDatabase,epwDict):
+        """Find the soil record nearest (great-circle distance) to the location."""
+
+        lon=epwDict["longitude"]
+        lat=epwDict["latitude"]
+
+        nearestRecord=soilDatabase.nearest(lat,lon,k=1)[0]
+
+        return {"zone":nearestRecord["zone"],"tmin":nearestRecord["tmin"],"tmax":nearestRecord["tmax"],
+                "zipMatch":nearestRecord["zip"],"lonMatch":nearestRecord["lon"],
+                "latMatch":nearestRecord["lat"],"distance":nearestRecord["distance"]}
+
+
+    @profiling.profiled("soilDatabase")
+    def _acquireSoilData(self,soilDataAbsPath):
+        """Check if the soil hardiness data exists and load the compact (memory-mapped) database of
+        zip-code based values. The json file is converted once and the database is shared by all the instances."""
+
+        return soil.getSoilDatabase(soilDataAbsPath)
+
+    def _retrieveEPWdata(self,epwFilePath):
+        """Read the columns of the epw file. The parsed weather year is cached (keyed by the hash of the file)."""
+
+        weatherYear=epw.readEPW(epwFilePath)
+        locationFields=weatherYear.location
+
+        epwSourceDict={"location":None,"longitude":None,"latitude":None,"difRadData":[]}
+        epwSourceDict["location"]="-".join(locationFields[key].replace(" ","_") for key in ("city","state","country"))
+        epwSourceDict["longitude"]=round(locationFields["longitude"],3)
+        epwSourceDict["latitude"]=round(locationFields["latitude"],3)
+        epwSourceDict["difRadData"]=weatherYear["diffuseHorizontalRadiation"].tolist()
+        epwSourceDict["weatherYear"]=weatherYear
+
+        return epwSourceDict
+
+
+    @property
+    def dailyPhotoPeriod(self):
+        # The photoperiod is counted over the first 23 hours of every day.
+        return self.weatherYear.dailyPhotoPeriod(hourCount=23)[:365]
+
+    @property
+    def monthlyPhotoPeriodAvg(self):
+        dailyPhotoPeriod=self.dailyPhotoPeriod
+        daysInMonths=[calendar.monthrange(2013,monthNum)[-1] for monthNum in range(1,13) ]
+        daysInMonthSum=[(sum(daysInMonths[:idx]),sum(daysInMonths[:idx+1])) for idx in range(12)]
+        monthlyPhotoPeriods=[dailyPhotoPeriod[idx[0]:idx[1]] for idx in daysInMonthSum]
+        monthlyPhotoPeriodAverage=[round(statistics.mean(monthHours),2) for monthHours in monthlyPhotoPeriods]
+        return monthlyPhotoPeriodAverage
+
+    def ToString(self):
+        """Placeholder for description about """
+        summaryList=["Geographical and Soil Data for %s\n"%self.location]
+        summaryList.append("\tLatitude:%0.2f , Longitude: %0.2f"%(self.latitude,self.longitude))
+        summaryList.append("\tHardiness-Zone:%s , Tmin: %0.2f, Tmax: %0.2f"%(self.hardinessZone,self.tmin,self.tmax))
+        summaryList.append("\tAvg Photoperiod(Jan to Dec): (%s)"%(",".join(["%d"%val for val in self.monthlyPhotoPeriodAvg])))
+        summaryList.append("\n\nSoil-data matched in Database: Latitude:%0.2f , Longitude: %0.2f, ZipCode:%s, Distance: %0.1f km"%(self.latitudeMatch,self.longitudeMatch,self.zipMatch,self.matchDistance))
+        summaryList.append("Average Photoperiod calculated from diffuse radiation data in EPW file")
+        return "\n".join(summaryList)
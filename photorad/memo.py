@@ -0,0 +1,188 @@
+"""Memoization of component results across Grasshopper re-solves.
+
+Grasshopper runs a component again whenever anything upstream of it changes, even if
+its own inputs are the same. The components keep their results in a MemoCache stored
+in sc.sticky["photoRadDict"], keyed by the kind of result, the state (path, size and
+modification time) of the files it was derived from and its other parameters:
+
+    memoCache = memo.getMemoCache(sc.sticky)
+    locationData = memoCache.memoize("locationData", [epwFile, soilDataFile], (),
+                                     lambda: LocationData(epwFile, soilDataFile))
+
+A file that is modified gets a new fingerprint, so stale results are never returned
+and are eventually evicted. Parameters that are objects (e.g. the output of another
+component) are keyed by their identity, so memoized outputs keep downstream
+components memoized as well. These objects are kept with the entry, so that their id is
+not reused, and count towards its memory.
+"""
+
+from __future__ import division
+
+from collections import OrderedDict
+import os
+
+# Default bounds of a MemoCache.
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+# Types of the parameters that are keyed by value, all others are keyed by identity.
+_VALUE_TYPES = (type(None), bool, int, float, str)
+try:
+    _VALUE_TYPES += (unicode, long)
+except NameError:
+    pass
+
+
+def fileFingerprint(filePath):
+    """Absolute path, size and modification time of a file, None for both if missing."""
+    filePath = os.path.abspath(filePath)
+    if not os.path.exists(filePath):
+        return filePath, None, None
+    fileStat = os.stat(filePath)
+    return filePath, fileStat.st_size, fileStat.st_mtime
+
+
+def estimateBytes(value, depth=4, seen=None):
+    """
+    Approximate memory of a result: the nbytes of arrays (and of DLIdata and PlantTable),
+    32 bytes for every number (reference and object) and the items of lists, tuples and
+    dictionaries and the attributes of other objects, up to depth levels. Objects in seen
+    (a set of ids) are not counted again, so objects shared by several results are only
+    counted once.
+    """
+    if isinstance(value, _VALUE_TYPES):
+        return len(value) if hasattr(value, "__len__") else 32
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if hasattr(value, "nbytes"):
+        return value.nbytes
+    if not depth:
+        return 0
+    if isinstance(value, dict):
+        value = list(value.values())
+    elif hasattr(value, "__dict__"):
+        value = list(vars(value).values())
+    elif hasattr(value, "__slots__"):
+        value = [getattr(value, name, None) for name in value.__slots__]
+    if isinstance(value, (list, tuple)):
+        return 8 * len(value) + sum(estimateBytes(val, depth - 1, seen) for val in value)
+    return 0
+
+
+def _keyPart(value, keptObjects):
+    if isinstance(value, _VALUE_TYPES):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_keyPart(val, keptObjects) for val in value)
+    # The object is kept with the entry so that its id is not reused while cached.
+    keptObjects.append(value)
+    return ("id", id(value))
+
+
+class _MemoEntry(object):
+    __slots__ = ("kind", "sourceFiles", "value", "nbytes", "keptObjects")
+
+    def __init__(self, kind, sourceFiles, value, nbytes, keptObjects):
+        self.kind = kind
+        self.sourceFiles = sourceFiles
+        self.value = value
+        self.nbytes = nbytes
+        self.keptObjects = keptObjects
+
+
+class MemoCache(object):
+    """
+    Results keyed by their kind, source files and parameters, with the least recently
+    used entries evicted once there are more than maxEntries of them or their estimated
+    memory exceeds maxBytes.
+    """
+
+    def __init__(self, maxEntries=DEFAULT_MAX_ENTRIES, maxBytes=DEFAULT_MAX_BYTES):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def _key(self, kind, sourceFiles, params):
+        keptObjects = []
+        key = (kind, tuple(fileFingerprint(filePath) for filePath in sourceFiles),
+               _keyPart(params, keptObjects))
+        return key, keptObjects
+
+    def memoize(self, kind, sourceFiles, params, calculate, isValid=None):
+        """
+        Return the cached result for the kind, source files and parameters, or call
+        calculate() and cache its result. If isValid is provided, results for which it
+        returns False (e.g. partial failures) are returned but not cached.
+        """
+        key, keptObjects = self._key(kind, sourceFiles, params)
+        if key in self._entries:
+            self.hits += 1
+            entry = self._entries.pop(key)
+            self._entries[key] = entry
+            return entry.value
+
+        self.misses += 1
+        value = calculate()
+        if isValid is not None and not isValid(value):
+            return value
+        # The objects kept for the key count as well, they may outlive their own entries.
+        seen = set()
+        nbytes = estimateBytes(value, seen=seen) + sum(estimateBytes(obj, seen=seen) for obj in
+                                                       keptObjects)
+        self._entries[key] = _MemoEntry(kind, [os.path.abspath(val) for val in sourceFiles],
+                                        value, nbytes, keptObjects)
+        self.evict()
+        return value
+
+    @property
+    def nbytes(self):
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is within its bounds."""
+        totalBytes = self.nbytes
+        while self._entries and (len(self._entries) > self.maxEntries or
+                                 totalBytes > self.maxBytes):
+            _, entry = self._entries.popitem(last=False)
+            totalBytes -= entry.nbytes
+
+    def invalidate(self, kind=None, sourceFile=None):
+        """
+        Remove the entries of a kind and/or derived from a source file, or all of the
+        entries if neither is provided. Returns the number of entries removed.
+        """
+        sourceFile = os.path.abspath(sourceFile) if sourceFile else None
+        removeKeys = [key for key, entry in self._entries.items() if
+                      (kind is None or entry.kind == kind) and
+                      (sourceFile is None or sourceFile in entry.sourceFiles)]
+        for key in removeKeys:
+            del self._entries[key]
+        return len(removeKeys)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ToString(self):
+        return "%s cached results (%.1f MB), %s hits and %s misses" % (
+            len(self._entries), self.nbytes / 1024 ** 2, self.hits, self.misses)
+
+    def __str__(self):
+        return self.ToString()
+
+
+def getMemoCache(sticky):
+    """The MemoCache kept in sticky["photoRadDict"], created if it does not exist."""
+    photoRadDict = sticky.setdefault("photoRadDict", {})
+    if "memoCache" not in photoRadDict:
+        photoRadDict["memoCache"] = MemoCache()
+    return photoRadDict["memoCache"]
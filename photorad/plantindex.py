@@ -0,0 +1,215 @@
+"""Reverse queries over a plant catalogue: which plants grow at every point of a grid.
+
+The DLI ranges of the plants are indexed with an IntervalIndex for every growing season,
+so finding the plants whose range contains a DLI value takes O(log P + k) for P plants
+and k results instead of checking every plant:
+
+    plantIndex = PlantDLIIndex(plantData)
+    plantIndex.query([4, 5, 6], 18.5)       # indices of the plants for April to June
+    results = plantIndex.suitablePlants(dliData)
+
+suitablePlants returns every distinct list of plants once, with the index of the list
+for every point, as most points of a grid share the same plants.
+"""
+
+from __future__ import division
+
+import bisect
+
+from photorad import profiling
+from photorad.plants import PlantTable
+from photorad.stats import seasonKey
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class _IntervalNode(object):
+    __slots__ = ("center", "left", "right", "lowValues", "lowIds", "upValues", "upIds")
+
+    def __init__(self, center, intervals):
+        self.center = center
+        self.left = None
+        self.right = None
+        # The intervals containing the center, by ascending lower and descending upper bound.
+        byLow = sorted(intervals)
+        byUp = sorted(intervals, key=lambda val: val[1], reverse=True)
+        self.lowValues = [val[0] for val in byLow]
+        self.lowIds = [val[2] for val in byLow]
+        self.upValues = [val[1] for val in byUp]
+        self.upIds = [val[2] for val in byUp]
+
+
+class IntervalIndex(object):
+    """
+    Centered interval tree over closed intervals [lowList[i], upList[i]]. query returns
+    the ids (indices in the lists, unless ids is provided) of the intervals containing a
+    value in O(log n + k) time.
+    """
+
+    def __init__(self, lowList, upList, ids=None):
+        assert len(lowList) == len(upList), \
+            "The number of lower (%s) and upper (%s) bounds must be equal." % (len(lowList),
+                                                                               len(upList))
+        ids = list(range(len(lowList))) if ids is None else list(ids)
+        self.count = len(ids)
+        self._root = self._build([(float(low), float(up), idx) for low, up, idx in
+                                  zip(lowList, upList, ids)])
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        # The median of the bounds, so that at most half of the intervals are on either side.
+        bounds = sorted([val[0] for val in intervals] + [val[1] for val in intervals])
+        center = bounds[len(bounds) // 2]
+        node = _IntervalNode(center, [val for val in intervals if val[0] <= center <= val[1]])
+        node.left = self._build([val for val in intervals if val[1] < center])
+        node.right = self._build([val for val in intervals if val[0] > center])
+        return node
+
+    def query(self, value):
+        """Sorted ids of the intervals that contain value."""
+        ids = []
+        node = self._root
+        while node is not None:
+            if value < node.center:
+                ids.extend(node.lowIds[:bisect.bisect_right(node.lowValues, value)])
+                node = node.left
+            elif value > node.center:
+                for upValue, idx in zip(node.upValues, node.upIds):
+                    if upValue < value:
+                        break
+                    ids.append(idx)
+                node = node.right
+            else:
+                ids.extend(node.lowIds)
+                break
+        return sorted(ids)
+
+    def __len__(self):
+        return self.count
+
+
+def _regionKeys(values, bounds):
+    """
+    Key of the region of the sorted, distinct bounds that every value falls in: 2*i for
+    the values between bounds[i-1] and bounds[i] and 2*i+1 for the values equal to
+    bounds[i]. The intervals containing a value are the same for every value of a region.
+    """
+    if np is not None:
+        values = np.asarray(values, dtype=np.float64)
+        bounds = np.asarray(bounds, dtype=np.float64)
+        boundIdx = np.searchsorted(bounds, values)
+        isBound = bounds[np.minimum(boundIdx, len(bounds) - 1)] == values if len(bounds) else \
+            np.zeros(len(values), dtype=bool)
+        return 2 * boundIdx + isBound
+    keys = []
+    for value in values:
+        boundIdx = bisect.bisect_left(bounds, value)
+        keys.append(2 * boundIdx + (boundIdx < len(bounds) and bounds[boundIdx] == value))
+    return keys
+
+
+class PlantDLIIndex(object):
+    """
+    IntervalIndex of the DLI ranges of the plants that share a growing season, for
+    every growing season of plantData.
+    """
+
+    def __init__(self, plantData):
+        self.plantTable = PlantTable.fromPlants(plantData)
+
+        self.seasonIndexes = {}
+        self._seasonBounds = {}
+        for season, plantIdxList in self.plantTable.seasonGroups().items():
+            lowList = [self.plantTable.dliMin[idx] for idx in plantIdxList]
+            upList = [self.plantTable.dliMax[idx] for idx in plantIdxList]
+            self.seasonIndexes[season] = IntervalIndex(lowList, upList, plantIdxList)
+            self._seasonBounds[season] = sorted(set(map(float, lowList + upList)))
+
+    def query(self, growingSeason, dliValue):
+        """Indices of the plants of a growing season whose DLI range contains dliValue."""
+        seasonIndex = self.seasonIndexes.get(seasonKey(growingSeason))
+        return seasonIndex.query(dliValue) if seasonIndex is not None else []
+
+    def plantsAt(self, dliData, ptsIdx):
+        """Names of the plants whose DLI range contains the seasonal DLI of a point."""
+        plantIdxList = []
+        for season, seasonIndex in self.seasonIndexes.items():
+            plantIdxList.extend(seasonIndex.query(dliData.seasonStats(season).values[ptsIdx]))
+        return [self.plantTable.names[idx] for idx in sorted(plantIdxList)]
+
+    @profiling.profiled("suitablePlants")
+    def suitablePlants(self, dliData):
+        """
+        The plants whose DLI range contains the average DLI of their growing season for
+        every point of dliData. Returns a dictionary with:
+            plantLists: Every distinct list of plant names, in the order of plantData.
+            plantListIndex: Index in plantLists for every point.
+            plantCounts: Number of plants for every point.
+        """
+        ptsCount = dliData.dataSize[0]
+        seasons = sorted(self.seasonIndexes)
+
+        # Every season only needs to be queried once for every region of its DLI ranges.
+        seasonKeys = []
+        seasonPlants = []
+        for season in seasons:
+            seasonValues = dliData.seasonStats(season).values
+            regionKeys = _regionKeys(seasonValues, self._seasonBounds[season])
+            regionPlants = {}
+            if np is not None:
+                # Number the regions of the points 0, 1, 2... and query the first point of each.
+                _, firstIdx, regionKeys = np.unique(regionKeys, return_index=True,
+                                                    return_inverse=True)
+                regionKeys = regionKeys.ravel()
+                for regionIdx, ptsIdx in enumerate(firstIdx.tolist()):
+                    regionPlants[regionIdx] = self.seasonIndexes[season].query(seasonValues[ptsIdx])
+            else:
+                for ptsIdx, key in enumerate(regionKeys):
+                    if key not in regionPlants:
+                        regionPlants[key] = self.seasonIndexes[season].query(seasonValues[ptsIdx])
+            seasonKeys.append(regionKeys)
+            seasonPlants.append(regionPlants)
+
+        # Combine the regions of every season into the distinct plant lists.
+        if np is not None and seasons:
+            comboKeys, plantListIndex = np.unique(np.stack(seasonKeys, axis=1), axis=0,
+                                                  return_inverse=True)
+            comboKeys = [tuple(val) for val in comboKeys.tolist()]
+            plantListIndex = plantListIndex.ravel().tolist()
+        else:
+            comboIndex = {}
+            plantListIndex = []
+            for keys in zip(*seasonKeys) if seasons else [()] * ptsCount:
+                plantListIndex.append(comboIndex.setdefault(keys, len(comboIndex)))
+            comboKeys = sorted(comboIndex, key=comboIndex.get)
+
+        plantLists = []
+        for keys in comboKeys:
+            plantIdxList = sorted(idx for regionPlants, key in zip(seasonPlants, keys)
+                                  for idx in regionPlants[key])
+            plantLists.append(tuple(self.plantTable.names[idx] for idx in plantIdxList))
+
+        return {"plantLists": plantLists, "plantListIndex": plantListIndex,
+                "plantCounts": [len(plantLists[idx]) for idx in plantListIndex]}
+
+    def ToString(self):
+        return "DLI range index of %s plants for %s growing seasons" % (len(self.plantTable),
+                                                                     len(self.seasonIndexes))
+
+
+def suitablePlants(plantData, dliData, locationData=None, filterBySoilTemp=False):
+    """
+    PlantDLIIndex.suitablePlants for plantData. If filterBySoilTemp is True, the plants
+    whose temperature range is not compatible with the location are left out.
+    """
+    assert not filterBySoilTemp or locationData is not None, \
+        "locationData is required to filter plants by soil temperature."
+    plantTable = PlantTable.fromPlants(plantData)
+    if filterBySoilTemp:
+        tempMatch = plantTable.temperatureMatch(locationData.tmin, locationData.tmax)
+        plantTable = plantTable.select([idx for idx, isMatch in enumerate(tempMatch) if isMatch])
+    return PlantDLIIndex(plantTable).suitablePlants(dliData)
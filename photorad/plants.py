@@ -0,0 +1,569 @@
+"""Plant requirements (DLI, temperature, hardiness, photoperiod and growing season)."""
+
+import array
+import bisect
+import itertools
+import os
+import statistics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# USDA hardiness zones and the temperature range of every zone. These are defined at
+# module level as the class body of PlantData cannot refer to its own attributes in a
+# comprehension in Python 3.
+_TEMPS=list(range(-65,70,5))
+_TEMP_RANGES=[(-200,-65)]+[(_TEMPS[idx],_TEMPS[idx+1]) for idx in range(len(_TEMPS)-1)]+[(65,200)]
+_ZONES=list(itertools.chain(*[["%sa"%zoneId,"%sb"%zoneId] for zoneId in range(14)]))
+
+
+_ZONE_INDEX=dict((zoneId,idx) for idx,zoneId in enumerate(_ZONES))
+_ALL_MONTHS_MASK=(1<<12)-1
+
+
+def _parseDliValue(value):
+    """[min,max] from a number or a string of one or two space-separated values."""
+    originalValue=value
+    try:
+        value=value.strip().split()
+        value=list(sorted(map(float,value)))
+        value=value if (len(value)==2) else value*2
+
+    except (ValueError,AttributeError):
+        value=[float(originalValue)]*2
+
+    if len(value)!=2:
+        raise ValueError("The value for dli should be one or two numbers (min max). So the input %s is incorrect"%repr(originalValue))
+    for num in value:
+        assert 0<=num , "The value for dli should be greater than 0. So the input %s is incorrect"%originalValue
+    return value
+
+
+def _parseGrowingSeason(value):
+    """Sorted months (1-12) from a number or a string of space-separated values. All months if empty."""
+    originalValue=value
+
+    if value:
+        try:
+            value=value.strip().split()
+            value=list(sorted(map(int,value)))
+        except (ValueError,AttributeError):
+            value=[int(value)]
+
+        for num in value:
+            assert 1<=num<=12 , "The value for growing season should be between 1(January) and 12(December). So the input %s is incorrect"%originalValue
+        return value
+    return list(range(1,13))
+
+
+def _parsePhotoPeriod(value):
+    """
+    Photoperiod (hours) for every month from a number or a string of one or 12 space-separated
+    values. An empty list if no photoperiod is provided.
+    """
+    originalValue=value
+    if value is None:
+        return []
+
+    try:
+        value=value.strip().split()
+        value=list(map(int,value))
+    except (ValueError,AttributeError):
+        value=[int(value)]
+
+    assert len(value) in (0,1,12), "The value for photoPeriod should be a single value or 12 values. So the input %s is incorrect"%originalValue
+    for num in value:
+        assert num in range(1,25), "The value for photoPeriod should not exceed 24 hours. So the input %s is incorrect"%originalValue
+
+    return value*12 if len(value)==1 else value
+
+
+def _tempRangeIndex(temp):
+    """Index of the last range in _TEMP_RANGES that contains temp, None if there is none."""
+    if not _TEMP_RANGES[0][0]<=temp<=_TEMP_RANGES[-1][-1]:
+        return None
+    return bisect.bisect_right(_TEMPS,temp)
+
+
+def _calcTempHardiness(plantName,minTemp,maxTemp,hardiness,verbose=True):
+    """
+    (minTemp,maxTemp,hardiness zones) from the temperature range or the hardiness zones of a plant.
+    If verbose is False, nothing is printed.
+    """
+
+    if not any((minTemp,maxTemp,hardiness)):
+        return (_TEMP_RANGES[0][0],_TEMP_RANGES[-1][-1],_ZONES)
+
+    if (minTemp or maxTemp) and hardiness and verbose:
+
+        print("For the plant '%s', it appears that minTemp(%s),maxTemp(%s) and hardiness(%s) values have been provided"\
+        ".\n\tThe values of minTemp and maxTemp will be used to set hardiness and the provided value will be overridden"%(plantName,minTemp,maxTemp,hardiness))
+
+
+    if (minTemp or maxTemp):
+        #Empty csv cells are treated as missing values.
+        minTemp=minTemp if minTemp not in (None,"") else maxTemp
+        maxTemp=maxTemp if maxTemp not in (None,"") else minTemp
+        minTemp=float(minTemp)
+        maxTemp=float(maxTemp)
+        startZoneIdx=_tempRangeIndex(minTemp)
+        endZoneIdx=_tempRangeIndex(maxTemp)
+        assert startZoneIdx is not None and endZoneIdx is not None,"The values for minTemp(%s) and maxTemp(%s) should be between %s and %s"%(minTemp,maxTemp,_TEMP_RANGES[0][0],_TEMP_RANGES[-1][-1])
+
+        if startZoneIdx==endZoneIdx:
+            endZoneIdx+=1
+
+
+        return minTemp,maxTemp,_ZONES[startZoneIdx:endZoneIdx]
+    elif hardiness:
+
+        #The zones can also be provided as a list, e.g. by the DefineOnePlant component.
+        hardSplit=hardiness.split() if hasattr(hardiness,"split") else list(hardiness)
+
+        hardSplit2=sorted([value for value in hardSplit if len(value)==2])
+        hardSplit3=sorted([value for value in hardSplit if len(value)==3])
+        hardSort=hardSplit2+hardSplit3
+
+
+        for hardinessValue in hardSort:
+            assert hardinessValue in _ZONE_INDEX,"The value for hardiness(%s) should be one among %s"%(hardinessValue,",".join(_ZONES))
+
+        if len(hardSort)==1:
+            hardinessIndex=_ZONE_INDEX[hardSort[0]]
+            minTemp,maxTemp=_TEMP_RANGES[hardinessIndex]
+
+        else:
+            hardinessIndexLow=_ZONE_INDEX[hardSort[0]]
+            hardinessIndexUp=_ZONE_INDEX[hardSort[-1]]
+            minTemp=_TEMP_RANGES[hardinessIndexLow][0]
+            maxTemp=_TEMP_RANGES[hardinessIndexUp][1]
+
+        if verbose:
+            print(hardSort,plantName)
+        return minTemp,maxTemp,hardSort
+
+
+def _toMask(values,indexDict=None):
+    mask=0
+    for val in values:
+        mask|=1<<(indexDict[val] if indexDict is not None else val-1)
+    return mask
+
+
+def _intTempFlags(minTemp,maxTemp):
+    """intTemps of a PlantTable row: 1 if minTemp and 2 if maxTemp is an integer."""
+    return (1 if isinstance(minTemp,int) else 0)|(2 if isinstance(maxTemp,int) else 0)
+
+
+def _fromMask(mask,values):
+    return [val for idx,val in enumerate(values) if (mask>>idx)&1]
+
+
+_MONTHS=list(range(1,13))
+
+
+class PlantTable(object):
+    """
+    Plant catalogue stored by column in typed arrays, with a row for every plant:
+
+        names: Plant names (list).
+        dliMin, dliMax: DLI range (float64).
+        minTemp, maxTemp: Temperature range (float64).
+        intTemps: 1 if minTemp and 2 if maxTemp is an integer, as the ranges of the hardiness zones, so
+            that it is printed without decimals (uint8).
+        seasonMask: Months of the growing season, bit 0 for January to bit 11 for December (uint16).
+        zoneMask: Hardiness zones, bit i for PlantData._zones[i] (uint32).
+        photoPeriod: Photoperiod (hours) for every month, 12 values per plant and 0 if not provided (uint8).
+
+    PlantData instances are views of a row, so a catalogue is not stored as one object per plant.
+    Use column() to get a column as a numpy array for filtering.
+    """
+
+    _arrayColumns=(("dliMin","d"),("dliMax","d"),("minTemp","d"),("maxTemp","d"),("intTemps","B"),
+                   ("seasonMask","H"),("zoneMask","I"),("photoPeriod","B"))
+
+    def __init__(self):
+        self.names=[]
+        for columnName,typeCode in self._arrayColumns:
+            setattr(self,columnName,array.array(typeCode))
+        #(line number, message) for every invalid row skipped by parsePlantTable.
+        self.importErrors=[]
+
+    def append(self,plantName,dliValue,minTemp=None,maxTemp=None,hardZone=None,photoPeriod=None,growingSeason=None):
+        """Validate and add a plant, with the same inputs as PlantData. Returns the index of the row."""
+        dliMin,dliMax=_parseDliValue(dliValue)
+        photoPeriodList=_parsePhotoPeriod(photoPeriod)
+        minTemp,maxTemp,hardinessZones=_calcTempHardiness(plantName,minTemp,maxTemp,hardZone)
+        seasonMask=_toMask(_parseGrowingSeason(growingSeason))
+
+        self.names.append(plantName)
+        self.dliMin.append(dliMin)
+        self.dliMax.append(dliMax)
+        self.minTemp.append(minTemp)
+        self.maxTemp.append(maxTemp)
+        self.intTemps.append(_intTempFlags(minTemp,maxTemp))
+        self.seasonMask.append(seasonMask)
+        self.zoneMask.append(_toMask(hardinessZones,_ZONE_INDEX))
+        self.photoPeriod.extend(photoPeriodList or [0]*12)
+        return len(self.names)-1
+
+    def appendRow(self,plantTable,rowIdx):
+        """Copy a row of another table without validating it again. Returns the index of the row."""
+        self.names.append(plantTable.names[rowIdx])
+        for columnName,_ in self._arrayColumns[:-1]:
+            getattr(self,columnName).append(getattr(plantTable,columnName)[rowIdx])
+        self.photoPeriod.extend(plantTable.photoPeriod[rowIdx*12:rowIdx*12+12])
+        return len(self.names)-1
+
+    @classmethod
+    def fromPlants(cls,plantData):
+        """
+        PlantTable with the rows of a list of PlantData, in the same order. If the plants are
+        the rows of a single table in order, that table is returned without copying it.
+        """
+        if isinstance(plantData,PlantTable):
+            return plantData
+        plantData=list(plantData)
+        if plantData:
+            plantTable=plantData[0]._table
+            if len(plantTable)==len(plantData) and all(plantInst._table is plantTable and plantInst._row==rowIdx
+                                                      for rowIdx,plantInst in enumerate(plantData)):
+                return plantTable
+        plantTable=cls()
+        for plantInst in plantData:
+            plantTable.appendRow(plantInst._table,plantInst._row)
+        return plantTable
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self,rowIdx):
+        if isinstance(rowIdx,slice):
+            return [PlantData._view(self,idx) for idx in range(*rowIdx.indices(len(self)))]
+        rowIdx=rowIdx+len(self) if rowIdx<0 else rowIdx
+        if not 0<=rowIdx<len(self):
+            raise IndexError("The index %s is out of range for %s plants"%(rowIdx,len(self)))
+        return PlantData._view(self,rowIdx)
+
+    def __iter__(self):
+        for rowIdx in range(len(self)):
+            yield PlantData._view(self,rowIdx)
+
+    def rows(self):
+        """PlantData for every row."""
+        return list(self)
+
+    def column(self,columnName):
+        """
+        A copy of a column as a numpy array (photoPeriod as a plants x 12 matrix), or as a
+        list without numpy.
+        """
+        if columnName=="names":
+            return list(self.names)
+        values=getattr(self,columnName)
+        if np is None:
+            return [list(values[idx:idx+12]) for idx in range(0,len(values),12)] if columnName=="photoPeriod" else list(values)
+        values=np.array(values,dtype=values.typecode)
+        return values.reshape(-1,12) if columnName=="photoPeriod" else values
+
+    def seasonGroups(self):
+        """Indices of the rows for every growing season, keyed by the sorted months of the season."""
+        seasonGroups={}
+        maskSeasons={}
+        for rowIdx,seasonMask in enumerate(self.seasonMask):
+            if seasonMask not in maskSeasons:
+                maskSeasons[seasonMask]=tuple(_fromMask(seasonMask,_MONTHS))
+            seasonGroups.setdefault(maskSeasons[seasonMask],[]).append(rowIdx)
+        return seasonGroups
+
+    def temperatureMatch(self,tmin,tmax):
+        """True for every plant whose temperature range includes the range (tmin,tmax) of a location."""
+        if np is not None:
+            return ((self.column("minTemp")<=tmin)&(self.column("maxTemp")>=tmax)).tolist()
+        return [minTemp<=tmin and maxTemp>=tmax for minTemp,maxTemp in zip(self.minTemp,self.maxTemp)]
+
+    def select(self,rowIdxList):
+        """PlantTable with the rows at rowIdxList."""
+        plantTable=PlantTable()
+        for rowIdx in rowIdxList:
+            plantTable.appendRow(self,rowIdx)
+        return plantTable
+
+    @property
+    def nbytes(self):
+        """Memory used by the array columns."""
+        return sum(len(getattr(self,columnName))*getattr(self,columnName).itemsize for columnName,_ in self._arrayColumns)
+
+    def ToString(self):
+        return "Plant table with %s plants"%len(self)
+
+    def __str__(self):
+        return self.ToString()
+
+
+class PlantData(object):
+    """
+    A plant of a PlantTable. PlantData(plantName,dliValue,...) creates a plant in a table of its
+    own, while the rows of a loaded catalogue share a single table.
+    """
+
+    __slots__=("_table","_row")
+
+    _temps = _TEMPS
+    _tempRanges=_TEMP_RANGES
+    _zones=_ZONES
+
+    def __init__(self,plantName,dliValue,minTemp=None,maxTemp=None,hardZone=None,photoPeriod=None,growingSeason=None):
+        self._table=PlantTable()
+        self._row=self._table.append(plantName,dliValue,minTemp,maxTemp,hardZone,photoPeriod,growingSeason)
+
+    @classmethod
+    def _view(cls,plantTable,rowIdx):
+        plantInst=cls.__new__(cls)
+        plantInst._table=plantTable
+        plantInst._row=rowIdx
+        return plantInst
+
+    @property
+    def table(self):
+        return self._table
+
+    @property
+    def name(self):
+        return self._table.names[self._row]
+
+    @name.setter
+    def name(self,value):
+        self._table.names[self._row]=value
+
+    @property
+    def dliValue(self):
+        return [self._table.dliMin[self._row],self._table.dliMax[self._row]]
+
+    @dliValue.setter
+    def dliValue(self,value):
+        self._table.dliMin[self._row],self._table.dliMax[self._row]=_parseDliValue(value)
+
+    @property
+    def minTemp(self):
+        minTemp=self._table.minTemp[self._row]
+        return int(minTemp) if self._table.intTemps[self._row]&1 else minTemp
+
+    @minTemp.setter
+    def minTemp(self,value):
+        self._table.minTemp[self._row]=float(value)
+        self._table.intTemps[self._row]=(self._table.intTemps[self._row]&2)|_intTempFlags(value,None)
+
+    @property
+    def maxTemp(self):
+        maxTemp=self._table.maxTemp[self._row]
+        return int(maxTemp) if self._table.intTemps[self._row]&2 else maxTemp
+
+    @maxTemp.setter
+    def maxTemp(self,value):
+        self._table.maxTemp[self._row]=float(value)
+        self._table.intTemps[self._row]=(self._table.intTemps[self._row]&1)|_intTempFlags(None,value)
+
+    @property
+    def hardinessZone(self):
+        return _fromMask(self._table.zoneMask[self._row],_ZONES)
+
+    @hardinessZone.setter
+    def hardinessZone(self,value):
+        self._table.zoneMask[self._row]=_toMask(value,_ZONE_INDEX)
+
+    @property
+    def growingSeason(self):
+        return _fromMask(self._table.seasonMask[self._row],_MONTHS)
+
+    @growingSeason.setter
+    def growingSeason(self,value):
+        self._table.seasonMask[self._row]=_toMask(_parseGrowingSeason(value))
+
+    @property
+    def photoPeriod(self):
+        photoPeriodList=list(self._table.photoPeriod[self._row*12:self._row*12+12])
+        return photoPeriodList if any(photoPeriodList) else []
+
+    @photoPeriod.setter
+    def photoPeriod(self,value):
+        self._table.photoPeriod[self._row*12:self._row*12+12]=array.array("B",_parsePhotoPeriod(value) or [0]*12)
+
+    @property
+    def dliAvg(self):
+        return int(statistics.mean(self.dliValue))
+
+    @property
+    def dliMax(self):
+        return self._table.dliMax[self._row]
+
+    @property
+    def dliMin(self):
+        return self._table.dliMin[self._row]
+
+    @property
+    def photoPeriodAvg(self):
+        return int(statistics.mean(self.photoPeriod))
+
+    @property
+    def photoPeriodMax(self):
+        return max(self.photoPeriod)
+
+    @property
+    def photoPeriodMin(self):
+        return min(self.photoPeriod)
+
+    def ToString(self):
+        return "Plant data for %s"%self.name
+
+
+    @property
+    def summary(self):
+        summaryList=["Plant data summary for '%s'\n"%self.name]
+        try:
+            summaryList.append("\tDLI value(s): %s"%",".join(map(list,self.dliValue)))
+        except TypeError:
+            summaryList.append("\tDLI value(s): %s"%",".join(map(str,self.dliValue)))
+        summaryList.append("\tGrowing Season(s): %s"%",".join(map(str,self.growingSeason)))
+
+        summaryList.append("\tMinimum Temp: %s"%self.minTemp)
+        summaryList.append("\tMaximum Temp: %s"%self.maxTemp)
+        summaryList.append("\tHardiness Zone(s): %s"%",".join(self.hardinessZone))
+        try:
+            summaryList.append("\tPhotoperiod(s): %s"%",".join(map(list,self.photoPeriod)))
+        except TypeError:
+            summaryList.append("\tPhotoperiod(s): %s"%",".join(map(str,self.photoPeriod)))
+
+        return "\n".join(summaryList)
+
+    @property
+    def csvString(self):
+        dliValue =list(map(str,self.dliValue))
+        csvStringList=[self.name]
+
+        csvStringList.append(" ".join(dliValue))
+        csvStringList.append(str(self.minTemp))
+        csvStringList.append(str(self.maxTemp))
+        csvStringList.append(" ".join(map(str,self.hardinessZone)))
+        csvStringList.append(" ".join(map(str,self.photoPeriod)))
+        csvStringList.append(" ".join(map(str,self.growingSeason)))
+        return ",".join(csvStringList)
+
+    def __str__(self):
+        return self.ToString()
+
+
+_CSV_COLUMNS=("PlantName","DLI","MinTemp","MaxTemp","HardinessZone","Photoperiod","GrowingSeason")
+
+
+def _parseColumn(values,parser):
+    """
+    Parse a column, calling parser once for every distinct value. Returns the parsed value for
+    every row and a dictionary with the error message for the values that are not valid.
+    """
+    parsedDict={}
+    errorDict={}
+    for value in values:
+        if value in parsedDict or value in errorDict:
+            continue
+        try:
+            parsedDict[value]=parser(value)
+        except (AssertionError,ValueError,TypeError) as error:
+            errorDict[value]=str(error) or error.__class__.__name__
+    return [parsedDict.get(value) for value in values],errorDict
+
+
+def _hardinessColumns(tempHardiness):
+    minTemp,maxTemp,hardinessZones=_calcTempHardiness(None,*tempHardiness,verbose=False)
+    return float(minTemp),float(maxTemp),_intTempFlags(minTemp,maxTemp),_toMask(hardinessZones,_ZONE_INDEX)
+
+
+def parsePlantTable(plantLines,source=None,skipInvalid=False,firstLineNumber=1):
+    """
+    PlantTable for every non-empty line of the format: PlantName, DLI value, min Temp, max Temp,
+    HardinessZone, Photoperiod, GrowingSeason. The columns are validated together, parsing every
+    distinct value of a column once, and nothing is printed for the individual plants.
+
+    All the invalid rows are reported in a single exception or, if skipInvalid is True, they are
+    left out and listed in the importErrors of the table. firstLineNumber is the line number of
+    the first line, for the messages.
+    """
+    lineNumbers=[]
+    rows=[]
+    errors=[]
+    columnCount=len(_CSV_COLUMNS)
+    for lineNumber,lines in enumerate(plantLines,firstLineNumber):
+        lines=lines.strip()
+        if not lines:
+            continue
+        lineList=lines.split(",")
+        if not lineList[0]:
+            continue
+        if len(lineList)!=columnCount:
+            if len(lineList)>columnCount:
+                errors.append((lineNumber,"%s columns were found instead of %s"%(len(lineList),columnCount)))
+                continue
+            lineList.extend([None]*(columnCount-len(lineList)))
+        lineNumbers.append(lineNumber)
+        rows.append(lineList)
+
+    columns=list(zip(*rows)) if rows else [()]*len(_CSV_COLUMNS)
+    tempHardiness=list(zip(*columns[2:5]))
+    parsedColumns=[("DLI",columns[1],_parseDliValue),
+                   ("MinTemp/MaxTemp/HardinessZone",tempHardiness,_hardinessColumns),
+                   ("Photoperiod",columns[5],_parsePhotoPeriod),
+                   ("GrowingSeason",columns[6],lambda value:_toMask(_parseGrowingSeason(value)))]
+
+    validRows=[True]*len(rows)
+    parsedValues=[]
+    for columnName,values,parser in parsedColumns:
+        columnValues,errorDict=_parseColumn(values,parser)
+        parsedValues.append(columnValues)
+        if errorDict:
+            for rowIdx,value in enumerate(values):
+                if value in errorDict:
+                    validRows[rowIdx]=False
+                    errors.append((lineNumbers[rowIdx],"%s(%s): %s"%(columnName,value,errorDict[value])))
+
+    errors.sort()
+    if errors and not skipInvalid:
+        raise Exception("%s invalid rows were found in %s:\n%s"%(len(errors),source or "the plant data","\n".join(["\tLine %s: %s"%val for val in errors])))
+
+    plantTable=PlantTable()
+    validIdx=[idx for idx,isValid in enumerate(validRows) if isValid]
+    dliValues,hardinessValues,photoPeriods,seasonMasks=parsedValues
+    plantTable.names=[columns[0][idx] for idx in validIdx]
+    plantTable.dliMin=array.array("d",[dliValues[idx][0] for idx in validIdx])
+    plantTable.dliMax=array.array("d",[dliValues[idx][1] for idx in validIdx])
+    plantTable.minTemp=array.array("d",[hardinessValues[idx][0] for idx in validIdx])
+    plantTable.maxTemp=array.array("d",[hardinessValues[idx][1] for idx in validIdx])
+    plantTable.intTemps=array.array("B",[hardinessValues[idx][2] for idx in validIdx])
+    plantTable.zoneMask=array.array("I",[hardinessValues[idx][3] for idx in validIdx])
+    plantTable.seasonMask=array.array("H",[seasonMasks[idx] for idx in validIdx])
+    plantTable.photoPeriod=array.array("B",itertools.chain(*[photoPeriods[idx] or [0]*12 for idx in validIdx]))
+    plantTable.importErrors=errors
+
+    if source or errors:
+        print("Loaded %s plants from %s%s"%(len(plantTable),source or "the plant data"," (%s invalid rows were skipped)"%len(errors) if errors else ""))
+    return plantTable
+
+
+def loadPlantTable(csvFilePath,skipInvalid=False):
+    """PlantTable for every row of a csv file, see parsePlantTable. The first line of the file is a header."""
+    assert os.path.exists(csvFilePath),"The path for the file %s is not valid"%csvFilePath
+    with open(csvFilePath) as csvStream:
+        csvStream.readline()
+        return parsePlantTable(csvStream,"the file %s"%csvFilePath,skipInvalid,2)
+
+
+def parsePlantLines(plantLines,source=None):
+    """PlantData for every non-empty line of the format: PlantName, DLI value, min Temp, max Temp,
+    HardinessZone, Photoperiod, GrowingSeason."""
+    return parsePlantTable(plantLines,source).rows()
+
+
+def loadPlantCsv(csvFilePath):
+    """PlantData for every row of a csv file. The first line of the file is a header."""
+    return loadPlantTable(csvFilePath).rows()
@@ -0,0 +1,216 @@
+"""Opt-in instrumentation of the stages of the PhotoRad pipeline.
+
+The pipeline marks its stages with the profiled decorator or the stage context manager.
+Nothing is recorded until profiling is enabled, and while it is disabled a stage only
+costs a function call and a check of a global:
+
+    report = profiling.enable(traceMemory=True)
+    dliData = calc_grid_dli(resPath, sunHoursPath)
+    profiling.disable()
+    print(report.ToString())
+    report.toJson("profile.json")
+
+Stages are nested, e.g. "prep_rad_file/parseRadFile", and every stage records the wall
+time, cpu time, bytes and rows read from disk and (with traceMemory) the peak memory
+allocated while it ran. Stages that run in worker processes are not recorded.
+"""
+
+from __future__ import division
+
+import json
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # IronPython
+    tracemalloc = None
+
+_cpuTime = time.process_time if hasattr(time, "process_time") else time.clock
+
+# The report being recorded, None if profiling is disabled.
+_activeReport = None
+
+
+class StageStats(object):
+    """Totals for every call of a stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.cpuSeconds = 0.0
+        self.bytesRead = 0
+        self.rowsRead = 0
+        self.peakBytes = None
+
+    def toDict(self):
+        return {"name": self.name, "calls": self.calls, "seconds": self.seconds,
+                "cpuSeconds": self.cpuSeconds, "bytesRead": self.bytesRead,
+                "rowsRead": self.rowsRead,
+                "peakMB": self.peakBytes / 1024 ** 2 if self.peakBytes is not None else None}
+
+    def ToString(self):
+        line = "%-44s %4dx %9.3fs wall %9.3fs cpu %10.1f MB read" % (
+            self.name, self.calls, self.seconds, self.cpuSeconds, self.bytesRead / 1024 ** 2)
+        if self.rowsRead:
+            line += " %10d rows" % self.rowsRead
+        if self.peakBytes is not None:
+            line += " %9.1f MB peak" % (self.peakBytes / 1024 ** 2)
+        return line
+
+
+class ProfileReport(object):
+    """The stages recorded while profiling was enabled, in the order they started."""
+
+    def __init__(self, traceMemory=False):
+        self.traceMemory = traceMemory and tracemalloc is not None
+        self.startedTracing = False
+        self.stages = []
+        self._stageDict = {}
+        # Frames of the stages that are running: [stats, wall, cpu, traced, peak].
+        self._stack = []
+
+    def stats(self, name):
+        if name not in self._stageDict:
+            self._stageDict[name] = StageStats(name)
+            self.stages.append(self._stageDict[name])
+        return self._stageDict[name]
+
+    def _enter(self, name):
+        if self._stack:
+            name = "%s/%s" % (self._stack[-1][0].name, name)
+        frame = [self.stats(name), time.time(), _cpuTime(), 0, 0]
+        if self.traceMemory:
+            tracedBytes, peakBytes = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Keep the peak of the enclosing stage before it is reset for this one.
+                self._stack[-1][4] = max(self._stack[-1][4], peakBytes)
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            frame[3:] = [tracedBytes, tracedBytes]
+        self._stack.append(frame)
+
+    def _exit(self):
+        stats, startWall, startCpu, startTraced, peakBytes = self._stack.pop()
+        stats.calls += 1
+        stats.seconds += time.time() - startWall
+        stats.cpuSeconds += _cpuTime() - startCpu
+        if self.traceMemory:
+            peakBytes = max(peakBytes, tracemalloc.get_traced_memory()[1])
+            stats.peakBytes = max(stats.peakBytes or 0, peakBytes - startTraced)
+            if self._stack:
+                self._stack[-1][4] = max(self._stack[-1][4], peakBytes)
+
+    def addBytes(self, byteCount):
+        """Add bytes read to every running stage."""
+        for frame in self._stack:
+            frame[0].bytesRead += byteCount
+
+    def addRows(self, rowCount):
+        """Add rows parsed to every running stage."""
+        for frame in self._stack:
+            frame[0].rowsRead += rowCount
+
+    def toDict(self):
+        return {"traceMemory": self.traceMemory,
+                "stages": [stats.toDict() for stats in self.stages]}
+
+    def toJson(self, filePath=None):
+        """The report as a json string, also written to filePath if provided."""
+        jsonString = json.dumps(self.toDict(), indent=1)
+        if filePath:
+            with open(filePath, "w") as jsonFile:
+                jsonFile.write(jsonString)
+        return jsonString
+
+    def ToString(self):
+        return "\n".join(["Profile of %s stages" % len(self.stages)] +
+                         [stats.ToString() for stats in self.stages])
+
+    def __str__(self):
+        return self.ToString()
+
+
+class _Stage(object):
+    def __init__(self, report, name):
+        self._report = report
+        self._name = name
+
+    def __enter__(self):
+        self._report._enter(self._name)
+        return self
+
+    def __exit__(self, *args):
+        self._report._exit()
+
+
+class _NullStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def enable(traceMemory=False):
+    """
+    Start recording the stages into a new ProfileReport and return it. If traceMemory is
+    True, the peak allocations of every stage are recorded with tracemalloc, which slows
+    down the pipeline considerably.
+    """
+    global _activeReport
+    _activeReport = ProfileReport(traceMemory)
+    if _activeReport.traceMemory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _activeReport.startedTracing = True
+    return _activeReport
+
+
+def disable():
+    """Stop recording and return the report that was recorded, if any."""
+    global _activeReport
+    report, _activeReport = _activeReport, None
+    if report is not None and report.startedTracing:
+        tracemalloc.stop()
+    return report
+
+
+def activeReport():
+    return _activeReport
+
+
+def stage(name):
+    """Context manager that records a stage while profiling is enabled."""
+    if _activeReport is None:
+        return _NULL_STAGE
+    return _Stage(_activeReport, name)
+
+
+def addBytes(byteCount):
+    """Record bytes read from disk by the running stages."""
+    if _activeReport is not None:
+        _activeReport.addBytes(byteCount)
+
+
+def addRows(rowCount):
+    """Record rows parsed from result files by the running stages."""
+    if _activeReport is not None:
+        _activeReport.addRows(rowCount)
+
+
+def profiled(name):
+    """Decorator that records every call of a function as a stage."""
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            if _activeReport is None:
+                return func(*args, **kwargs)
+            with _Stage(_activeReport, name):
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorator
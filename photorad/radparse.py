@@ -0,0 +1,147 @@
+"""Bulk parsers for Radiance result files (.ill, .rad and .pts).
+
+The files are read in large blocks of bytes and every block is converted to floats in
+one call instead of splitting and mapping one line at a time.
+"""
+
+from __future__ import division
+
+import os
+import time
+
+from photorad import profiling
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Size of the byte blocks read from the result files.
+BLOCK_SIZE = 16 * 1024 * 1024
+
+
+class ParseStats(object):
+    """Bytes, rows and time spent while parsing a file."""
+
+    def __init__(self, filePath=None):
+        self.filePath = filePath
+        self.bytesRead = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    @property
+    def mbPerSecond(self):
+        if not self.seconds:
+            return 0.0
+        return self.bytesRead / (1024.0 * 1024.0) / self.seconds
+
+    def ToString(self):
+        return "Parsed %s rows (%.1f MB) from %s in %.2fs (%.1f MB/s)" % (
+            self.rows, self.bytesRead / (1024.0 * 1024.0), self.filePath, self.seconds,
+            self.mbPerSecond)
+
+    def __str__(self):
+        return self.ToString()
+
+
+def _columnCount(block):
+    """Number of values in the first non-empty line of a block."""
+    for line in block.splitlines():
+        if line.strip():
+            return len(line.split())
+    return 0
+
+
+def _parseBlock(block, columnCount, skipColumns):
+    """
+    Convert a block of complete lines to a (rows x (columnCount-skipColumns)) matrix.
+    This function is for internal use only.
+    """
+    if np is not None:
+        values = np.fromstring(block, dtype=np.float64, sep=" ")
+        assert values.size % columnCount == 0, \
+            "The number of values in the block (%s) is not a multiple of the number of " \
+            "columns (%s). Is the file truncated or malformed?" % (values.size, columnCount)
+        return values.reshape(-1, columnCount)[:, skipColumns:]
+
+    values = list(map(float, block.split()))
+    assert len(values) % columnCount == 0, \
+        "The number of values in the block (%s) is not a multiple of the number of " \
+        "columns (%s). Is the file truncated or malformed?" % (len(values), columnCount)
+    return [values[idx + skipColumns:idx + columnCount] for idx in
+            range(0, len(values), columnCount)]
+
+
+def iterRadBlocks(filePath, skipColumns=0, blockSize=BLOCK_SIZE, stats=None):
+    """
+    Yield the contents of a rad/ill/pts file as consecutive blocks of rows. Every block
+    is a (rows x columns) numpy array, or a list of lists if numpy is not available. The
+    first skipColumns values of every line (e.g. the month, day and hour columns) are
+    dropped.
+    """
+    assert os.path.exists(filePath), "The file path (%s) was not found" % filePath
+
+    stats = stats if stats is not None else ParseStats(filePath)
+    columnCount = None
+    remainder = b""
+
+    with open(filePath, "rb") as fileStream:
+        while True:
+            startTime = time.time()
+            chunk = fileStream.read(blockSize)
+            stats.bytesRead += len(chunk)
+            profiling.addBytes(len(chunk))
+
+            if chunk:
+                chunk = remainder + chunk
+                lastNewLine = chunk.rfind(b"\n")
+                if lastNewLine == -1:
+                    remainder = chunk
+                    stats.seconds += time.time() - startTime
+                    continue
+                block, remainder = chunk[:lastNewLine + 1], chunk[lastNewLine + 1:]
+            else:
+                block, remainder = remainder, b""
+
+            if block.strip():
+                if columnCount is None:
+                    columnCount = _columnCount(block)
+                    assert columnCount > skipColumns, \
+                        "The file %s has %s columns, at least %s were expected." % (
+                            filePath, columnCount, skipColumns + 1)
+                rows = _parseBlock(block, columnCount, skipColumns)
+                stats.rows += len(rows)
+                profiling.addRows(len(rows))
+                stats.seconds += time.time() - startTime
+                yield rows
+            else:
+                stats.seconds += time.time() - startTime
+
+            if not chunk:
+                break
+
+
+def parseRadFile(filePath, skipColumns=0, blockSize=BLOCK_SIZE, stats=None):
+    """
+    Parse a complete rad/ill/pts file into a (rows x columns) matrix. A float64 numpy
+    array is returned if numpy is available and a list of lists otherwise.
+    """
+    blocks = list(iterRadBlocks(filePath, skipColumns, blockSize, stats))
+
+    if np is not None:
+        if not blocks:
+            return np.zeros((0, 0))
+        return blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+
+    dataList = []
+    for rows in blocks:
+        dataList.extend(rows)
+    return dataList
+
+
+def countRows(filePath):
+    """Number of non-empty lines in a file, e.g. the number of points in a pts file."""
+    assert os.path.exists(filePath), "The file path (%s) was not found" % filePath
+
+    with open(filePath, "rb") as fileStream:
+        return sum(1 for line in fileStream if line.strip())
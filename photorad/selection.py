@@ -0,0 +1,140 @@
+"""Selection of plant combinations for every point of a DLI grid."""
+
+from __future__ import division
+
+import itertools
+import sys
+
+from photorad import profiling
+
+
+_binomCache={}
+def _binom(n,k):
+    """Binomial coefficient C(n,k), cached as the same values are needed repeatedly."""
+    if k<0 or k>n:
+        return 0
+    k=min(k,n-k)
+    key=(n,k)
+    if key not in _binomCache:
+        value=1
+        for idx in range(k):
+            value=value*(n-idx)//(idx+1)
+        _binomCache[key]=value
+    return _binomCache[key]
+
+
+class PlantCombinations(object):
+    """
+    Lazy, indexed list of all the combinations (without repetition) of a list of plants.
+    The combinations are ordered by size, from all the plants down to a single plant,
+    and lexicographically within every size, followed by the empty combination. This is
+    the same order as concatenating itertools.combinations(plantList,size) for every
+    size, but combinations are only decoded when they are requested.
+
+    Combinations are encoded as bitmasks, where bit i is set if plantList[i] is part of
+    the combination.
+    """
+    def __init__(self,plantList):
+        self.plantList=list(plantList)
+        self._plantIndex=dict((name,idx) for idx,name in enumerate(self.plantList))
+
+    @property
+    def count(self):
+        """Number of combinations. Unlike len(), this is not limited to sys.maxsize."""
+        return 2**len(self.plantList)
+
+    def __len__(self):
+        """count, capped at sys.maxsize as len() cannot return more (above 62 or so plants)."""
+        return min(self.count,sys.maxsize)
+
+    def __iter__(self):
+        """(index, combination) for every combination, in order, without decoding the indices."""
+        comboIndex=0
+        for size in range(len(self.plantList),-1,-1):
+            for combination in itertools.combinations(self.plantList,size):
+                yield (comboIndex,combination)
+                comboIndex+=1
+
+    def encode(self,plantNames):
+        """Bitmask for a collection of plant names."""
+        mask=0
+        for name in plantNames:
+            mask|=1<<self._plantIndex[name]
+        return mask
+
+    def maskIndex(self,mask):
+        """Index of the combination encoded by a bitmask."""
+        plantCount=len(self.plantList)
+        positions=[idx for idx in range(plantCount) if (mask>>idx)&1]
+        size=len(positions)
+
+        # All the combinations with more plants come first.
+        comboIndex=sum(_binom(plantCount,val) for val in range(size+1,plantCount+1))
+
+        # Lexicographic rank among the combinations of the same size.
+        prevPosition=-1
+        for idx,position in enumerate(positions):
+            for skipped in range(prevPosition+1,position):
+                comboIndex+=_binom(plantCount-1-skipped,size-1-idx)
+            prevPosition=position
+        return comboIndex
+
+    def index(self,combination):
+        """Index of a combination (tuple of plant names)."""
+        return self.maskIndex(self.encode(combination))
+
+    def __getitem__(self,comboIndex):
+        """Decode an index into (index, combination), i.e. an item of allOptions."""
+        plantCount=len(self.plantList)
+        comboIndex=comboIndex+self.count if comboIndex<0 else comboIndex
+        if not 0<=comboIndex<self.count:
+            raise IndexError("The index %s is out of range for %s combinations"%(comboIndex,self.count))
+
+        remainder=comboIndex
+        size=plantCount
+        while size>0 and remainder>=_binom(plantCount,size):
+            remainder-=_binom(plantCount,size)
+            size-=1
+
+        combination=[]
+        position=0
+        for idx in range(size):
+            while remainder>=_binom(plantCount-1-position,size-1-idx):
+                remainder-=_binom(plantCount-1-position,size-1-idx)
+                position+=1
+            combination.append(self.plantList[position])
+            position+=1
+
+        return (comboIndex,tuple(combination))
+
+    def ToString(self):
+        return "%s combinations of %s plants"%(self.count,len(self.plantList))
+
+
+@profiling.profiled("selectPlants")
+def selectPlants(dliFilterResult,dliData):
+
+    plantList=sorted(set([val.plantInstance.name for val in dliFilterResult]))
+    combinations=PlantCombinations(plantList)
+
+    gridSize=dliData.dataSize[0]
+
+    #Encode the plants selected for every grid point as a bitmask.
+    nodeMasks=[0]*gridSize
+    for result in dliFilterResult:
+        if result.dliData==dliData:
+            plantBit=combinations.encode([result.plantInstance.name])
+            nodeMasks=[mask|plantBit if val==2 else mask for mask,val in zip(nodeMasks,result.dliRangeList)]
+
+    maskIndexDict=dict((mask,combinations.maskIndex(mask)) for mask in set(nodeMasks))
+
+    plantDLICombo=[val for val in dliFilterResult if val.dliData==dliData]
+    selection=tuple(sorted([val.plantInstance.name for val in plantDLICombo if val.selection]))
+    selectionIndex=combinations.index(selection)
+    nameListFinal=[maskIndexDict[mask] for mask in nodeMasks]
+    selectedCombos=[combinations[comboIndex] for comboIndex in sorted(set(nameListFinal))]
+    nameListFinalSet="\n".join(["%02d: %s"%(comboIndex,", ".join(combo) if combo else "None") for comboIndex,combo in selectedCombos])
+    print(nameListFinalSet)
+    selectionGrid=[selectionIndex]*gridSize
+
+    return {'allOptions':combinations,'selection':selection,'selectionGrid':selectionGrid,'nameListFinal':nameListFinal,'selectedCombo':nameListFinalSet}
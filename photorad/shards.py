@@ -0,0 +1,293 @@
+"""Partial DLI results for shards of a grid that is too large for one machine.
+
+A shard is a range of the points of a grid, either selected from the full result file
+or calculated from result and pts files that only contain the points of the shard.
+Every shard is calculated on its own (e.g. in another process or on another node) and
+saved as a DLIShard:
+
+    shard = calcShard(resPath, sunHoursPath, ptsStart=0, ptsEnd=250000)
+    shard.save("grid_0.prs")
+
+The shards are then merged into a ShardedDLIdata, which provides the monthly and
+annual DLI of every point from the monthly sums of the shards, without their hourly or
+daily values. It can be analyzed like DLIdata, so the grid-wide statistics (e.g. the
+quartiles of analysis.analyzePlant) are calculated over all the shards:
+
+    dliData = mergeShards([loadShard(filePath) for filePath in shardFiles])
+    dliFilterResults = analysis.analyzeAll(plantData, locationData, dliData, False, 0.5)
+
+A shard file is a small header followed by float64 values (little endian):
+
+    8 bytes  magic (b"PRSHARD1")
+    4 bytes  length of the json metadata (uint32, little endian)
+    json metadata with ptsStart, ptsCount, conversionFactor and hasDaily
+    12 x ptsCount values: sum of the daily mean irradiance over every month
+    365 x ptsCount values: daily mean irradiance (only if hasDaily)
+"""
+
+from __future__ import division
+
+import array
+import json
+import os
+import struct
+import sys
+
+from photorad import stats
+from photorad.dli import DEFAULT_MEMORY_BUDGET, DLIdata, _dliFactor, _monthDateSum, \
+    calc_sun_hour_mean, consolidate_results
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_MAGIC = b"PRSHARD1"
+_HEADER = struct.Struct("<8sI")
+
+_monthDays = [_monthDateSum[idx + 1] - _monthDateSum[idx] for idx in range(12)]
+
+
+def _monthlySums(dailyMean):
+    """
+    Sum of the daily values over every month, as a (12 x numPoints) array or a list of
+    12 lists, from a (365 x numPoints) array or a numPoints x 365 nested list.
+    """
+    if np is not None:
+        return np.add.reduceat(np.asarray(dailyMean, dtype=np.float64), _monthDateSum[:-1],
+                               axis=0)
+    return [[sum(ptsData[_monthDateSum[idx]:_monthDateSum[idx + 1]]) for ptsData in dailyMean]
+            for idx in range(12)]
+
+
+def _writeValues(outputStream, rows):
+    """Write rows of values as little endian float64."""
+    if np is not None:
+        np.asarray(rows, dtype="<f8").tofile(outputStream)
+        return
+    for rowData in rows:
+        rowArray = array.array("d", rowData)
+        if sys.byteorder == "big":
+            rowArray.byteswap()
+        rowArray.tofile(outputStream)
+
+
+def _readValues(inputStream, rows, columns):
+    """Read a (rows x columns) array, or a list of lists without numpy."""
+    if np is not None:
+        return np.fromfile(inputStream, dtype="<f8", count=rows * columns).reshape(rows, columns)
+    values = array.array("d")
+    values.fromfile(inputStream, rows * columns)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return [values[idx:idx + columns].tolist() for idx in range(0, rows * columns, columns)]
+
+
+class DLIShard(object):
+    """
+    Partial result for the points ptsStart to ptsStart+ptsCount of a grid: the monthly
+    sums of the daily mean irradiance (which do not depend on the conversion factor)
+    and, optionally, the daily mean irradiance itself, in the format used by
+    DLIdata.fromDailyMean.
+    """
+
+    def __init__(self, ptsStart, monthlySums, dailyMean=None, conversionFactor=3.72):
+        self.ptsStart = ptsStart
+        self.monthlySums = monthlySums
+        self.dailyMean = dailyMean
+        self.conversionFactor = conversionFactor
+
+    @classmethod
+    def fromDailyMean(cls, ptsStart, dailyMean, conversionFactor=3.72, keepDaily=True):
+        return cls(ptsStart, _monthlySums(dailyMean), dailyMean if keepDaily else None,
+                   conversionFactor)
+
+    @property
+    def ptsCount(self):
+        return len(self.monthlySums[0])
+
+    @property
+    def ptsEnd(self):
+        return self.ptsStart + self.ptsCount
+
+    def toDLIdata(self, precision="float64"):
+        """DLIdata for the points of the shard."""
+        assert self.dailyMean is not None, \
+            "The daily values of the shard (%s to %s) were not kept." % (self.ptsStart,
+                                                                         self.ptsEnd)
+        return DLIdata.fromDailyMean(self.dailyMean, self.conversionFactor, precision)
+
+    def save(self, filePath):
+        """Write the shard to a file, see the format above."""
+        metadata = json.dumps({"ptsStart": self.ptsStart, "ptsCount": self.ptsCount,
+                               "conversionFactor": self.conversionFactor,
+                               "hasDaily": self.dailyMean is not None}).encode("utf-8")
+
+        tempPath = "%s.%s.tmp" % (filePath, os.getpid())
+        with open(tempPath, "wb") as outputStream:
+            outputStream.write(_HEADER.pack(_MAGIC, len(metadata)))
+            outputStream.write(metadata)
+            _writeValues(outputStream, self.monthlySums)
+            if self.dailyMean is not None:
+                # Stored as (365 x ptsCount) rows in both cases.
+                _writeValues(outputStream, self.dailyMean if np is not None else
+                             list(zip(*self.dailyMean)))
+        if os.path.exists(filePath):
+            os.remove(filePath)
+        os.rename(tempPath, filePath)
+        return filePath
+
+    def ToString(self):
+        return "DLI shard for points %s to %s%s" % (
+            self.ptsStart, self.ptsEnd, " with daily values" if self.dailyMean is not None else "")
+
+    def __str__(self):
+        return self.ToString()
+
+
+def loadShard(filePath):
+    """Read a shard written by DLIShard.save."""
+    assert os.path.exists(filePath), "The shard file (%s) was not found" % filePath
+
+    with open(filePath, "rb") as inputStream:
+        magic, metadataLength = _HEADER.unpack(inputStream.read(_HEADER.size))
+        assert magic == _MAGIC, "The file %s is not a PhotoRad shard file" % filePath
+        metadata = json.loads(inputStream.read(metadataLength).decode("utf-8"))
+
+        ptsCount = metadata["ptsCount"]
+        monthlySums = _readValues(inputStream, 12, ptsCount)
+        dailyMean = None
+        if metadata["hasDaily"]:
+            dailyMean = _readValues(inputStream, 365, ptsCount)
+            if np is None:
+                dailyMean = [list(val) for val in zip(*dailyMean)]
+
+    return DLIShard(metadata["ptsStart"], monthlySums, dailyMean, metadata["conversionFactor"])
+
+
+def calcShard(resPath, sunHoursPath, ptsStart=0, ptsEnd=None, ptsOffset=0,
+              conversionFactor=3.72, memoryBudget=DEFAULT_MEMORY_BUDGET, keepDaily=True):
+    """
+    Calculate the DLIShard for the points ptsStart to ptsEnd (end excluded, defaults to
+    the last point) of a sun-hour result file. ptsOffset is the index of the first point
+    of the file in the complete grid, for result files that only contain a shard. The
+    file is streamed in blocks within memoryBudget (in bytes). If keepDaily is False,
+    only the monthly sums are kept.
+    """
+    res_dict = consolidate_results(resPath, sunHoursPath)
+    dailyMean = calc_sun_hour_mean(res_dict, memoryBudget, "float64", ptsStart, ptsEnd)
+    return DLIShard.fromDailyMean(ptsOffset + ptsStart, dailyMean, conversionFactor, keepDaily)
+
+
+class ShardedDLIdata(object):
+    """
+    The DLI of a grid merged from its shards. The monthly and annual averages and sums
+    of every point are calculated from the monthly sums of the shards and have the same
+    interface as in DLIdata.
+    """
+
+    def __init__(self, shards, conversionFactor=None):
+        assert shards, "At least one shard is required."
+        self.shards = sorted(shards, key=lambda shard: shard.ptsStart)
+        self.conversionFactor = conversionFactor if conversionFactor is not None else \
+            self.shards[0].conversionFactor
+
+        ptsEnd = 0
+        for shard in self.shards:
+            assert shard.ptsStart == ptsEnd, \
+                "The shards must cover the grid without gaps or overlaps, a shard starting " \
+                "at point %s was found where point %s was expected." % (shard.ptsStart, ptsEnd)
+            ptsEnd = shard.ptsEnd
+
+        if np is not None:
+            self._monthlySums = np.hstack([np.asarray(shard.monthlySums, dtype=np.float64)
+                                           for shard in self.shards])
+        else:
+            self._monthlySums = [[val for shard in self.shards for val in shard.monthlySums[idx]]
+                                 for idx in range(12)]
+        self._seasonStats = {}
+
+    def _toDLI(self, values, divisor=1):
+        factor = _dliFactor(self.conversionFactor) / divisor
+        if np is not None:
+            return (values * factor).tolist()
+        return [val * factor for val in values]
+
+    @property
+    def dataSize(self):
+        return (len(self._monthlySums[0]), 365)
+
+    def avgDLIMonthly(self, monthNum):
+        assert monthNum in range(1, 13), \
+            "The input for monthNum (%s) must be a number between 1 (Jan) and 12 (Dec)" % monthNum
+        return self._toDLI(self._monthlySums[monthNum - 1], _monthDays[monthNum - 1])
+
+    def cmuDLIMonthly(self, monthNum):
+        assert monthNum in range(1, 13), \
+            "The input for monthNum (%s) must be a number between 1 (Jan) and 12 (Dec)" % monthNum
+        return self._toDLI(self._monthlySums[monthNum - 1])
+
+    def _annualSums(self):
+        if np is not None:
+            return self._monthlySums.sum(axis=0)
+        return [sum(values) for values in zip(*self._monthlySums)]
+
+    @property
+    def avgDLIAnnual(self):
+        return self._toDLI(self._annualSums(), 365)
+
+    @property
+    def cmuDLIAnnual(self):
+        return self._toDLI(self._annualSums())
+
+    def withConversionFactor(self, conversionFactor):
+        """ShardedDLIdata for another conversion factor, sharing the monthly sums."""
+        dliData = self.__class__.__new__(self.__class__)
+        dliData.shards = self.shards
+        dliData.conversionFactor = conversionFactor
+        dliData._monthlySums = self._monthlySums
+        dliData._seasonStats = {}
+        return dliData
+
+    def seasonStats(self, growingSeason, relativeAccuracy=None):
+        """SeasonStats of the average DLI over a growing season, see DLIdata.seasonStats."""
+        key = (stats.seasonKey(growingSeason), relativeAccuracy)
+        if key not in self._seasonStats:
+            self._seasonStats[key] = stats.calcSeasonStats(self, key[0], relativeAccuracy)
+        return self._seasonStats[key]
+
+    def gridSummary(self):
+        """Mean, minimum and maximum of the annual average DLI over all the points."""
+        avgDLIAnnual = self.avgDLIAnnual
+        return {"pointCount": len(avgDLIAnnual), "shardCount": len(self.shards),
+                "conversionFactor": self.conversionFactor,
+                "meanDLIAnnual": sum(avgDLIAnnual) / len(avgDLIAnnual) if avgDLIAnnual else None,
+                "minDLIAnnual": min(avgDLIAnnual) if avgDLIAnnual else None,
+                "maxDLIAnnual": max(avgDLIAnnual) if avgDLIAnnual else None}
+
+    def toDLIdata(self, precision="float64"):
+        """
+        Stitch the daily values of the shards into DLIdata for the whole grid. All the
+        shards must have kept their daily values and the grid must fit in memory.
+        """
+        for shard in self.shards:
+            assert shard.dailyMean is not None, \
+                "The daily values of the shard (%s to %s) were not kept." % (shard.ptsStart,
+                                                                             shard.ptsEnd)
+        if np is not None:
+            dailyMean = np.hstack([shard.dailyMean for shard in self.shards])
+        else:
+            dailyMean = [ptsData for shard in self.shards for ptsData in shard.dailyMean]
+        return DLIdata.fromDailyMean(dailyMean, self.conversionFactor, precision)
+
+    def ToString(self):
+        return "DLI data merged from %s shards for %s points for %s days" % (
+            (len(self.shards),) + self.dataSize)
+
+
+def mergeShards(shards, conversionFactor=None):
+    """
+    Merge the shards of a grid into ShardedDLIdata. conversionFactor defaults to the
+    conversion factor of the first shard.
+    """
+    return ShardedDLIdata(shards, conversionFactor)
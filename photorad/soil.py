@@ -0,0 +1,434 @@
+"""Compact, memory-mapped database and spatial index of the zip-code based soil records.
+
+The soil data is distributed as a json file of ~40k records. The first time it is used,
+it is converted to a columnar binary file next to it (soilData.json -> soilData.bin):
+
+    header      magic (b"PRSOIL01"), number of records and number of records with
+                coordinates (uint32), number of zones (uint16)
+    zone names  4 bytes per zone, space padded
+    zip         5 bytes per record, sorted
+    zone        uint8 per record, index into the zone names
+    tMin, tMax  int8 per record
+    lat, lon    float32 per record, NaN if the record has no coordinates
+    treeOrder   uint32 per record with coordinates, the records in k-d tree order
+    treeAxes    uint8 per record with coordinates, the splitting axis of every node
+    treePoints  3 float64 per record with coordinates, the position of every node on
+                the unit sphere
+
+All values are little endian. With numpy the columns are memory-mapped, otherwise they
+are read into arrays. A single database is shared by every LocationData in a process.
+"""
+
+from __future__ import division
+
+import array
+import bisect
+import hashlib
+import heapq
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Mean radius of the earth in km.
+EARTH_RADIUS = 6371.0088
+
+_MAGIC = b"PRSOIL01"
+_HEADER = struct.Struct("<8sIIH")
+_ZONE_NAME_SIZE = 4
+_ZIP_SIZE = 5
+
+# Columns of the binary file: name, numpy dtype, array typecode and item size. The
+# tree columns only hold the records with coordinates.
+_COLUMNS = [("zip", "S5", None, _ZIP_SIZE), ("zone", "u1", "B", 1), ("tMin", "i1", "b", 1),
+            ("tMax", "i1", "b", 1), ("lat", "<f4", "f", 4), ("lon", "<f4", "f", 4),
+            ("treeOrder", "<u4", "I", 4), ("treeAxes", "u1", "B", 1),
+            ("treePoints", "<f8", "d", 8)]
+_TREE_COLUMNS = ("treeOrder", "treeAxes", "treePoints")
+
+# Databases loaded in this process, keyed by the path and modification time.
+_soilDatabaseCache = {}
+
+
+def haversine(latitude1, longitude1, latitude2, longitude2):
+    """Great-circle distance in km between two points given in degrees."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (latitude1, longitude1, latitude2, longitude2))
+    sinLat = math.sin((lat2 - lat1) / 2)
+    sinLon = math.sin((lon2 - lon1) / 2)
+    hav = sinLat * sinLat + math.cos(lat1) * math.cos(lat2) * sinLon * sinLon
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(hav)))
+
+
+def _unitVector(latitude, longitude):
+    """Position on the unit sphere for a latitude and longitude in degrees."""
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chordToDistance(chordSq):
+    """Great-circle distance in km for a squared chord length on the unit sphere."""
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(chordSq) / 2))
+
+
+def loadSoilData(soilDataAbsPath):
+    """Load the zip-code based soil data from the json file."""
+    if not os.path.exists(soilDataAbsPath):
+        raise Exception("The file containing soil data was not found at %s" % soilDataAbsPath)
+
+    with open(soilDataAbsPath) as soilDataFile:
+        soilJsonData = json.load(soilDataFile)
+        if not soilJsonData:
+            raise Exception("The file %s appears to be empty" % soilDataAbsPath)
+
+    return soilJsonData
+
+
+def _buildTree(points):
+    """
+    k-d tree layout for a list of points: a permutation of the points in which every
+    node is the median of a range, and the axis every range was split along.
+    """
+    order = list(range(len(points)))
+    axes = [0] * len(points)
+    stack = [(0, len(points))]
+    while stack:
+        start, end = stack.pop()
+        if end - start <= 0:
+            continue
+        segment = order[start:end]
+        # Split along the axis with the largest spread.
+        spreads = [max(points[idx][axis] for idx in segment) -
+                   min(points[idx][axis] for idx in segment) for axis in range(3)]
+        axis = spreads.index(max(spreads))
+        segment.sort(key=lambda idx: points[idx][axis])
+        order[start:end] = segment
+        median = (start + end) // 2
+        axes[median] = axis
+        stack.append((start, median))
+        stack.append((median + 1, end))
+    return order, axes
+
+
+def _writeArray(outputStream, typeCode, values):
+    """Write a list of values as a little-endian array."""
+    valueArray = array.array(typeCode, values)
+    if sys.byteorder == "big":
+        valueArray.byteswap()
+    valueArray.tofile(outputStream)
+
+
+def buildSoilDatabase(soilJsonPath, soilDbPath=None):
+    """
+    Convert the soil data json file to the binary format. By default the binary file is
+    written next to the json file. Returns the path of the binary file.
+    """
+    soilDbPath = soilDbPath or os.path.splitext(soilJsonPath)[0] + ".bin"
+    soilData = loadSoilData(soilJsonPath)
+
+    zipCodes = sorted(soilData)
+    for zipCode in zipCodes:
+        assert len(zipCode) == _ZIP_SIZE, "The zip code %s does not have 5 digits" % zipCode
+
+    zoneNames = sorted(set(soilData[zipCode]["zone"] for zipCode in zipCodes))
+    assert len(zoneNames) < 256, "The soil data has more than 255 hardiness zones"
+    zoneIndex = dict((zoneName, idx) for idx, zoneName in enumerate(zoneNames))
+
+    # The tree is built from the coordinates as stored (float32), so that the distances
+    # are consistent with the lat and lon columns.
+    latList = array.array("f", [soilData[zipCode].get("lat", float("nan")) for zipCode in
+                                zipCodes])
+    lonList = array.array("f", [soilData[zipCode].get("lon", float("nan")) for zipCode in
+                                zipCodes])
+    indexedRecords = [idx for idx in range(len(zipCodes)) if latList[idx] == latList[idx]]
+    assert indexedRecords, "None of the soil records have coordinates."
+
+    points = [_unitVector(latList[idx], lonList[idx]) for idx in indexedRecords]
+    treeOrder, treeAxes = _buildTree(points)
+
+    tempPath = "%s.%s.tmp" % (soilDbPath, os.getpid())
+    with open(tempPath, "wb") as outputStream:
+        outputStream.write(_HEADER.pack(_MAGIC, len(zipCodes), len(indexedRecords),
+                                        len(zoneNames)))
+        outputStream.write("".join(zoneName.ljust(_ZONE_NAME_SIZE) for zoneName in
+                                   zoneNames).encode("ascii"))
+        outputStream.write("".join(zipCodes).encode("ascii"))
+        _writeArray(outputStream, "B", [zoneIndex[soilData[zipCode]["zone"]] for zipCode in
+                                        zipCodes])
+        _writeArray(outputStream, "b", [soilData[zipCode]["tMin"] for zipCode in zipCodes])
+        _writeArray(outputStream, "b", [soilData[zipCode]["tMax"] for zipCode in zipCodes])
+        _writeArray(outputStream, "f", latList)
+        _writeArray(outputStream, "f", lonList)
+        _writeArray(outputStream, "I", [indexedRecords[idx] for idx in treeOrder])
+        _writeArray(outputStream, "B", treeAxes)
+        _writeArray(outputStream, "d", [value for idx in treeOrder for value in points[idx]])
+
+    if os.path.exists(soilDbPath):
+        os.remove(soilDbPath)
+    os.rename(tempPath, soilDbPath)
+    return soilDbPath
+
+
+class _ZipColumn(object):
+    """The zip codes stored in a single bytes string, as a sequence for bisect."""
+
+    def __init__(self, zipBytes):
+        self._zipBytes = zipBytes
+
+    def __len__(self):
+        return len(self._zipBytes) // _ZIP_SIZE
+
+    def __getitem__(self, idx):
+        return self._zipBytes[idx * _ZIP_SIZE:(idx + 1) * _ZIP_SIZE].decode("ascii")
+
+
+class SoilDatabase(object):
+    """
+    Soil records loaded from the binary file. The records can be looked up by zip code
+    in the same way as the dictionary loaded from the json file, and the records nearest
+    to a location are found with the k-d tree stored in the file. The records are placed
+    on the unit sphere, so that the nearest records by straight-line distance are also
+    the nearest by great-circle distance.
+    """
+
+    def __init__(self, soilDbPath):
+        self.sourceFile = soilDbPath
+
+        with open(soilDbPath, "rb") as inputStream:
+            magic, recordCount, indexedCount, zoneCount = _HEADER.unpack(
+                inputStream.read(_HEADER.size))
+            assert magic == _MAGIC, "The file %s is not a PhotoRad soil database" % soilDbPath
+            zoneBytes = inputStream.read(zoneCount * _ZONE_NAME_SIZE).decode("ascii")
+
+            self.recordCount = recordCount
+            self.indexedCount = indexedCount
+            self.zoneNames = [zoneBytes[idx:idx + _ZONE_NAME_SIZE].strip() for idx in
+                              range(0, len(zoneBytes), _ZONE_NAME_SIZE)]
+
+            offset = inputStream.tell()
+            self._columns = {}
+            for name, dtype, typeCode, itemSize in _COLUMNS:
+                count = indexedCount if name in _TREE_COLUMNS else recordCount
+                count *= 3 if name == "treePoints" else 1
+                if np is not None:
+                    self._columns[name] = np.memmap(soilDbPath, dtype=dtype, mode="r",
+                                                    offset=offset, shape=(count,))
+                elif typeCode is None:
+                    self._columns[name] = _ZipColumn(inputStream.read(count * itemSize))
+                else:
+                    values = array.array(typeCode)
+                    values.fromfile(inputStream, count)
+                    if sys.byteorder == "big":
+                        values.byteswap()
+                    self._columns[name] = values
+                offset += count * itemSize
+
+        self._treeLists = None
+        if np is not None:
+            self._treePoints = self._columns["treePoints"].reshape(indexedCount, 3)
+
+    def _zipCode(self, recordIdx):
+        zipCode = self._columns["zip"][recordIdx]
+        return zipCode.decode("ascii") if isinstance(zipCode, bytes) else zipCode
+
+    def _recordIndex(self, zipCode):
+        """Position of a zip code in the (sorted) zip column or None if it is not found."""
+        zipColumn = self._columns["zip"]
+        if np is not None:
+            zipCode = zipCode.encode("ascii")
+            recordIdx = int(np.searchsorted(zipColumn, zipCode))
+        else:
+            recordIdx = bisect.bisect_left(zipColumn, zipCode)
+        if recordIdx < self.recordCount and zipColumn[recordIdx] == zipCode:
+            return recordIdx
+        return None
+
+    def record(self, recordIdx):
+        """The record at a position, as a dictionary in the format of the json file."""
+        columns = self._columns
+        recordDict = {"zone": self.zoneNames[columns["zone"][recordIdx]],
+                      "tMin": int(columns["tMin"][recordIdx]),
+                      "tMax": int(columns["tMax"][recordIdx])}
+        latitude = float(columns["lat"][recordIdx])
+        if latitude == latitude:
+            # float32 keeps the coordinates to within ~1 m, the json file has 6 decimals.
+            recordDict["lat"] = round(latitude, 6)
+            recordDict["lon"] = round(float(columns["lon"][recordIdx]), 6)
+        return recordDict
+
+    @property
+    def missingCoordinates(self):
+        """Zip codes of the records that do not have coordinates and were not indexed."""
+        latColumn = self._columns["lat"]
+        return [self._zipCode(idx) for idx in range(self.recordCount) if
+                latColumn[idx] != latColumn[idx]]
+
+    def __len__(self):
+        return self.recordCount
+
+    def __contains__(self, zipCode):
+        return self._recordIndex(zipCode) is not None
+
+    def __getitem__(self, zipCode):
+        recordIdx = self._recordIndex(zipCode)
+        if recordIdx is None:
+            raise KeyError(zipCode)
+        return self.record(recordIdx)
+
+    def get(self, zipCode, default=None):
+        recordIdx = self._recordIndex(zipCode)
+        return default if recordIdx is None else self.record(recordIdx)
+
+    def keys(self):
+        return [self._zipCode(idx) for idx in range(self.recordCount)]
+
+    def items(self):
+        return [(self._zipCode(idx), self.record(idx)) for idx in range(self.recordCount)]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def _nodeRecord(self, nodeIdx, chordSq):
+        recordIdx = int(self._columns["treeOrder"][nodeIdx])
+        values = self.record(recordIdx)
+        return {"zip": self._zipCode(recordIdx), "zone": values["zone"],
+                "tmin": values["tMin"], "tmax": values["tMax"], "lat": values["lat"],
+                "lon": values["lon"], "distance": _chordToDistance(chordSq)}
+
+    def _treeColumns(self):
+        """
+        The points and axes of the k-d tree. With numpy they are read from the memory-mapped
+        columns into lists the first time the tree is searched, as reading a memory-mapped
+        array one value at a time is several times slower.
+        """
+        if np is None:
+            return self._columns["treePoints"], self._columns["treeAxes"]
+        if self._treeLists is None:
+            self._treeLists = (self._columns["treePoints"].tolist(),
+                               self._columns["treeAxes"].tolist())
+        return self._treeLists
+
+    def nearest(self, latitude, longitude, k=1):
+        """
+        The k records nearest to a location, sorted by distance. Every record is a
+        dictionary with the zip code, zone, tmin, tmax, lat, lon and the great-circle
+        distance (in km) to the location.
+        """
+        query = _unitVector(latitude, longitude)
+        k = min(k, self.indexedCount)
+        treePoints, treeAxes = self._treeColumns()
+
+        # Max-heap (negated squared distances) of the k best matches found so far.
+        bestMatches = []
+        # Ranges still to be searched with the squared distance to their splitting plane.
+        stack = [(0, self.indexedCount, 0.0)]
+        while stack:
+            start, end, planeDistSq = stack.pop()
+            if end - start <= 0:
+                continue
+            # The range can only contain a better match if its splitting plane is closer
+            # than the current k-th match.
+            if len(bestMatches) == k and planeDistSq >= -bestMatches[0][0]:
+                continue
+            median = (start + end) // 2
+            point = treePoints[median * 3:median * 3 + 3]
+            chordSq = ((point[0] - query[0]) ** 2 + (point[1] - query[1]) ** 2 +
+                       (point[2] - query[2]) ** 2)
+            if len(bestMatches) < k:
+                heapq.heappush(bestMatches, (-chordSq, median))
+            elif chordSq < -bestMatches[0][0]:
+                heapq.heapreplace(bestMatches, (-chordSq, median))
+
+            axis = treeAxes[median]
+            axisDiff = query[axis] - point[axis]
+            if axisDiff < 0:
+                stack.append((median + 1, end, axisDiff * axisDiff))
+                stack.append((start, median, 0.0))
+            else:
+                stack.append((start, median, axisDiff * axisDiff))
+                stack.append((median + 1, end, 0.0))
+
+        return [self._nodeRecord(nodeIdx, -negChordSq) for negChordSq, nodeIdx in
+                sorted(bestMatches, reverse=True)]
+
+    def nearestMany(self, coordinates, k=1, blockSize=None):
+        """
+        nearest for a list of (latitude, longitude) pairs. With numpy the distances from
+        every location to every record are calculated at once, for blocks of blockSize
+        locations (by default within ~2 MB for every distance matrix).
+        """
+        if np is None or not len(coordinates):
+            return [self.nearest(latitude, longitude, k) for latitude, longitude in coordinates]
+
+        k = min(k, self.indexedCount)
+        blockSize = blockSize or max(1, (1 << 18) // self.indexedCount)
+        coordinates = np.radians(np.asarray(coordinates, dtype=np.float64).reshape(-1, 2))
+        cosLat = np.cos(coordinates[:, 0])
+        queries = np.column_stack((cosLat * np.cos(coordinates[:, 1]),
+                                   cosLat * np.sin(coordinates[:, 1]),
+                                   np.sin(coordinates[:, 0])))
+
+        treePoints = np.asarray(self._treePoints)
+        results = []
+        for start in range(0, len(queries), blockSize):
+            block = queries[start:start + blockSize]
+            chordSq = np.zeros((len(block), self.indexedCount))
+            for axis in range(3):
+                chordSq += (block[:, axis, None] - treePoints[:, axis]) ** 2
+            if k < self.indexedCount:
+                nodeList = np.argpartition(chordSq, k - 1, axis=1)[:, :k]
+            else:
+                nodeList = np.tile(np.arange(self.indexedCount), (len(block), 1))
+            nodeChordSq = np.take_along_axis(chordSq, nodeList, axis=1)
+            order = np.argsort(nodeChordSq, axis=1, kind="mergesort")
+            nodeList = np.take_along_axis(nodeList, order, axis=1).tolist()
+            nodeChordSq = np.take_along_axis(nodeChordSq, order, axis=1).tolist()
+            for queryNodes, queryChordSq in zip(nodeList, nodeChordSq):
+                results.append([self._nodeRecord(nodeIdx, chordSqValue) for nodeIdx, chordSqValue
+                                in zip(queryNodes, queryChordSq)])
+        return results
+
+
+def getSoilDatabase(soilDataAbsPath):
+    """
+    SoilDatabase for a soil data file, loaded once per process and shared by every
+    LocationData that uses the same file. If soilDataAbsPath is the json file, the
+    binary file is built next to it (or in the temp folder if that location is not
+    writable) the first time it is used and whenever the json file is newer.
+    """
+    if not os.path.exists(soilDataAbsPath):
+        raise Exception("The file containing soil data was not found at %s" % soilDataAbsPath)
+
+    soilDbPath = soilDataAbsPath
+    if soilDataAbsPath.lower().endswith(".json"):
+        jsonTime = os.path.getmtime(soilDataAbsPath)
+        sidecarPath = os.path.splitext(soilDataAbsPath)[0] + ".bin"
+        # The name of the file in the temp folder includes a hash of the path of the json
+        # file, so that json files with the same name do not share a binary file.
+        pathHash = hashlib.sha1(os.path.abspath(soilDataAbsPath).encode("utf-8")).hexdigest()
+        tempPath = os.path.join(tempfile.gettempdir(), "%s_%s.bin" % (
+            os.path.splitext(os.path.basename(soilDataAbsPath))[0], pathHash[:16]))
+        for soilDbPath in (sidecarPath, tempPath):
+            if os.path.exists(soilDbPath) and os.path.getmtime(soilDbPath) >= jsonTime:
+                break
+        else:
+            try:
+                soilDbPath = buildSoilDatabase(soilDataAbsPath, sidecarPath)
+            except (IOError, OSError):
+                soilDbPath = buildSoilDatabase(soilDataAbsPath, tempPath)
+            print("The soil data in %s was converted to %s" % (soilDataAbsPath, soilDbPath))
+
+    cacheKey = (os.path.abspath(soilDbPath), os.path.getmtime(soilDbPath))
+    if cacheKey not in _soilDatabaseCache:
+        soilDatabase = SoilDatabase(soilDbPath)
+        if soilDatabase.indexedCount < soilDatabase.recordCount:
+            print("%s records in %s do not have coordinates and were not indexed" % (
+                soilDatabase.recordCount - soilDatabase.indexedCount, soilDbPath))
+        _soilDatabaseCache[cacheKey] = soilDatabase
+    return _soilDatabaseCache[cacheKey]
@@ -0,0 +1,360 @@
+"""Order statistics of the DLI of a grid without sorting it.
+
+The reports of AnalyzePlantSelection summarize the growing-season DLI of a grid by the
+means of its lowest, middle and highest values. SeasonStats calculates them (and any
+other quantile) by selection, which takes linear time, and keeps the results for every
+growing season of a DLIdata, so plants that share a season share the calculation:
+
+    seasonStats = dliData.seasonStats([4, 5, 6])
+    frstQ, secThrQ, frthQ = seasonStats.reportQuartiles
+
+For grids that are too large to hold at once (e.g. shards calculated on different
+machines), QuantileSketch counts the values in logarithmic buckets. Sketches of parts
+of a grid can be merged, and their quantiles are within relativeAccuracy of the exact
+values.
+"""
+
+from __future__ import division
+
+import math
+import random
+import statistics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Ranges smaller than this are sorted instead of partitioned further.
+_SORT_SIZE = 16
+
+
+def reportBucketSizes(count):
+    """
+    Number of values in the (Q1, Q2-Q3, Q4) buckets of the AnalyzePlantSelection report:
+    the lowest quarter, the next fifth and the rest of the sorted values.
+    """
+    return int(count / 4), int(count / 5)
+
+
+def partition(values, kthList):
+    """
+    Reorder a list in place so that values[k] is the k-th smallest value for every k in
+    kthList, with smaller or equal values before it and larger or equal values after it
+    (as numpy.partition). Takes linear time on average.
+    """
+    randomGen = random.Random(0)
+    ranges = [(0, len(values))]
+    kthList = sorted(kthList)
+    while ranges:
+        rangeStart, rangeEnd = ranges.pop()
+        if not any(rangeStart <= kth < rangeEnd for kth in kthList):
+            continue
+        if rangeEnd - rangeStart <= _SORT_SIZE:
+            values[rangeStart:rangeEnd] = sorted(values[rangeStart:rangeEnd])
+            continue
+
+        segment = values[rangeStart:rangeEnd]
+        pivot = segment[randomGen.randrange(len(segment))]
+        lowerValues = [val for val in segment if val < pivot]
+        upperValues = [val for val in segment if val > pivot]
+        equalCount = len(segment) - len(lowerValues) - len(upperValues)
+        values[rangeStart:rangeEnd] = lowerValues + [pivot] * equalCount + upperValues
+
+        equalStart = rangeStart + len(lowerValues)
+        ranges.append((rangeStart, equalStart))
+        ranges.append((equalStart + equalCount, rangeEnd))
+    return values
+
+
+def _sum(values):
+    return float(values.sum()) if hasattr(values, "sum") else sum(values)
+
+
+def _mean(valueSum, count):
+    if not count:
+        # The same error as statistics.mean, which the reports used to call.
+        raise statistics.StatisticsError("mean requires at least one data point")
+    return valueSum / count
+
+
+def bucketMeans(values, bucketSizes):
+    """
+    Means of consecutive buckets of the sorted values, with bucketSizes values in every
+    bucket and the remaining values in a last bucket, calculated by selection.
+    """
+    splitList = []
+    for bucketSize in bucketSizes:
+        splitList.append((splitList[-1] if splitList else 0) + bucketSize)
+    assert not splitList or splitList[-1] <= len(values), \
+        "The buckets (%s values) are larger than the data (%s values)." % (splitList[-1],
+                                                                           len(values))
+    kthList = [val for val in splitList if 0 < val < len(values)]
+
+    if np is not None:
+        values = np.partition(np.asarray(values, dtype=np.float64), kthList) if kthList else \
+            np.asarray(values, dtype=np.float64)
+    else:
+        values = partition(list(values), kthList)
+
+    means = []
+    bucketStart = 0
+    for bucketEnd in splitList + [len(values)]:
+        means.append(_mean(_sum(values[bucketStart:bucketEnd]), bucketEnd - bucketStart))
+        bucketStart = bucketEnd
+    return tuple(means)
+
+
+def quantile(values, fraction):
+    """Quantile of the values (fraction between 0 and 1, interpolated as numpy.quantile)."""
+    assert 0 <= fraction <= 1, "The fraction (%s) must be between 0 and 1." % fraction
+    assert len(values), "The quantile of an empty list is not defined."
+    position = fraction * (len(values) - 1)
+    lowerIdx = int(math.floor(position))
+    upperIdx = min(lowerIdx + 1, len(values) - 1)
+
+    if np is not None:
+        values = np.partition(np.asarray(values, dtype=np.float64), [lowerIdx, upperIdx])
+    else:
+        values = partition(list(values), [lowerIdx, upperIdx])
+    return values[lowerIdx] + (values[upperIdx] - values[lowerIdx]) * (position - lowerIdx)
+
+
+class QuantileSketch(object):
+    """
+    Approximate quantiles of values that are added in parts. Every value is counted in
+    a logarithmic bucket, so any quantile is within relativeAccuracy of the exact value
+    and the memory only depends on the range of the values. Values that are zero or
+    negative are counted as zero. Sketches with the same relativeAccuracy can be merged
+    and saved with toDict.
+    """
+
+    def __init__(self, relativeAccuracy=0.01):
+        assert 0 < relativeAccuracy < 1, \
+            "The relative accuracy (%s) must be between 0 and 1." % relativeAccuracy
+        self.relativeAccuracy = relativeAccuracy
+        self._gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy)
+        self._logGamma = math.log(self._gamma)
+        self.bucketCounts = {}
+        self.zeroCount = 0
+        self.count = 0
+        self.total = 0.0
+        self.minValue = None
+        self.maxValue = None
+
+    @classmethod
+    def fromValues(cls, values, relativeAccuracy=0.01):
+        sketch = cls(relativeAccuracy)
+        sketch.add(values)
+        return sketch
+
+    def add(self, values):
+        """Count a list or array of values."""
+        if np is not None:
+            values = np.asarray(values, dtype=np.float64).ravel()
+            if not values.size:
+                return
+            positiveValues = values[values > 0]
+            bucketIdx, bucketCounts = np.unique(
+                np.ceil(np.log(positiveValues) / self._logGamma).astype(np.int64),
+                return_counts=True)
+            for idx, bucketCount in zip(bucketIdx.tolist(), bucketCounts.tolist()):
+                self.bucketCounts[idx] = self.bucketCounts.get(idx, 0) + bucketCount
+            zeroCount = values.size - positiveValues.size
+            valueCount, valueSum = values.size, float(values.sum())
+            minValue, maxValue = float(values.min()), float(values.max())
+        else:
+            values = list(values)
+            if not values:
+                return
+            zeroCount = 0
+            for val in values:
+                if val > 0:
+                    idx = int(math.ceil(math.log(val) / self._logGamma))
+                    self.bucketCounts[idx] = self.bucketCounts.get(idx, 0) + 1
+                else:
+                    zeroCount += 1
+            valueCount, valueSum = len(values), sum(values)
+            minValue, maxValue = min(values), max(values)
+
+        self.zeroCount += zeroCount
+        self.count += valueCount
+        self.total += valueSum
+        self.minValue = minValue if self.minValue is None else min(self.minValue, minValue)
+        self.maxValue = maxValue if self.maxValue is None else max(self.maxValue, maxValue)
+
+    def merge(self, other):
+        """Add the counts of another sketch to this one."""
+        assert other.relativeAccuracy == self.relativeAccuracy, \
+            "Sketches with different accuracies (%s, %s) cannot be merged." % (
+                self.relativeAccuracy, other.relativeAccuracy)
+        for idx, bucketCount in other.bucketCounts.items():
+            self.bucketCounts[idx] = self.bucketCounts.get(idx, 0) + bucketCount
+        self.zeroCount += other.zeroCount
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.minValue = other.minValue if self.minValue is None else \
+                min(self.minValue, other.minValue)
+            self.maxValue = other.maxValue if self.maxValue is None else \
+                max(self.maxValue, other.maxValue)
+        return self
+
+    def _buckets(self):
+        """(value, count) for every bucket in ascending order."""
+        buckets = [(0.0, self.zeroCount)] if self.zeroCount else []
+        for idx in sorted(self.bucketCounts):
+            value = 2 * self._gamma ** idx / (self._gamma + 1)
+            buckets.append((min(max(value, self.minValue), self.maxValue),
+                            self.bucketCounts[idx]))
+        return buckets
+
+    @property
+    def mean(self):
+        return _mean(self.total, self.count)
+
+    def quantile(self, fraction):
+        """Approximate quantile of the values (fraction between 0 and 1)."""
+        assert 0 <= fraction <= 1, "The fraction (%s) must be between 0 and 1." % fraction
+        assert self.count, "The quantile of an empty sketch is not defined."
+        rank = fraction * (self.count - 1)
+        seenCount = 0
+        for value, bucketCount in self._buckets():
+            seenCount += bucketCount
+            if seenCount > rank:
+                return value
+        return self.maxValue
+
+    def bucketMeans(self, bucketSizes):
+        """Approximate version of bucketMeans (see above) for the values of the sketch."""
+        splitList = []
+        for bucketSize in bucketSizes:
+            splitList.append((splitList[-1] if splitList else 0) + bucketSize)
+        splitList.append(self.count)
+
+        bucketSums = [0.0] * len(splitList)
+        bucketIdx = 0
+        seenCount = 0
+        for value, bucketCount in self._buckets():
+            while bucketCount:
+                while splitList[bucketIdx] <= seenCount:
+                    bucketIdx += 1
+                takeCount = min(bucketCount, splitList[bucketIdx] - seenCount)
+                bucketSums[bucketIdx] += value * takeCount
+                seenCount += takeCount
+                bucketCount -= takeCount
+
+        bucketStarts = [0] + splitList[:-1]
+        return tuple(_mean(valueSum, bucketEnd - bucketStart) for valueSum, bucketStart, bucketEnd
+                     in zip(bucketSums, bucketStarts, splitList))
+
+    def toDict(self):
+        return {"relativeAccuracy": self.relativeAccuracy, "zeroCount": self.zeroCount,
+                "count": self.count, "total": self.total, "minValue": self.minValue,
+                "maxValue": self.maxValue,
+                "bucketCounts": [[idx, val] for idx, val in sorted(self.bucketCounts.items())]}
+
+    @classmethod
+    def fromDict(cls, sketchDict):
+        sketch = cls(sketchDict["relativeAccuracy"])
+        sketch.bucketCounts = dict((idx, val) for idx, val in sketchDict["bucketCounts"])
+        for key in ("zeroCount", "count", "total", "minValue", "maxValue"):
+            setattr(sketch, key, sketchDict[key])
+        return sketch
+
+    def ToString(self):
+        return "Quantile sketch of %s values in %s buckets (relative accuracy %s)" % (
+            self.count, len(self.bucketCounts), self.relativeAccuracy)
+
+
+class SeasonStats(object):
+    """
+    Statistics of the average DLI of every point over a growing season. The results
+    are kept, so they are only calculated once for every season. If relativeAccuracy is
+    provided, the quantiles and bucket means are approximated with a QuantileSketch.
+    cmuValues is the cumulative DLI of every point over the season, if it is known.
+    """
+
+    def __init__(self, values, relativeAccuracy=None, cmuValues=None):
+        self.values = np.asarray(values, dtype=np.float64) if np is not None else list(values)
+        self.cmuValues = cmuValues
+        self.relativeAccuracy = relativeAccuracy
+        self._sketch = None
+        self._results = {}
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    @property
+    def mean(self):
+        if "mean" not in self._results:
+            self._results["mean"] = _mean(_sum(self.values), self.count)
+        return self._results["mean"]
+
+    @property
+    def sketch(self):
+        """QuantileSketch of the values, e.g. to merge with the sketches of other grids."""
+        if self._sketch is None:
+            self._sketch = QuantileSketch.fromValues(self.values, self.relativeAccuracy or 0.01)
+        return self._sketch
+
+    def quantile(self, fraction):
+        key = ("quantile", fraction)
+        if key not in self._results:
+            self._results[key] = self.sketch.quantile(fraction) if self.relativeAccuracy else \
+                quantile(self.values, fraction)
+        return self._results[key]
+
+    def bucketMeans(self, bucketSizes):
+        key = ("bucketMeans", tuple(bucketSizes))
+        if key not in self._results:
+            self._results[key] = self.sketch.bucketMeans(bucketSizes) if self.relativeAccuracy \
+                else bucketMeans(self.values, bucketSizes)
+        return self._results[key]
+
+    @property
+    def reportQuartiles(self):
+        """Means of the (Q1, Q2-Q3, Q4) buckets of the AnalyzePlantSelection report."""
+        return self.bucketMeans(reportBucketSizes(self.count))
+
+    def ToString(self):
+        return "Season DLI statistics for %s points" % self.count
+
+
+def seasonKey(growingSeason):
+    """Key identifying a growing season, e.g. (4, 5, 6) for April to June."""
+    return tuple(sorted(growingSeason))
+
+
+def calcSeasonDLI(dliData, growingSeason):
+    """
+    Average and cumulative DLI for every point over a growing season. The average is
+    the mean of the monthly averages, the same as in AnalyzePlantSelection.
+    """
+    growingSeason = seasonKey(growingSeason)
+
+    if np is not None:
+        seasonAvg = np.zeros(dliData.dataSize[0])
+        seasonCmu = np.zeros(dliData.dataSize[0])
+        for month in growingSeason:
+            seasonAvg += dliData.avgDLIMonthly(month)
+            seasonCmu += dliData.cmuDLIMonthly(month)
+        seasonAvg /= len(growingSeason)
+        return seasonAvg, seasonCmu
+
+    seasonAvg = [0] * dliData.dataSize[0]
+    seasonCmu = [0] * dliData.dataSize[0]
+    for month in growingSeason:
+        seasonAvg = [val + monthVal for val, monthVal in
+                     zip(seasonAvg, dliData.avgDLIMonthly(month))]
+        seasonCmu = [val + monthVal for val, monthVal in
+                     zip(seasonCmu, dliData.cmuDLIMonthly(month))]
+    seasonAvg = [val / len(growingSeason) for val in seasonAvg]
+    return seasonAvg, seasonCmu
+
+
+def calcSeasonStats(dliData, growingSeason, relativeAccuracy=None):
+    """SeasonStats of the average DLI over a growing season, see DLIdata.seasonStats."""
+    seasonAvg, seasonCmu = calcSeasonDLI(dliData, growingSeason)
+    return SeasonStats(seasonAvg, relativeAccuracy, seasonCmu)
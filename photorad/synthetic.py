@@ -0,0 +1,171 @@
+"""Generators of synthetic projects for benchmarks and tests.
+
+makeProject writes the files of an annual irradiance study in the layout expected by
+dli.consolidate_results:
+
+    <root>/<name>.wea
+    <root>/model/grid/<name>.pts
+    <root>/results/total/<name>.ill      numPoints rows x numSunHours values
+    <root>/results/sun-up-hours.txt
+
+The values follow a daily solar profile scaled by a random factor for every point, so
+that the DLI varies across the grid. The same seed always produces the same files.
+"""
+
+from __future__ import division
+
+import math
+import os
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Hours of the day (0-23) for which the sun is up in the synthetic year.
+SUNRISE_HOUR = 6
+SUNSET_HOUR = 18
+
+# Number of points written at once.
+_BLOCK_POINTS = 256
+
+_MONTH_DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+
+def _hourDates():
+    """(month, day, hour of the day) for every hour of a non-leap year."""
+    return [(monthIdx + 1, day + 1, hour) for monthIdx, dayCount in enumerate(_MONTH_DAYS)
+            for day in range(dayCount) for hour in range(24)]
+
+
+def sunHours():
+    """Hours of the year (0-8759) for which the sun is up."""
+    return [hourIdx for hourIdx in range(8760) if
+            SUNRISE_HOUR <= hourIdx % 24 <= SUNSET_HOUR]
+
+
+def solarProfile(hourIdx):
+    """Synthetic horizontal irradiance (W/m2) for an hour of the year."""
+    dayAngle = 2 * math.pi * (hourIdx // 24) / 365
+    seasonFactor = 0.75 - 0.25 * math.cos(dayAngle)
+    hourAngle = math.pi * (hourIdx % 24 + 0.5 - SUNRISE_HOUR) / (SUNSET_HOUR + 1 - SUNRISE_HOUR)
+    return max(0.0, 900 * seasonFactor * math.sin(hourAngle))
+
+
+def writeWeaFile(weaFilePath):
+    """Write a wea file with the synthetic profile as the diffuse irradiance."""
+    with open(weaFilePath, "w") as weaFile:
+        weaFile.write("place synthetic\nlatitude 42.36\nlongitude 71.06\ntime_zone 75\n"
+                      "site_elevation 6.0\nweather_data_file_units 1\n")
+        for hourIdx, (month, day, hour) in enumerate(_hourDates()):
+            irradiance = solarProfile(hourIdx)
+            weaFile.write("%d %d %.1f %.1f %.1f\n" % (month, day, hour + 0.5, irradiance * 0.6,
+                                                       irradiance * 0.4))
+
+
+def writeWeatherFile(epwFilePath, latitude=42.36, longitude=-71.06):
+    """Write an epw file with the synthetic profile as the radiation fields."""
+    with open(epwFilePath, "w") as epwFile:
+        epwFile.write("LOCATION,Synthetic,MA,USA,PhotoRad,000000,%s,%s,-5.0,6.0\n" % (
+            latitude, longitude))
+        for headerLine in ["DESIGN CONDITIONS,0", "TYPICAL/EXTREME PERIODS,0",
+                           "GROUND TEMPERATURES,0", "HOLIDAYS/DAYLIGHT SAVINGS,No,0,0,0",
+                           "COMMENTS 1,Synthetic weather", "COMMENTS 2,",
+                           "DATA PERIODS,1,1,Data,Sunday, 1/ 1,12/31"]:
+            epwFile.write(headerLine + "\n")
+
+        for hourIdx, (month, day, hour) in enumerate(_hourDates()):
+            irradiance = solarProfile(hourIdx)
+            dryBulb = 10 - 12 * math.cos(2 * math.pi * (hourIdx // 24) / 365)
+            values = [2017, month, day, hour + 1, 60, "?9?9", "%.1f" % dryBulb, 2, 80, 101000,
+                      int(irradiance * 1.4), 1300, 300, int(irradiance), int(irradiance * 0.6),
+                      int(irradiance * 0.4), int(irradiance * 110), int(irradiance * 66),
+                      int(irradiance * 44), 500, 180, 3.1, 5, 3, 16, 77777, 9, 999999999, 0,
+                      0.1, 0, 88, 0, 0, 0]
+            epwFile.write(",".join(map(str, values)) + "\n")
+
+
+def writeResultFile(illFilePath, pointCount, hourList, seed=0):
+    """
+    Write an ill file with a row of values for every point and a column for every hour
+    of hourList. The file is written in blocks of points.
+    """
+    profile = [solarProfile(hourIdx) for hourIdx in hourList]
+
+    with open(illFilePath, "w") as illFile:
+        if np is not None:
+            randomState = np.random.RandomState(seed)
+            profileArray = np.array(profile)
+            for ptsStart in range(0, pointCount, _BLOCK_POINTS):
+                blockCount = min(_BLOCK_POINTS, pointCount - ptsStart)
+                pointFactors = randomState.uniform(0.05, 1.0, (blockCount, 1))
+                noise = randomState.uniform(0.95, 1.05, (blockCount, len(profile)))
+                np.savetxt(illFile, pointFactors * profileArray * noise, fmt="%.2f")
+        else:
+            randomGen = random.Random(seed)
+            for ptsIdx in range(pointCount):
+                pointFactor = randomGen.uniform(0.05, 1.0)
+                illFile.write(" ".join(["%.2f" % (pointFactor * val *
+                                                  randomGen.uniform(0.95, 1.05))
+                                        for val in profile]) + "\n")
+
+
+def writePointsFile(ptsFilePath, pointCount, spacing=0.5):
+    """Write a square grid of points facing up."""
+    columnCount = int(math.ceil(math.sqrt(pointCount))) or 1
+    with open(ptsFilePath, "w") as ptsFile:
+        for ptsIdx in range(pointCount):
+            ptsFile.write("%s %s 0.8 0 0 1\n" % (spacing * (ptsIdx % columnCount),
+                                                  spacing * (ptsIdx // columnCount)))
+
+
+def writePlantCatalogue(csvFilePath, plantCount, seed=0):
+    """
+    Write a plant csv file in the format read by plants.loadPlantCsv, with a mix of DLI
+    ranges, temperature ranges, hardiness zones and growing seasons.
+    """
+    randomGen = random.Random(seed)
+    with open(csvFilePath, "w") as csvFile:
+        csvFile.write("PlantName,DLI,MinTemp,MaxTemp,HardinessZone,Photoperiod,GrowingSeason\n")
+        for plantIdx in range(plantCount):
+            dliLow = randomGen.uniform(1, 30)
+            dliValue = "%.1f %.1f" % (dliLow, dliLow + randomGen.uniform(2, 20))
+            if randomGen.random() < 0.5:
+                minTemp = randomGen.randrange(-40, 20, 5)
+                tempValues = [str(minTemp), str(minTemp + randomGen.randrange(5, 40, 5)), ""]
+            else:
+                zoneId = randomGen.randrange(3, 11)
+                tempValues = ["", "", "%sa %sb" % (zoneId, zoneId + 1)]
+            startMonth = randomGen.randrange(1, 13)
+            season = sorted(set((startMonth + idx - 1) % 12 + 1 for idx in
+                                range(randomGen.randrange(1, 7))))
+            csvFile.write(",".join(["plant%04d" % plantIdx, dliValue] + tempValues +
+                                   [str(randomGen.randrange(8, 17)),
+                                    " ".join(map(str, season))]) + "\n")
+
+
+def makeProject(rootDir, pointCount, name="grid", seed=0):
+    """
+    Write a synthetic project with a grid of pointCount points. Returns a dictionary with
+    the paths of the result ('results'), sun hours ('sunHours'), pts ('pts') and wea
+    ('wea') files.
+    """
+    for subDir in (os.path.join(rootDir, "model", "grid"),
+                   os.path.join(rootDir, "results", "total")):
+        if not os.path.exists(subDir):
+            os.makedirs(subDir)
+
+    hourList = sunHours()
+    paths = {"results": os.path.join(rootDir, "results", "total", "%s.ill" % name),
+             "sunHours": os.path.join(rootDir, "results", "sun-up-hours.txt"),
+             "pts": os.path.join(rootDir, "model", "grid", "%s.pts" % name),
+             "wea": os.path.join(rootDir, "%s.wea" % name)}
+
+    with open(paths["sunHours"], "w") as sunHoursFile:
+        sunHoursFile.write("\n".join(["%s" % (hourIdx + 0.5) for hourIdx in hourList]) + "\n")
+    writeWeaFile(paths["wea"])
+    writePointsFile(paths["pts"], pointCount)
+    writeResultFile(paths["results"], pointCount, hourList, seed)
+
+    return paths
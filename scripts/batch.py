@@ -0,0 +1,50 @@
+"""Run the PhotoRad pipeline (calculate DLI -> analyze -> filter plants) for every job in
+a manifest, outside Grasshopper. See photorad/batch.py for the format of the manifest.
+
+    python scripts/batch.py manifest.json --output-dir results --workers 8
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from photorad import batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", help="Path of the json manifest.")
+    parser.add_argument("--output-dir", help="Directory for the outputs. Defaults to the "
+                                             "outputDir of the manifest or photorad_results "
+                                             "next to the manifest.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of jobs run in parallel. Defaults to the number of cpus.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the binary result cache.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write the time, cpu time, bytes read and peak memory of every "
+                             "stage of a job to <name>.profile.json in the output directory.")
+    args = parser.parse_args(argv)
+
+    jobs, outputDir = batch.loadManifest(args.manifest)
+    outputDir = args.output_dir or outputDir or os.path.join(
+        os.path.dirname(os.path.abspath(args.manifest)), "photorad_results")
+
+    summary = batch.runBatch(jobs, outputDir, args.workers, not args.no_cache, args.profile)
+
+    for jobSummary in summary:
+        if jobSummary["error"]:
+            print("%s failed:\n%s" % (jobSummary["name"], jobSummary["error"]))
+        else:
+            print("%s: %s (%.1fs)" % (jobSummary["name"], jobSummary["output"],
+                                      jobSummary["seconds"]))
+
+    failedCount = len([val for val in summary if val["error"]])
+    print("%s of %s jobs completed, outputs in %s" % (len(summary) - failedCount, len(summary),
+                                                      outputDir))
+    return 1 if failedCount else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""Benchmark the stages of the PhotoRad pipeline on synthetic projects.
+
+Synthetic projects (see photorad/synthetic.py) are generated for every grid size and
+plant catalogues for every number of plants. Every stage is timed and, unless
+--no-memory is set, run a second time under tracemalloc to record its peak allocation.
+The results are appended to a json history and compared with the previous run, so that
+regressions can be tracked across commits. For grids up to --check-points points, the
+DLI is also compared with the reference implementation in scripts/dli.py. The pipeline
+is also run with every storage precision in --precisions, recording the memory of the
+hourly and daily matrices and the largest difference from the float64 DLI. Finally, a
+plant catalogue with invalid DLI cells is imported in bulk to check that every invalid
+row is reported.
+
+    python scripts/benchmark.py --points 1000 100000 --plants 10 100 500
+
+The synthetic result files take roughly 30 MB per 1000 points, so the default sizes
+are kept small. Generated projects are kept in --workdir and reused by later runs.
+"""
+
+from __future__ import division
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+from photorad import analysis, plants, synthetic
+from photorad.dli import DLIdata, PRECISIONS, consolidate_results, np, prep_rad_file
+from photorad.location import LocationData
+from photorad.selection import selectPlants
+
+# The reference implementation of the DLI calculation (scripts/dli.py).
+sys.path.insert(0, os.path.join(REPO_DIR, "scripts"))
+import dli as reference
+
+DEFAULT_HISTORY = os.path.join(REPO_DIR, "benchmarks", "history.json")
+DEFAULT_SOIL_DATA = os.path.join(REPO_DIR, "data", "soilData.json")
+
+# Relative difference above which the DLI is not considered equivalent to the reference.
+EQUIVALENCE_TOLERANCE = 1e-9
+
+# Conversion factors of the conversionFactorSweep stage.
+SWEEP_CONVERSION_FACTORS = [3.0 + 0.1 * idx for idx in range(10)]
+
+# Plant csv rows with an invalid DLI cell (empty and three values), which the bulk import
+# must report as invalid rows.
+INVALID_PLANT_ROWS = ["invalid0,,10,20,,12,4 5 6", "invalid1,5 10 15,10,20,,12,4 5 6"]
+
+
+class _Quiet(object):
+    """Silence the progress messages printed by the pipeline while a stage is timed."""
+
+    def __enter__(self):
+        self._stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+
+    def __exit__(self, *args):
+        sys.stdout.close()
+        sys.stdout = self._stdout
+
+
+def measure(stageFunc, traceMemory=True):
+    """
+    Run a stage and return its result with the wall time, cpu time and (if traceMemory
+    is True) the peak memory allocated while running it a second time.
+    """
+    startWall = time.time()
+    startCpu = time.process_time() if hasattr(time, "process_time") else time.clock()
+    with _Quiet():
+        result = stageFunc()
+    stats = {"seconds": time.time() - startWall,
+             "cpuSeconds": (time.process_time() if hasattr(time, "process_time") else
+                            time.clock()) - startCpu}
+
+    if traceMemory and tracemalloc is not None:
+        tracemalloc.start()
+        with _Quiet():
+            stageFunc()
+        stats["peakMB"] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+    return result, stats
+
+
+def _maxDifference(referenceRows, rows):
+    """Largest absolute and relative difference between two nested lists of values."""
+    maxAbsError = 0.0
+    maxRelError = 0.0
+    for referencePoint, point in zip(referenceRows, rows):
+        for referenceValue, value in zip(referencePoint, point):
+            absError = abs(referenceValue - value)
+            maxAbsError = max(maxAbsError, absError)
+            if referenceValue:
+                maxRelError = max(maxRelError, absError / abs(referenceValue))
+    return maxAbsError, maxRelError
+
+
+def checkEquivalence(res_dict, dliData, conversionFactor, workDir):
+    """Largest absolute and relative difference between dliData and scripts/dli.py."""
+    denseFilePath = os.path.join(workDir, "reference.rad")
+    with _Quiet():
+        prep_rad_file(res_dict, output_path=denseFilePath)
+        # The reference works with illuminance and divides the conversion factor by 1000.
+        referenceDLI = reference.calcDLI(denseFilePath, res_dict["pts"],
+                                         conversionFactor * 1000)[0]
+    os.remove(denseFilePath)
+
+    maxAbsError, maxRelError = _maxDifference(referenceDLI, dliData.dliDailyData)
+    return {"maxAbsError": maxAbsError, "maxRelError": maxRelError,
+            "equivalent": maxRelError <= EQUIVALENCE_TOLERANCE}
+
+
+def checkPlantImport(csvFilePath):
+    """
+    Import a plant catalogue followed by INVALID_PLANT_ROWS in bulk, skipping the invalid
+    rows, and check that exactly those rows are reported and all the others are imported.
+    """
+    with open(csvFilePath) as csvFile:
+        plantLines = csvFile.read().splitlines()[1:]
+    # The header is the first line of the file.
+    invalidLines = list(range(len(plantLines) + 2, len(plantLines) + 2 + len(INVALID_PLANT_ROWS)))
+    try:
+        with _Quiet():
+            plantTable = plants.parsePlantTable(plantLines + INVALID_PLANT_ROWS, csvFilePath,
+                                                skipInvalid=True, firstLineNumber=2)
+    except Exception as error:
+        return {"plants": 0, "invalidLines": invalidLines, "reportedLines": [],
+                "error": "%s: %s" % (error.__class__.__name__, error), "passed": False}
+
+    reportedLines = sorted(set(lineNumber for lineNumber, _ in plantTable.importErrors))
+    return {"plants": len(plantTable), "invalidLines": invalidLines,
+            "reportedLines": reportedLines,
+            "passed": reportedLines == invalidLines and len(plantTable) == len(plantLines)}
+
+
+def _megabytes(radData):
+    """Memory of an hourly matrix, None for nested lists."""
+    return radData.nbytes / 1024 ** 2 if hasattr(radData, "nbytes") else None
+
+
+def runCase(projectPaths, pointCount, plantCounts, locationData, workDir, args):
+    """Benchmark the pipeline for a grid and every plant catalogue."""
+    case = {"points": pointCount, "stages": {}, "plants": {}}
+
+    res_dict = consolidate_results(projectPaths["results"], projectPaths["sunHours"])
+    (radData, hourIndex, ptsFilePath), case["stages"]["prep_rad_file"] = measure(
+        lambda: prep_rad_file(res_dict), not args.no_memory)
+    dliData, case["stages"]["DLIdata"] = measure(
+        lambda: DLIdata(radData, ptsFilePath, args.conversion_factor, hourIndex=hourIndex),
+        not args.no_memory)
+    _, case["stages"]["avgDLIAnnual"] = measure(lambda: dliData.avgDLIAnnual,
+                                                not args.no_memory)
+    _, case["stages"]["conversionFactorSweep"] = measure(
+        lambda: [dliData.withConversionFactor(factor).avgDLIAnnual for factor in
+                 SWEEP_CONVERSION_FACTORS], not args.no_memory)
+
+    if pointCount <= args.check_points:
+        case["reference"] = checkEquivalence(res_dict, dliData, args.conversion_factor,
+                                             workDir)
+
+    case["precision"] = {"float64": {"hourlyMB": _megabytes(radData),
+                                     "dailyMB": dliData.nbytes / 1024 ** 2,
+                                     "maxAbsError": 0.0, "maxRelError": 0.0}}
+    for precision in args.precisions:
+        (radData, hourIndex, ptsFilePath), case["stages"]["prep_rad_file_%s" % precision] = \
+            measure(lambda: prep_rad_file(res_dict, precision=precision), not args.no_memory)
+        precisionData, case["stages"]["DLIdata_%s" % precision] = measure(
+            lambda: DLIdata(radData, ptsFilePath, args.conversion_factor, hourIndex=hourIndex,
+                            precision=precision), not args.no_memory)
+        maxAbsError, maxRelError = _maxDifference(dliData.dliDailyData,
+                                                  precisionData.dliDailyData)
+        case["precision"][precision] = {"hourlyMB": _megabytes(radData),
+                                        "dailyMB": precisionData.nbytes / 1024 ** 2,
+                                        "maxAbsError": maxAbsError, "maxRelError": maxRelError}
+
+    for plantCount in plantCounts:
+        csvFilePath = os.path.join(workDir, "plants_%s.csv" % plantCount)
+        if not os.path.exists(csvFilePath):
+            synthetic.writePlantCatalogue(csvFilePath, plantCount, args.seed)
+
+        plantStages = {}
+        plantData, plantStages["loadPlantCsv"] = measure(
+            lambda: plants.loadPlantCsv(csvFilePath), not args.no_memory)
+        _, plantStages["analyzePlant"] = measure(
+            lambda: analysis.analyzePlant(plantData, locationData, dliData, 0, False, 0.5),
+            not args.no_memory)
+        dliFilterResults, plantStages["analyzeAll"] = measure(
+            lambda: analysis.analyzeAll(plantData, locationData, dliData, False, 0.5),
+            not args.no_memory)
+        _, plantStages["selectPlants"] = measure(
+            lambda: selectPlants(dliFilterResults, dliData), not args.no_memory)
+        case["plants"]["%s" % plantCount] = plantStages
+
+    return case
+
+
+def _gitCommit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                       stderr=subprocess.STDOUT).decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stageRows(run):
+    """(case label, stage, seconds) for every stage of a run, in the order they were run."""
+    rows = [("setup", stageName, stats["seconds"]) for stageName, stats in
+            sorted(run["stages"].items())]
+    for case in run["cases"]:
+        caseLabel = "%s points" % case["points"]
+        rows.extend((caseLabel, stageName, stats["seconds"]) for stageName, stats in
+                    sorted(case["stages"].items()))
+        for plantCount in sorted(case["plants"], key=int):
+            caseLabel = "%s points, %s plants" % (case["points"], plantCount)
+            rows.extend((caseLabel, stageName, stats["seconds"]) for stageName, stats in
+                        sorted(case["plants"][plantCount].items()))
+    return rows
+
+
+def printReport(run, previousRun=None):
+    """Print the timings of a run, with the ratio to the previous run if available."""
+    previousRows = dict(((caseLabel, stageName), seconds) for caseLabel, stageName, seconds in
+                        _stageRows(previousRun)) if previousRun else {}
+    print("Benchmark at commit %s (numpy: %s)" % (run["commit"], run["numpy"]))
+    for caseLabel, stageName, seconds in _stageRows(run):
+        line = "  %-28s %-22s %9.4fs" % (caseLabel, stageName, seconds)
+        previousSeconds = previousRows.get((caseLabel, stageName))
+        if previousSeconds:
+            line += "  (x%.2f vs %s)" % (seconds / previousSeconds, previousRun["commit"])
+        print(line)
+
+    for case in run["cases"]:
+        for precision, stats in sorted(case.get("precision", {}).items(),
+                                       key=lambda item: PRECISIONS.index(item[0])):
+            print("  %s points, %-8s hourly %s MB, daily %.1f MB, max difference from float64 "
+                  "%.3g (relative %.3g)" % (
+                      case["points"], precision,
+                      "%.1f" % stats["hourlyMB"] if stats["hourlyMB"] is not None else "-",
+                      stats["dailyMB"], stats["maxAbsError"], stats["maxRelError"]))
+        if "reference" in case:
+            print("  %s points: max difference from scripts/dli.py %.3g (relative %.3g), %s" % (
+                case["points"], case["reference"]["maxAbsError"],
+                case["reference"]["maxRelError"],
+                "equivalent" if case["reference"]["equivalent"] else "NOT EQUIVALENT"))
+
+    if "plantImport" in run:
+        plantImport = run["plantImport"]
+        print("  plant import: %s plants, invalid rows on lines %s reported on lines %s, %s" % (
+            plantImport["plants"], plantImport["invalidLines"], plantImport["reportedLines"],
+            "passed" if plantImport["passed"] else "FAILED (%s)" % plantImport.get("error", "")))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, nargs="+", default=[1000, 10000],
+                        help="Grid sizes to benchmark.")
+    parser.add_argument("--plants", type=int, nargs="+", default=[10, 100, 500],
+                        help="Sizes of the plant catalogues to benchmark.")
+    parser.add_argument("--workdir", default=os.path.join(REPO_DIR, "benchmarks", "data"),
+                        help="Directory for the synthetic projects.")
+    parser.add_argument("--history", default=DEFAULT_HISTORY,
+                        help="json file to which the results are appended.")
+    parser.add_argument("--soil-data", default=DEFAULT_SOIL_DATA)
+    parser.add_argument("--check-points", type=int, default=1000,
+                        help="Largest grid compared with the reference implementation.")
+    parser.add_argument("--conversion-factor", type=float, default=3.72)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Do not record the peak memory of every stage.")
+    parser.add_argument("--precisions", nargs="*", choices=PRECISIONS[1:],
+                        help="Storage precisions compared with float64. Defaults to all of them "
+                             "(float32 only without numpy).")
+    args = parser.parse_args(argv)
+    if args.precisions is None:
+        args.precisions = list(PRECISIONS[1:]) if np is not None else ["float32"]
+
+    if not os.path.exists(args.workdir):
+        os.makedirs(args.workdir)
+
+    run = {"commit": _gitCommit(), "date": datetime.datetime.now().isoformat(),
+           "python": platform.python_version(), "platform": platform.platform(),
+           "numpy": np.__version__ if np is not None else None, "stages": {}, "cases": []}
+
+    epwFilePath = os.path.join(args.workdir, "synthetic.epw")
+    if not os.path.exists(epwFilePath):
+        synthetic.writeWeatherFile(epwFilePath)
+    locationData, run["stages"]["LocationData"] = measure(
+        lambda: LocationData(epwFilePath, args.soil_data), not args.no_memory)
+
+    for pointCount in args.points:
+        projectDir = os.path.join(args.workdir, "points_%s_seed_%s" % (pointCount, args.seed))
+        startTime = time.time()
+        projectPaths = synthetic.makeProject(projectDir, pointCount, seed=args.seed) if \
+            not os.path.exists(os.path.join(projectDir, "results", "total", "grid.ill")) else \
+            {"results": os.path.join(projectDir, "results", "total", "grid.ill"),
+             "sunHours": os.path.join(projectDir, "results", "sun-up-hours.txt")}
+        print("Project with %s points ready in %.1fs" % (pointCount, time.time() - startTime))
+
+        run["cases"].append(runCase(projectPaths, pointCount, args.plants, locationData,
+                                    args.workdir, args))
+
+    csvFilePath = os.path.join(args.workdir, "plants_%s.csv" % args.plants[0])
+    if not os.path.exists(csvFilePath):
+        synthetic.writePlantCatalogue(csvFilePath, args.plants[0], args.seed)
+    run["plantImport"] = checkPlantImport(csvFilePath)
+
+    if resource is not None:
+        # ru_maxrss is in KB on Linux and bytes on macOS.
+        maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        run["maxRssMB"] = maxRss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+    history = {"runs": []}
+    if os.path.exists(args.history):
+        with open(args.history) as historyFile:
+            history = json.load(historyFile)
+    previousRuns = [val for val in history["runs"] if
+                    (val["numpy"] is None) == (run["numpy"] is None)]
+
+    printReport(run, previousRuns[-1] if previousRuns else None)
+
+    history["runs"].append(run)
+    historyDir = os.path.dirname(os.path.abspath(args.history))
+    if not os.path.exists(historyDir):
+        os.makedirs(historyDir)
+    with open(args.history, "w") as historyFile:
+        json.dump(history, historyFile, indent=1)
+
+    failedChecks = [case for case in run["cases"] if
+                    "reference" in case and not case["reference"]["equivalent"]]
+    return 1 if failedChecks or not run["plantImport"]["passed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
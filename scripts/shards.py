@@ -0,0 +1,80 @@
+"""Calculate the DLI of a large grid in shards of points and merge the shards.
+
+    python scripts/shards.py calc results/total/grid.ill results/sun-up-hours.txt --range 0 250000 --output grid_0.prs
+    python scripts/shards.py merge grid_*.prs --output grid_dli.json
+
+See photorad/shards.py for the format of the shard files.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from photorad import shards
+from photorad.dli import DEFAULT_MEMORY_BUDGET
+
+
+def calcCommand(args):
+    ptsStart, ptsEnd = args.range if args.range else (0, None)
+    shard = shards.calcShard(os.path.abspath(args.results), os.path.abspath(args.sun_hours),
+                             ptsStart, ptsEnd, args.offset, args.conversion_factor,
+                             args.memory_budget * 1024 ** 2, not args.monthly_only)
+    shard.save(args.output)
+    print("%s: %s" % (shard.ToString(), args.output))
+    return 0
+
+
+def mergeCommand(args):
+    dliData = shards.mergeShards([shards.loadShard(filePath) for filePath in args.shards],
+                                 args.conversion_factor)
+    output = dliData.gridSummary()
+    output["avgDLIAnnual"] = dliData.avgDLIAnnual
+    output["avgDLIMonthly"] = [dliData.avgDLIMonthly(monthNum) for monthNum in range(1, 13)]
+    with open(args.output, "w") as outputFile:
+        json.dump(output, outputFile)
+    print("%s: %s" % (dliData.ToString(), args.output))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subParsers = parser.add_subparsers(dest="command")
+
+    calcParser = subParsers.add_parser("calc", help="Calculate a shard of a result file.")
+    calcParser.add_argument("results", help="Path of the ill file.")
+    calcParser.add_argument("sun_hours", help="Path of the sun-up-hours file.")
+    calcParser.add_argument("--range", type=int, nargs=2, metavar=("START", "END"),
+                            help="Points of the ill file in the shard (end excluded). "
+                                 "Defaults to all the points of the file.")
+    calcParser.add_argument("--offset", type=int, default=0,
+                            help="Index of the first point of the ill file in the grid, for "
+                                 "ill files that only contain a shard.")
+    calcParser.add_argument("--conversion-factor", type=float, default=3.72)
+    calcParser.add_argument("--memory-budget", type=float,
+                            default=DEFAULT_MEMORY_BUDGET / 1024 ** 2,
+                            help="Memory (MB) used to stream the ill file.")
+    calcParser.add_argument("--monthly-only", action="store_true",
+                            help="Only keep the monthly sums, not the daily values.")
+    calcParser.add_argument("--output", required=True, help="Path of the shard file.")
+
+    mergeParser = subParsers.add_parser("merge", help="Merge the shards of a grid.")
+    mergeParser.add_argument("shards", nargs="+", help="Paths of the shard files.")
+    mergeParser.add_argument("--conversion-factor", type=float, default=None,
+                             help="Defaults to the conversion factor of the shards.")
+    mergeParser.add_argument("--output", required=True,
+                             help="Path of the json file with the annual and monthly average "
+                                  "DLI of every point.")
+
+    args = parser.parse_args(argv)
+    if args.command == "calc":
+        return calcCommand(args)
+    if args.command == "merge":
+        return mergeCommand(args)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,10 @@
         _qualFraction_: For a given space, the fraction of total grid points that needs to have DLI within range for a plant to be considered as growable in that space. For example,
         consider a grid of 100 points, a plant with DLI requirement is 30-40 and the _qualfraction_ set as 0.5. Then if more than 50 points have an average DLI in the range of 30-40, the
         plant will be considered growable in that space. If the _qualFraction_ is set to 0.6, then 60 or more points will need to have DLI in the range of 30-40.
+        _analyzeAll_: If set to True, all the plants in _plantData are analyzed in a single pass and the results are provided in dliFilterResultAll.
+        _suitablePlants_: If set to True, the plants whose DLI range contains the average DLI of their growing season are found for every grid point and provided in suitablePlantLists and suitablePlantIndex.
+        _refresh_: The results are kept in memory and reused while the inputs are unchanged. Set this to True to analyze the plants again.
+        _profile_: If set to True, the time, cpu time and peak memory of every stage of the analysis are recorded in profileReport. Defaults to False.
 
     Output:
         plantSummary: Data summary of the plant being analyzed.
@@ -20,6 +24,10 @@
         legendTitleDLI: Legend-title for DLI visualization.
         growSeasonSiteDLI: The grid-based average DLI for the site corresponding to the growingSeason for the selected plant.
         plantSummary: Details of the plant considered for analysis.
+        dliFilterResultAll: The dliFilterResult for every plant in _plantData. Only calculated if _analyzeAll_ is set to True.
+        suitablePlantLists: Every distinct list of plants that grow at a grid point, numbered from 00. Only calculated if _suitablePlants_ is set to True.
+        suitablePlantIndex: The number of the list in suitablePlantLists for every grid point.
+        profileReport: The stages of the analysis, if _profile_ is set to True. Connect it to a panel to view the report.
         """
 
 
@@ -39,166 +47,63 @@ __author__ = "Sarith"
 __version__ = "2022.06.02"
 
 import rhinoscriptsyntax as rs
+import scriptcontext as sc
 import Grasshopper.Kernel as gh
 import statistics
 import calendar
 
-
-class DLIfilterResult(object):
-    def __init__(self,plantInstance,resultPct,qualFactor,dliData,dliRangeList):
-        self.plantInstance=plantInstance
-        self.resultPct=resultPct
-        self.qualFactor=qualFactor
-        self.dliData=dliData
-        self.dliRangeList=dliRangeList
-
-    @property
-    def selection(self):
-        return True if self.resultPct[1]>self.qualFactor else False
-    def ToString(self):
-        return "Selection:%s for %s with in-range DLI of %.3f and qualifying factor of %.3f"%(self.selection,self.plantInstance.name,self.resultPct[1],self.qualFactor)
+#The analysis is defined in the photorad package so that it can also be used outside Grasshopper.
+from photorad import analysis, memo, plantindex, profiling
+from photorad.analysis import DLIfilterResult
 
 
 def main(plantData,locationData,dliData,plantIndex,filterBySoilTemp,qualifyFraction):
-
-
-    outputDict={"dliRangeList":None,"growSeasonSiteDLI":None,"legendTitleAna":None,
-                "chartTitleAna":None, "chartTitleDLI":None,"legendTitleDLI":None,}
-
-    plantInst=plantData[plantIndex]
-    growSeason=plantInst.growingSeason
-
-    locTmin=locationData.tmin
-    locTmax=locationData.tmax
-
-    plantTmin=plantInst.minTemp
-    plantTmax=plantInst.maxTemp
-
-    plantName=plantInst.name
-    growSeasonMonths=",".join([calendar.month_name[val] for val in growSeason])
-
-
-
-    growSeasonDLIList=[]
-    growSeasonDLIListCmu=[]
-
-    for month in growSeason:
-        if not growSeasonDLIList:
-            growSeasonDLIList.extend(dliData.avgDLIMonthly(month))
-            growSeasonDLIListCmu.extend(dliData.cmuDLIMonthly(month))
-        else:
-            for idx,val in enumerate(dliData.avgDLIMonthly(month)):
-                growSeasonDLIList[idx]+=val
-            for idx,val in enumerate(dliData.cmuDLIMonthly(month)):
-                growSeasonDLIListCmu[idx]+=val
-
-    print("Grow season DLI calculated for months:%s"%",".join(map(str,growSeason)))
-    growSeasonDLIList=[val/len(growSeason) for val in growSeasonDLIList]
-
-
-
-    quartileRangeData=list(sorted(growSeasonDLIList))
-
-    firstQuartileIndex=int(len(quartileRangeData)/4)
-    SecThirdQuartileIndex=int(len(quartileRangeData)/5)+firstQuartileIndex
-    FourthQuartileIndex=len(quartileRangeData)-SecThirdQuartileIndex
-
-    frstQ=statistics.mean(quartileRangeData[:firstQuartileIndex])
-    secThrQ=statistics.mean(quartileRangeData[firstQuartileIndex:SecThirdQuartileIndex])
-    frthQ=statistics.mean(quartileRangeData[SecThirdQuartileIndex:])
-
-
-    dliRangeUp=plantInst.dliValue[1]
-    dliRangeLow=plantInst.dliValue[0]
-
-
-    plotTitle="Report for: %s\n\n\n"%(plantName.upper())
-    plotTitle+="Growing season (months): %s\n\n"%growSeasonMonths
-    plotTitle+="Growing season Plant DLI Range: (%s,%s)\n\n"%(dliRangeLow,dliRangeUp)
-    plotTitle+="Growing season Location DLI Averages (Q1,Q2-Q3,Q4):(%0.1f, %0.1f, %0.1f)\n\n"%(frstQ,secThrQ,frthQ)
-    plotTitle+="Plant Temperature Range(min,max): (%s,%s)\n\n"%(plantTmin,plantTmax)
-
-
-    chartTitleDLI="Daily Light Integral Averaged for Growing Season months\n\n"
-    chartTitleDLI+="Growing season months for %s: %s\n\n"%(plantName.upper(),growSeasonMonths)
-
-
-    #If filtering by soil temperature has been set to then check if the limits for the plant and location match.
-    #If they don't exit by returning -1 as value for the DLI grid.
-    if filterBySoilTemp:
-        if not (plantTmin<=locTmin and plantTmax>=locTmax):
-            plotTitle+="The plant temperature range (%s,%s) is not compatible with the location temperature range (%s,%s)"%(plantTmin,plantTmax,locTmin,locTmax)
-
-            dliRangeList=[-1]*len(growSeasonDLIList)
-
-            outputDict["dliRangeList"]=dliRangeList
-            outputDict["growSeasonSiteDLI"]=growSeasonDLIList
-            outputDict["legendTitleAna"]="Not Applicable"
-            outputDict["chartTitleAna"]=plotTitle
-            outputDict["chartTitleDLI"]=chartTitleDLI
-            outputDict["legendTitleDLI"]="DLI"
-
-            return outputDict
-
-
-
-    dliRangeList=[]
-
-
-    for idx,val in enumerate(growSeasonDLIList):
-        if val>dliRangeUp:
-            dliRangeList.append(2)
-
-        if dliRangeUp>=val>=dliRangeLow:
-            dliRangeList.append(1)
-        if val<dliRangeLow:
-            dliRangeList.append(0)
-
-
-
-    lowMatchMax=(dliRangeList.count(0),dliRangeList.count(1),dliRangeList.count(2))
-
-    lowMatchMaxPct=tuple(["%.1f%%"%(100*val/len(growSeasonDLIList)) for val in lowMatchMax])
-
-    lowMatchMaxPctNum=tuple([(val/len(growSeasonDLIList)) for val in lowMatchMax])
-
-
-
-    plotTitle+="Site Temperature Range(min,max): (%s,%s)\n\n"%(locTmin,locTmax)
-
-    outputDict["dliRangeList"]=dliRangeList
-    outputDict["growSeasonSiteDLI"]=growSeasonDLIList
-    outputDict["growSeasonSiteDLICmu"]=growSeasonDLIListCmu
-    outputDict["legendTitleAna"]="0: BelowRange(%s), 1: WithinRange(%s), 2: AboveRange(%s)"%(lowMatchMaxPct[0],lowMatchMaxPct[1],lowMatchMaxPct[2])
-    outputDict["chartTitleAna"]=plotTitle
-    outputDict["chartTitleDLI"]=chartTitleDLI
-    outputDict["legendTitleDLI"]="DLI"
-    outputDict["dliFilterResult"]=DLIfilterResult(plantInst,lowMatchMaxPctNum,qualifyFraction,dliData,list(dliRangeList))
-
-    #{"dliRangeList":None,"growSeasonSiteDLI":None,"legendTitleAna":None,
-            #    "chartTitleAna":None, "chartTitleDLI":None,"legendTitleDLI":None,}
-
-
-    return outputDict
-
-if _plantData and _locationData and _dliData and (_plantIndex is not None):
-
-    _qualFraction_= _qualFraction_ or 0.5
-
-    if _plantIndex>=len(_plantData):
-        msg="The value for _indxForSmry_(%s) exceeds the total number of entries (%s) in _plantDataList"%(_plantIndex,len(_plantData))
-        ghenv.Component.AddRuntimeMessage(gh.GH_RuntimeMessageLevel.Warning, msg)
-        _plantIndex=len(_plantData)-1
-
-    plantSummary=_plantData[_plantIndex].summary
-
-    outputDict=main(_plantData,_locationData,_dliData,_plantIndex,_filterBySoilTemp_,_qualFraction_)
-
-    growSeasonSiteDLI=outputDict["growSeasonSiteDLI"]
-    DLIrangeList=outputDict["dliRangeList"]
-    chartTitleAna=outputDict["chartTitleAna"]
-    legendTitleAna=outputDict["legendTitleAna"]
-    chartTitleDLI=outputDict["chartTitleDLI"]
-    legendTitleDLI=outputDict["legendTitleDLI"]
-    dliFilterResult=outputDict["dliFilterResult"]
-    growSeasonSiteDLICmu=outputDict["growSeasonSiteDLICmu"]
\ No newline at end of file
+    return analysis.analyzePlant(plantData,locationData,dliData,plantIndex,filterBySoilTemp,qualifyFraction)
+
+def mainBatch(plantData,locationData,dliData,filterBySoilTemp,qualifyFraction):
+    """Analyze all the plants in plantData and return a DLIfilterResult for every plant."""
+    return analysis.analyzeAll(plantData,locationData,dliData,filterBySoilTemp,qualifyFraction)
+
+memoCache=memo.getMemoCache(sc.sticky)
+if _refresh_ or _profile_:
+    memoCache.invalidate("analyzeAll")
+    memoCache.invalidate("analyzePlant")
+    memoCache.invalidate("suitablePlants")
+
+profileReport=profiling.enable(traceMemory=True) if _profile_ else None
+try:
+    if _plantData and _locationData and _dliData and _analyzeAll_:
+        dliFilterResultAll=memoCache.memoize("analyzeAll",[],(_plantData,_locationData,_dliData,_filterBySoilTemp_,_qualFraction_ or 0.5),
+                                             lambda: mainBatch(_plantData,_locationData,_dliData,_filterBySoilTemp_,_qualFraction_ or 0.5))
+
+    if _plantData and _locationData and _dliData and _suitablePlants_:
+        suitableDict=memoCache.memoize("suitablePlants",[],(_plantData,_locationData,_dliData,_filterBySoilTemp_),
+                                       lambda: plantindex.suitablePlants(_plantData,_dliData,_locationData,_filterBySoilTemp_))
+        suitablePlantLists=["%02d: %s"%(idx,", ".join(plantNames) if plantNames else "None") for idx,plantNames in enumerate(suitableDict["plantLists"])]
+        suitablePlantIndex=suitableDict["plantListIndex"]
+
+    if _plantData and _locationData and _dliData and (_plantIndex is not None):
+
+        _qualFraction_= _qualFraction_ or 0.5
+
+        if _plantIndex>=len(_plantData):
+            msg="The value for _indxForSmry_(%s) exceeds the total number of entries (%s) in _plantDataList"%(_plantIndex,len(_plantData))
+            ghenv.Component.AddRuntimeMessage(gh.GH_RuntimeMessageLevel.Warning, msg)
+            _plantIndex=len(_plantData)-1
+
+        plantSummary=_plantData[_plantIndex].summary
+
+        with profiling.stage("main"):
+            outputDict=memoCache.memoize("analyzePlant",[],(_plantData,_locationData,_dliData,_plantIndex,_filterBySoilTemp_,_qualFraction_),
+                                         lambda: main(_plantData,_locationData,_dliData,_plantIndex,_filterBySoilTemp_,_qualFraction_))
+
+        growSeasonSiteDLI=outputDict["growSeasonSiteDLI"]
+        DLIrangeList=outputDict["dliRangeList"]
+        chartTitleAna=outputDict["chartTitleAna"]
+        legendTitleAna=outputDict["legendTitleAna"]
+        chartTitleDLI=outputDict["chartTitleDLI"]
+        legendTitleDLI=outputDict["legendTitleDLI"]
+        dliFilterResult=outputDict["dliFilterResult"]
+        growSeasonSiteDLICmu=outputDict["growSeasonSiteDLICmu"]
+finally:
+    profiling.disable()
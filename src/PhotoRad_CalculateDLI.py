@@ -3,10 +3,33 @@
         _radResults: The results from the AnnualIrradiance simulation run through
         HoneybeeRadiance.
         _dliConvFactor_: Conversion factor used to calculate PAR from incident radiation. Defaults to 3.72.
+        The cached results do not depend on the conversion factor, so changing it does not parse the results again.
+        _cacheResults_: If set to True, the parsed results are stored in a binary cache next to the
+        result files so that re-solving the canvas does not parse them again. Defaults to True.
+        _debug_: If set to True, the hourly results aligned with the wea file are also written to a
+        temporary rad file for inspection. Defaults to False.
+        _workers_: Number of processes used to calculate the DLI for multiple result grids in
+        parallel. Defaults to 1. Parallel processing requires a CPython (e.g. Rhino 8) component.
+        _memoryBudgetMB_: Approximate working memory (in MB) for every grid. If provided, the results
+        are read in blocks of points instead of all at once, which allows grids that do not fit in
+        memory to be processed. Only the daily DLI values are kept in memory.
+        _precision_: The type in which the DLI values are stored: float64, float32, float16 or int16.
+        float32 halves the memory of large grids with an error of about 1e-7 of every value. float16 and
+        int16 (values scaled to the largest DLI of the grid) quarter it with an error of about 5e-4 of every
+        value and 1.5e-5 of the largest value respectively, and require numpy. Defaults to float64.
+        _refresh_: The results are kept in memory and reused while the result files and the other inputs
+        are unchanged, so that re-solving the canvas does not recalculate them. Set this to True to
+        discard the results kept in memory and calculate them again.
+        _profile_: If set to True, the time, cpu time, bytes read and peak memory of every stage of the
+        calculation are recorded in profileReport. Stages that run in parallel workers are not recorded.
+        Defaults to False.
         _run: Set this to True to run the component.
 
     Returns:
-        dliData: A class containing calculated DLI values and summaries.
+        dliData: A class containing calculated DLI values and summaries. The value is None for
+        result grids that could not be processed.
+        profileReport: The stages of the calculation, if _profile_ is set to True. Connect it to a panel
+        to view the report or call profileReport.toJson(filePath) to save it.
 """
 
 ghenv.Component.Name = "PhotoRad_CalculateDLI"
@@ -24,222 +47,24 @@ __author__ = "Sarith"
 __version__ = "2022.06.02"
 
 import rhinoscriptsyntax as rs
+import scriptcontext as sc
+import Grasshopper.Kernel as gh
 
-import sys
-import math
-import os
-import calendar
-from pprint import pprint
-import tempfile
+from photorad import cache, memo, profiling
+from photorad.dli import DLIdata, calc_dli_batch, calc_grid_dli, consolidate_results, \
+    prep_rad_file
 
 
-# Note: Rad file and rad refers to radiation data files that contain data in W/m2
-
-class DLIdata(object):
-    def __init__(self, radFile, ptsFile, conversionFactor=3.72):
-        self.dliDailyData = self._calcDLI(radFile, ptsFile, conversionFactor)
-
-    def _parseRadPtsFile(self, filePath, slicePositionStart=0, slicePositionEnd=None):
-        """
-        Parse multiple files in the rad format and return cleaned data. This function
-        is for internal use only.
-        """
-        assert os.path.exists(filePath), "The file path (%s) was not found" % filePath
-
-        dataList = []
-        with open(filePath) as filestream:
-            for idx, lines in enumerate(filestream):
-
-                lineData = list(map(float, lines.strip().split()))
-
-                if not idx:
-                    slicePositionEnd = len(
-                        lineData) if slicePositionEnd is None else slicePositionEnd
-                lineData = lineData[slicePositionStart:slicePositionEnd]
-                dataList.append(lineData)
-        return dataList
-
-    def _calcDLI(self, radFilePath, ptsFilePath, convFactor=3.72):
-
-        assert os.path.exists(
-            radFilePath), "The rad file (%s) was not found." % radFilePath
-
-        assert os.path.exists(
-            ptsFilePath), "The pts file (%s) was not found." % ptsFilePath
-
-        radDataSet = self._parseRadPtsFile(radFilePath, 3)
-
-        ptsLength = len(self._parseRadPtsFile(ptsFilePath))
-        radLength = len(radDataSet[0])
-
-        assert ptsLength == radLength, "The number of data points in points file (%s) " \
-                                       "and rad file (%s) must be the same." % (
-        ptsLength, radLength)
-
-        # Convert from 8760 x numPoints to numPoints x 8760 matrix
-        radDataSetTr = list(zip(*radDataSet))
-
-        # Reduce the numPoints x 8760 matrix to numPoints x 365 matrix by averaging
-        # dailiy raduminances.
-        dliDataSetDailyAvg = []
-
-        dliDailyData = []
-
-        for ptsData in radDataSetTr:
-            # calculate daily average raduminances
-            ptsDataNew = [sum(ptsData[num * 24:(num + 1) * 24]) / 24 for num in
-                          range(365)]
-
-            # calculate dli
-            parData = [(avgRad * convFactor) * 0.0864 for avgRad in ptsDataNew]
-
-            dliDailyData.append(parData)
-
-        return dliDailyData
-
-    def avgDLIMonthly(self, monthNum):
-        yearlyDLIdata = self.dliDailyData
-        assert monthNum in range(1, 13), \
-            "The input for monthNum (%s) must be a number between 1 (Jan) and 12 (Dec)"
-        assert len(yearlyDLIdata[0]) == 365, \
-            "The dataset provided as input has incorrect number of data (%s) per " \
-            "point" % (
-                len(yearlyDLIdata[0]))
-
-        monthDates = [0] + [calendar.monthrange(2011, val)[-1] for val in range(1, 13)]
-
-        monthDateSum = [sum(monthDates[:idx + 1]) for idx in range(len(monthDates))]
-
-        monthSliceStart, monthSliceEnd = monthDateSum[monthNum - 1:monthNum + 1]
-
-        avgMonthlyData = [sum(ptsData[monthSliceStart:monthSliceEnd]) / (
-                    monthSliceEnd - monthSliceStart) for ptsData in yearlyDLIdata]
-
-        return avgMonthlyData
-
-       #Cumulative DLI for an entire month.
-    def cmuDLIMonthly(self, monthNum):
-        yearlyDLIdata = self.dliDailyData
-        assert monthNum in range(1, 13), \
-            "The input for monthNum (%s) must be a number between 1 (Jan) and 12 (Dec)"
-        assert len(yearlyDLIdata[0]) == 365, \
-            "The dataset provided as input has incorrect number of data (%s) per " \
-            "point" % (
-                len(yearlyDLIdata[0]))
-
-        monthDates = [0] + [calendar.monthrange(2011, val)[-1] for val in range(1, 13)]
-
-        monthDateSum = [sum(monthDates[:idx + 1]) for idx in range(len(monthDates))]
-
-        monthSliceStart, monthSliceEnd = monthDateSum[monthNum - 1:monthNum + 1]
-
-        cmuMonthlyData = [sum(ptsData[monthSliceStart:monthSliceEnd])  for ptsData in yearlyDLIdata]
-
-        return cmuMonthlyData
-
-    @property
-    def dataSize(self):
-        return (len(self.dliDailyData), len(self.dliDailyData[0]))
-
-    @property
-    def avgDLIAnnual(self):
-        yearlyDLIdata = self.dliDailyData
-        assert len(yearlyDLIdata[0]) == 365, \
-            "The dataset provided as input has incorrect number of data (%s) per " \
-            "point" % (
-                len(yearlyDLIdata[0]))
-
-        yearlyDLIdata = [sum(ptsData) / 365 for ptsData in yearlyDLIdata]
-
-        return yearlyDLIdata
-
-    @property
-    def cmuDLIAnnual(self):
-        yearlyDLIdata = self.dliDailyData
-        assert len(yearlyDLIdata[0]) == 365, \
-            "The dataset provided as input has incorrect number of data (%s) per " \
-            "point" % (
-                len(yearlyDLIdata[0]))
-
-        yearlyDLIdata = [sum(ptsData)  for ptsData in yearlyDLIdata]
-
-        return yearlyDLIdata
-
-    def ToString(self):
-        return "DLI data generated for %s points for %s days" % self.dataSize
-
-
-def consolidate_results(results, sun_hours):
-    """Locate all the files required for the calculation."""
-    assert os.path.exists(results), 'The results file %s was not found. Are the paths ' \
-                                    'correct?' % results
-
-    dirPath, resFile = os.path.split(results)
-
-    rootFolder = (os.path.dirname(os.path.dirname(dirPath)))
-
-    # need this for locating the pts file.
-    resId, ext = os.path.splitext(resFile)
-
-    weaFilePath = [os.path.join(rootFolder, val) for val in os.listdir(rootFolder) if
-                   val.lower().endswith('.wea')][0]
-
-    ptsFilePath = os.path.join(rootFolder, 'model', 'grid', '%s.pts' % resId)
-
-    return {'rad_rad': results, 'wea': weaFilePath, 'sun_hours': sun_hours,
-            'pts': ptsFilePath,
-            'root_dir': rootFolder}
-
-
-def prep_rad_file(res_dict, output_path=None):
-    sun_hours_path = res_dict['sun_hours']
-    rad_rad_path = res_dict['rad_rad']
-    wea_path = res_dict['wea']
-    pts_path = res_dict['pts']
-    output_path = output_path or tempfile.mktemp(dir=res_dict['root_dir'], suffix='.rad')
-
-    with open(sun_hours_path) as sunData:
-        sunList = list(map(float, sunData.read().split()))
-
-    radList = []
-    with open(rad_rad_path) as radData:
-        for lines in radData:
-            if lines.strip():
-                lineList = lines.strip().split()
-                radList.append(list(map(float, lineList)))
-
-    ptsListLen = len(radList)
-    radList = list(zip(*radList))
-
-    totalHourList = [idx + 0.5 for idx in range(8760)]
-
-    weaHourList = []
-    with open(wea_path) as weaData:
-        for lines in weaData:
-            try:
-                lineSplit = list(map(float, lines.strip().split()))
-                weaHourList.append(lineSplit[:3])
-            except ValueError:
-                pass  #
-
-    finalRadList = []
-    for idx, hourVal in enumerate(weaHourList):
-        currentHour = totalHourList[idx]
-        if currentHour in sunList:
-            hourIdx = sunList.index(currentHour)
-            radHourList = [rad for rad in radList[hourIdx]]
-            finalRadList.append(list(hourVal) + radHourList)
-        else:
-            finalRadList.append(hourVal + [0] * ptsListLen)
-
-    with open(output_path, 'w') as output_stream:
-        for lines in finalRadList:
-            write_val = " ".join(map(str, lines))
-            output_stream.write(write_val + '\n')
-
-    print('The temporary results file was saved as %s' % output_path)
-
-    return output_path, pts_path
+def sourceFiles(resPaths,sunHoursPath):
+    """The files that the DLI is calculated from, which identify the results kept in memory."""
+    fileList=list(resPaths)+[sunHoursPath]
+    for resPath in resPaths:
+        try:
+            res_dict=consolidate_results(resPath,sunHoursPath)
+            fileList.extend([res_dict['wea'],res_dict['pts']])
+        except (AssertionError,IndexError,OSError):
+            pass
+    return fileList
 
 
 if _radResults and _run:
@@ -249,19 +74,38 @@ if _radResults and _run:
     resPaths=_radResults[:-1]
 
     _dliConvFactor_=_dliConvFactor_ if _dliConvFactor_ else 3.72
-    # Initiate a new list for DLI data.
-    dliData=[]
-    for resPath in resPaths:
-        res_dict = consolidate_results(resPath, sunHoursPath)
-
-        radFilePath, ptsFilePath = prep_rad_file(res_dict)
-
-        dliData.append(DLIdata(radFilePath, ptsFilePath, _dliConvFactor_))
-
-
-
-
-
-
-
-
+    _cacheResults_=True if _cacheResults_ is None else _cacheResults_
+    resultCache=cache.ResultCache() if _cacheResults_ else None
+
+    memoryBudget=_memoryBudgetMB_*1024**2 if _memoryBudgetMB_ else None
+
+    memoCache = memo.getMemoCache(sc.sticky)
+    if _refresh_ or _profile_:
+        memoCache.invalidate("dliData")
+        memoCache.invalidate("dliDataFactor")
+
+    # The DLI is calculated once for the files and options and only rescaled when the
+    # conversion factor changes. Results with failed grids are not kept.
+    memoFiles = sourceFiles(resPaths, sunHoursPath)
+    memoParams = (_precision_ or "float64", memoryBudget, bool(_debug_), bool(_cacheResults_))
+
+    profileReport = profiling.enable(traceMemory=True) if _profile_ else None
+    try:
+        dliData, errorList = memoCache.memoize(
+            "dliData", memoFiles, memoParams,
+            lambda: calc_dli_batch(resPaths, sunHoursPath, _dliConvFactor_, resultCache,
+                                   _workers_ or 1, _debug_, memoryBudget, _precision_ or "float64"),
+            lambda result: not any(result[1]))
+    finally:
+        profiling.disable()
+
+    if not any(errorList):
+        dliData = memoCache.memoize(
+            "dliDataFactor", memoFiles, memoParams + (_dliConvFactor_,),
+            lambda: [val.withConversionFactor(_dliConvFactor_) if
+                     val.conversionFactor != _dliConvFactor_ else val for val in dliData])
+
+    for resPath, error in zip(resPaths, errorList):
+        if error:
+            msg = "The DLI for %s could not be calculated:\n%s" % (resPath, error)
+            ghenv.Component.AddRuntimeMessage(gh.GH_RuntimeMessageLevel.Warning, msg)
@@ -3,7 +3,7 @@
         _dliData: The output from the dliData component.
         _dliFilterResult: The dliFilterResult output from the PhotoRad AnalyzePlantSelection component.
     Output:
-        allOptions: Generates an indexed list of all the combinations(without repetition) of the plants.
+        allOptions: An indexed list of all the combinations(without repetition) of the plants. The combinations are decoded on demand, e.g. allOptions[5] returns (5, combination).
         selection: Provides the selection made for a specific grid/space.
         selectionGrid: Provides a list of indicies corresponding to the selection made. A single selection is applied to the entire grid.
         selectionGridNodal: Provides a list of indicies corresponding to the selection made. The selection is applied according to individual nodes instead of the entire grid.
@@ -26,33 +26,9 @@ __author__ = "SarithS"
 __version__ = "2022.06.02"
 
 import rhinoscriptsyntax as rs
-import itertools
 
-def selectPlants(dliFilterResult,dliData):
-    dliNameList=[]
-
-    nameListFinal=[[]]*dliData.dataSize[0]
-    for result in dliFilterResult:
-        if result.dliData==dliData:
-            nameList=[[result.plantInstance.name] if val==2 else [] for val in result.dliRangeList]
-            nameListFinal=[val+nameList[idx] for idx,val in enumerate(nameListFinal)]
-    nameListFinal=[tuple(sorted(val)) for val in nameListFinal]
-    nameListFinalSet=list(set(nameListFinal))
-
-    plantList=sorted(set([val.plantInstance.name for val in dliFilterResult]))
-    combinations=list(itertools.chain(*[list(itertools.combinations(plantList,len(plantList)-idx)) for \
-            idx,plant in enumerate(plantList)]))+[()]
-    comboWithID=list(enumerate(combinations))
-    plantDLICombo=[val for val in dliFilterResult if val.dliData==dliData]
-    selection=tuple(sorted([val.plantInstance.name for val in plantDLICombo if val.selection]))
-    selectionIndex=combinations.index(selection)
-    nameListFinal=[combinations.index(val) for val in nameListFinal]
-    nameListFinalSet="\n".join(["%02d: %s"%(combinations.index(val),", ".join(val) if val else "None") for val in nameListFinalSet])
-    print(nameListFinalSet)
-    gridSize=dliData.dataSize[0]
-    selectionGrid=[selectionIndex]*gridSize
-
-    return {'allOptions':comboWithID,'selection':selection,'selectionGrid':selectionGrid,'nameListFinal':nameListFinal,'selectedCombo':nameListFinalSet}
+#The selection is defined in the photorad package so that it can also be used outside Grasshopper.
+from photorad.selection import PlantCombinations, selectPlants
 
 if _dliFilterResult and _dliData:
     results=selectPlants(_dliFilterResult,_dliData)
@@ -2,6 +2,7 @@
     Inputs:
         _plantDataCsv_: Path of the csv file containing plant data.
         _plantDataList_: A text panel where plant data are specified in individual lines. Each line is of the format: PlantName, DLI value, min Temp, max Temp, HardinessZone, Photoperiod, GrowingSeason.
+        _skipInvalid_: If set to True, rows with invalid values are skipped and listed in a warning. Otherwise, all the invalid rows are listed in an error and no plants are imported. Defaults to False.
     Output:
         plantDataList: Multiple instances of PlantData that were imported from the csv file and text panel"""
 
@@ -22,37 +23,27 @@ import rhinoscriptsyntax as rs
 import csv
 import scriptcontext as sc
 import os
+import Grasshopper.Kernel as gh
 
+from photorad import plants
 
 assert "photoRadDict" in sc.sticky,"The core component was not found. Please drag it canvas."
 #Create hardiness zones and temeprature ranges corresponding to USDA
-def main(csvFilePath,plantDataList):
-    PlantData=sc.sticky["photoRadDict"]["plantDataClass"]
+def main(csvFilePath,plantDataList,skipInvalid):
 
-    plantList=[]
+    #The rows are validated in bulk into a PlantTable, and the PlantData are views of its rows.
+    plantTables=[]
     if csvFilePath:
-        assert os.path.exists(csvFilePath),"The path for the file %s is not valid"%csvFilePath
-        with open(csvFilePath,"rb") as csvStream:
-            for idx,lines in enumerate(csvStream):
-                if idx:
-                    if lines.strip():
-                        lineList=lines.strip().split(",")
-                        if lineList[0]:
-                            plantInstance=PlantData(*lines.strip().split(","))
-                            plantList.append(plantInstance)
-                            print("Loaded %s from the file %s"%(plantInstance,csvFilePath))
+        plantTables.append(plants.loadPlantTable(csvFilePath,skipInvalid))
 
     if plantDataList:
-            for lines in plantDataList.split("\n"):
-                if lines.strip():
-                    lineList=lines.strip().split(",")
-                    if lineList[0]:
+        plantTables.append(plants.parsePlantTable(plantDataList.split("\n"),"the intput _plantDataList_",skipInvalid))
 
-                        plantInstance=PlantData(*lineList)
-                        plantList.append(plantInstance)
-                        print("Loaded %s from the intput _plantDataList_"%(plantInstance))
+    for plantTable in plantTables:
+        if plantTable.importErrors:
+            msg="%s invalid rows were skipped:\n%s"%(len(plantTable.importErrors),"\n".join(["Line %s: %s"%val for val in plantTable.importErrors]))
+            ghenv.Component.AddRuntimeMessage(gh.GH_RuntimeMessageLevel.Warning, msg)
 
-
-    return plantList
+    return [plantInst for plantTable in plantTables for plantInst in plantTable]
 if _plantDataCsv_ or _plantDataList_:
-    plantDataList=main(_plantDataCsv_,_plantDataList_)
+    plantDataList=main(_plantDataCsv_,_plantDataList_,_skipInvalid_)
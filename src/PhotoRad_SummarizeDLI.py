@@ -6,7 +6,7 @@
         _doyIndex: The day of the year for which DLI should be displayed.Valid inputs are 1 to 365.
         trnAnnualHourlyMtx_: Transpose the annualHourlyDLI output to a matrix of size (365 x No. of Points). The default output size is (No. of Points x 365).
     Output:
-        annualHourlyDLI: A matrix containing DLI values for every grid point, mapped across the entire year. The size of the matrix is (No. of Points x 365)
+        annualHourlyDLI: A matrix containing DLI values for every grid point, mapped across the entire year. The size of the matrix is (No. of Points x 365). The matrix is a view of the values in dliData, a row (e.g. annualHourlyDLI[0]) is only extracted when it is accessed. Use annualHourlyDLI.tolist() to extract all of them.
         doyDLI: The DLI for every point in the grid, corresponding to the day of the year specified through the _doyIndex input.
         monthlyDLI: The average monthly DLI for every point in the grid, corresponding to the month of the year specified through the _monthIndex input.
         annualAverageDLI: Average yearly DLI for every point in the grid.
@@ -27,36 +27,32 @@ __author__ = "Sarith"
 __version__ = "2022.06.02"
 
 import rhinoscriptsyntax as rs
+import scriptcontext as sc
 import calendar
 import datetime
 
+from photorad import memo
+
 if _dliData:
 
     assert _doyIndex_ in range(1,366),"The value for _doyIndex_ (%s) must be value between 1 and 365"%_doyIndex_
 
     assert _monthIndex_ in range(1,13),"The value for _monthIndex_(%s) must be a value between 1 and 12"%_monthIndex_
 
-    annualData=_dliData.dliDailyData
-    annualDataInv=list(zip(*annualData))
-
     monthIndex=_monthIndex_
     doyIndex=_doyIndex_-1
     dateForDisplay=datetime.datetime(2013,1,1)+datetime.timedelta(_doyIndex_-1)
 
 
-    if trnAnnualHourlyMtx_:
-        print("The variable annualHourlyDLI is of the format (%s,%s)"%_dliData.dataSize)
-        annualHourlyDLI=annualDataInv
-
-    else:
-        print("The variable annualHourlyDLI is of the format (%s,%s)"%(_dliData.dataSize[-1],_dliData.dataSize[0]))
-        annualHourlyDLI=list(annualData)
+    annualHourlyDLI=_dliData.dailyView(byPoint=not trnAnnualHourlyMtx_)
+    print("The variable annualHourlyDLI is of the format (%s,%s)"%annualHourlyDLI.shape)
 
-    monthlyDLI=_dliData.avgDLIMonthly(monthIndex)
-    monthlyCmuDLI=_dliData.cmuDLIMonthly(monthIndex)
-    annualAverageDLI=_dliData.avgDLIAnnual
-    doyDLI=annualDataInv[_doyIndex_-1]
-    annualCmuDLI=_dliData.cmuDLIAnnual
+    #The reductions are kept in memory for the dliData and month, the day is read from the view.
+    monthlyDLI,monthlyCmuDLI,annualAverageDLI,annualCmuDLI=memo.getMemoCache(sc.sticky).memoize(
+        "summarizeDLI",[],(_dliData,monthIndex),
+        lambda: (_dliData.avgDLIMonthly(monthIndex),_dliData.cmuDLIMonthly(monthIndex),
+                 _dliData.avgDLIAnnual,_dliData.cmuDLIAnnual))
+    doyDLI=_dliData.dayDLI(_doyIndex_)
     print("The monthly data 'monthlyDLI'(_monthIndex_:%s) corresponds to %s"%(_monthIndex_,calendar.month_name[_monthIndex_]))
 
 